@@ -0,0 +1,273 @@
+'''
+    Throughput benchmarks of sequence operations, fastq filtering and GBK parsing.
+
+    Every benchmark runs in a fresh process, so the peak RSS belongs to this benchmark only.
+    Data is generated by benchmarks.synthetic_data with a fixed seed and the package modules are imported
+    before the timing. The peak RSS of the timed runs is measured apart from the setup (on Linux the peak
+    is reset after the setup, elsewhere it is the high-water mark of the whole process, an upper bound),
+    the peak RSS of pool workers (filter_fastq_parallel) is reported as children_peak_rss_mb.
+    The best of `repeat` runs is reported as records/s and MB/s of input,
+    results are printed as a table and saved as JSON, a previous JSON can be given to compare with.
+
+    Usage (from the repository root):
+        python -m benchmarks.run_benchmarks
+        python -m benchmarks.run_benchmarks --sizes 10000 100000 --only filter_fastq gc_count --output results.json
+        python -m benchmarks.run_benchmarks --compare old_results.json
+
+    Functions:
+        run_benchmark: run one benchmark of one input size in a separate process
+        main: command line entry point
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+import argparse
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+from . import synthetic_data
+
+DEFAULT_SIZES = (10000, 100000)
+# imported before the timing, so the first run does not pay the import
+_MODULES = ("main", "bio_files_processor", "modules.dna_rna_tools", "modules.fastq_tools")
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def _reset_peak_rss() -> bool:
+    '''
+    Reset the peak RSS of this process (VmHWM on Linux), return False if it is not possible.
+    '''
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _run_peak_rss_mb(reset: bool) -> float:
+    '''
+    Return peak RSS since _reset_peak_rss if it was reset, otherwise the high-water mark of the process.
+    '''
+    if reset:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    return _peak_rss_mb()
+
+
+def _setup_reads(size: int):
+    # without N: the sequence operations accept only valid DNA/RNA
+    reads = synthetic_data.make_reads(size, seed=size, n_rate=0)
+    return reads, sum(len(read[1]) for read in reads)
+
+
+def _setup_fastq(size: int):
+    file_name = f"reads_{size}.fastq"
+    synthetic_data.write_fastq(file_name, size, seed=size)
+    return file_name, os.path.getsize(file_name)
+
+
+def _setup_fasta(size: int):
+    file_name = f"seqs_{size}.fasta"
+    synthetic_data.write_fasta(file_name, size, length=1000, seed=size)
+    return file_name, os.path.getsize(file_name)
+
+
+def _setup_gbk(size: int):
+    file_name = f"genome_{size}.gbk"
+    synthetic_data.write_genbank(file_name, size, contigs=4, seed=size)
+    genes = [f"gene_{i}" for i in (0, size // 2, size - 1)]
+    return (file_name, genes), os.path.getsize(file_name)
+
+
+def _setup_gbk_cached(size: int):
+    import bio_files_processor
+
+    data, nbytes = _setup_gbk(size)
+    bio_files_processor.parse_blast_output(data[0], data[1], None, use_cache=True)
+    return data, nbytes
+
+
+def _complement(reads):
+    from modules import dna_rna_tools
+
+    for read in reads:
+        dna_rna_tools.complement(read[1])
+
+
+def _complement_batch(reads):
+    import main
+
+    for _ in main.run_dna_rna_tools_batch((read[1] for read in reads), "complement"):
+        pass
+
+
+def _gc_count(reads):
+    from modules import fastq_tools
+
+    for read in reads:
+        fastq_tools.gc_count(read[1])
+
+
+def _average_quality(reads):
+    from modules import fastq_tools
+
+    for read in reads:
+        fastq_tools.average_quality((read[1], read[2]))
+
+
+def _filter_fastq(file_name, workers: int = 1):
+    import main
+
+    main.filter_fastq(file_name, f"filtered_{file_name}", (20, 80), (60, 140), 20, workers=workers, if_exists="overwrite")
+
+
+def _filter_fastq_parallel(file_name):
+    _filter_fastq(file_name, workers=4)
+
+
+def _convert_fasta(file_name):
+    import bio_files_processor
+
+    bio_files_processor.convert_multiline_fasta_to_oneline(file_name, f"oneline_{file_name}")
+
+
+def _parse_gbk(data, use_cache: bool = False):
+    import bio_files_processor
+
+    file_name, genes = data
+    bio_files_processor.parse_blast_output(file_name, genes, None, n_before=2, n_after=2, use_cache=use_cache)
+
+
+def _parse_gbk_cached(data):
+    _parse_gbk(data, use_cache=True)
+
+
+# name: (setup, run), setup(size) -> (data, input bytes), run(data) is timed, size is the number of records
+BENCHMARKS = {
+    "complement": (_setup_reads, _complement),
+    "complement_batch": (_setup_reads, _complement_batch),
+    "gc_count": (_setup_reads, _gc_count),
+    "average_quality": (_setup_reads, _average_quality),
+    "filter_fastq": (_setup_fastq, _filter_fastq),
+    "filter_fastq_parallel": (_setup_fastq, _filter_fastq_parallel),
+    "convert_fasta": (_setup_fasta, _convert_fasta),
+    "parse_gbk": (_setup_gbk, _parse_gbk),
+    "parse_gbk_cached": (_setup_gbk_cached, _parse_gbk_cached),
+}
+
+
+def _run_in_process(name: str, size: int, repeat: int, root: str) -> dict:
+    sys.path.insert(0, root)
+    setup, run = BENCHMARKS[name]
+
+    with tempfile.TemporaryDirectory() as work_dir, redirect_stdout(io.StringIO()):
+        os.chdir(work_dir)
+        for module in _MODULES:
+            importlib.import_module(module)
+        data, nbytes = setup(size)
+        setup_rss = _peak_rss_mb()
+        reset = _reset_peak_rss()
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(data)
+            times.append(time.perf_counter() - start)
+        peak_rss = _run_peak_rss_mb(reset)
+        os.chdir(root)
+
+    best = min(times)
+    return {
+        "benchmark": name,
+        "size": size,
+        "input_mb": round(nbytes / 2**20, 3),
+        "seconds": round(best, 6),
+        "seconds_all": [round(t, 6) for t in times],
+        "records_per_s": round(size / best, 1),
+        "mb_per_s": round(nbytes / 2**20 / best, 3),
+        "setup_rss_mb": round(setup_rss, 1),
+        "peak_rss_mb": round(peak_rss, 1),
+        "peak_rss_exact": reset,
+        "children_peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }
+
+
+def run_benchmark(name: str, size: int, repeat: int = 3) -> dict:
+    '''
+    Run one benchmark of size records in a new process and return its results.
+
+    Raises:
+        ValueError: if there is no benchmark name
+    '''
+    if name not in BENCHMARKS: raise ValueError(f"There are no benchmark {name}, use one of {', '.join(BENCHMARKS)}")
+
+    root = str(Path(__file__).resolve().parent.parent)
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_run_in_process, name, size, repeat, root).result()
+
+
+def _compare(results: list, previous_file: str) -> None:
+    with open(previous_file, "r", encoding="utf-8") as file:
+        previous = {(rez["benchmark"], rez["size"]): rez for rez in json.load(file)["results"]}
+
+    print(f"\ncompared with {previous_file} (speedup > 1 is faster now)")
+    for rez in results:
+        old = previous.get((rez["benchmark"], rez["size"]))
+        if old:
+            workers = rez['children_peak_rss_mb'] - old.get('children_peak_rss_mb', 0.0)
+            print(f"{rez['benchmark']:<24}{rez['size']:>10}  speedup {old['seconds'] / rez['seconds']:6.2f}x  rss {rez['peak_rss_mb'] - old['peak_rss_mb']:+8.1f} MB  workers rss {workers:+8.1f} MB")
+
+
+def main(argv=None) -> list:
+    parser = argparse.ArgumentParser(description="Throughput benchmarks of NucleicTools")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="numbers of records (reads, fasta records, CDS)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every benchmark, the best one is reported")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'benchmark':<24}{'size':>10}{'seconds':>12}{'records/s':>14}{'MB/s':>10}{'peak RSS MB':>14}{'workers MB':>12}")
+    for name in args.only or BENCHMARKS:
+        for size in args.sizes:
+            rez = run_benchmark(name, size, args.repeat)
+            results.append(rez)
+            print(f"{name:<24}{size:>10}{rez['seconds']:>12.4f}{rez['records_per_s']:>14.0f}{rez['mb_per_s']:>10.2f}{rez['peak_rss_mb']:>14.1f}{rez['children_peak_rss_mb']:>12.1f}")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file_w:
+        json.dump(report, file_w, indent=4)
+    print(f"results are saved in {args.output}")
+
+    if args.compare:
+        _compare(results, args.compare)
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
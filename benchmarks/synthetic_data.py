@@ -0,0 +1,113 @@
+'''
+    Deterministic synthetic data for the benchmarks.
+
+    Every generator takes a seed, the same arguments always give the same file,
+    so timings of different runs (and different versions of the code) are comparable.
+
+    Functions:
+        random_seq: random nucleotide sequence
+        make_reads: list of fastq records with quality strings
+        write_fastq: fastq file of random reads
+        write_fasta: multiline fasta file
+        write_genbank: GBK file with n_cds CDS features with translations
+
+    Example:
+        write_fastq("reads.fastq", 100000, seed=1)
+        write_genbank("genome.gbk", 5000, seed=1)
+'''
+
+import random
+
+_AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+_QUALITY = "".join(chr(33 + score) for score in range(2, 42))
+
+
+def random_seq(rng: random.Random, length: int, alphabet: str = "ACGT", n_rate: float = 0.0) -> str:
+    '''
+    Return random sequence of length symbols of alphabet, with about n_rate of N.
+    '''
+    seq = rng.choices(alphabet, k=length)
+    if n_rate:
+        for i in range(length):
+            if rng.random() < n_rate:
+                seq[i] = "N"
+    return "".join(seq)
+
+
+def _quality(rng: random.Random, length: int) -> str:
+    # quality drops to the 3' end, as in real reads
+    head = length * 2 // 3
+    return "".join(rng.choices(_QUALITY[20:], k=head)) + "".join(rng.choices(_QUALITY[5:30], k=length - head))
+
+
+def make_reads(n: int, length_bounds: tuple = (50, 150), seed: int = 0, n_rate: float = 0.002) -> list:
+    '''
+    Return list of n fastq records (seq_id, seq_read, seq_quality, seq_plus) with lengths within length_bounds
+    and about n_rate of N in the reads.
+    '''
+    rng = random.Random(seed)
+    reads = []
+    for i in range(n):
+        length = rng.randint(*length_bounds)
+        reads.append((f"@read_{i} synthetic", random_seq(rng, length, n_rate=n_rate), _quality(rng, length), "+"))
+    return reads
+
+
+def write_fastq(file_name: str, n: int, length_bounds: tuple = (50, 150), seed: int = 0, batch_size: int = 10000) -> None:
+    '''
+    Write n random reads to a fastq file, reads are generated in batches of batch_size.
+    '''
+    with open(file_name, "w", encoding="latin-1", newline="\n") as file_w:
+        for start in range(0, n, batch_size):
+            reads = make_reads(min(batch_size, n - start), length_bounds, seed + start)
+            file_w.write("".join(f"{seq_id.replace('read_', f'read_{start}_', 1)}\n{seq}\n{plus}\n{qual}\n" for seq_id, seq, qual, plus in reads))
+
+
+def write_fasta(file_name: str, n_records: int, length: int = 10000, line_width: int = 60, seed: int = 0) -> None:
+    '''
+    Write n_records random sequences of about length bases, split into lines of line_width.
+    '''
+    rng = random.Random(seed)
+    with open(file_name, "w", encoding="utf-8", newline="\n") as file_w:
+        for i in range(n_records):
+            seq = random_seq(rng, rng.randint(length // 2, length * 3 // 2))
+            file_w.write(f">seq_{i} synthetic sequence\n")
+            file_w.write("\n".join(seq[j:j + line_width] for j in range(0, len(seq), line_width)))
+            file_w.write("\n")
+
+
+def _wrap_qualifier(name: str, value: str, width: int = 58) -> str:
+    text = f'/{name}="{value}"'
+    indent = " " * 21
+    return "".join(f"{indent}{text[i:i + width]}\n" for i in range(0, len(text), width))
+
+
+def write_genbank(file_name: str, n_cds: int, contigs: int = 1, protein_length: int = 300, seed: int = 0) -> None:
+    '''
+    Write a GBK file with n_cds CDS features (gene names gene_0, gene_1, ...) split between contigs records.
+    Features are followed by a short ORIGIN, the benchmarks measure feature parsing.
+    '''
+    rng = random.Random(seed)
+    per_contig = -(-n_cds // contigs)
+    number = 0
+    with open(file_name, "w", encoding="utf-8", newline="\n") as file_w:
+        for contig in range(contigs):
+            count = min(per_contig, n_cds - number)
+            length = max(count, 1) * 1000
+            file_w.write(f"LOCUS       CONTIG{contig + 1}  {length} bp    DNA     linear   BCT 01-JAN-2020\n")
+            file_w.write("DEFINITION  synthetic genome.\nFEATURES             Location/Qualifiers\n")
+            file_w.write(f"     source          1..{length}\n                     /organism=\"synthetic\"\n")
+            for i in range(count):
+                start = i * 1000 + 1
+                end = start + 899
+                location = f"complement({start}..{end})" if rng.random() < 0.5 else f"{start}..{end}"
+                translation = "M" + random_seq(rng, rng.randint(protein_length // 2, protein_length), _AMINO_ACIDS)
+                file_w.write(f"     gene            {start}..{end}\n")
+                file_w.write(_wrap_qualifier("gene", f"gene_{number}"))
+                file_w.write(f"     CDS             {location}\n")
+                file_w.write(_wrap_qualifier("gene", f"gene_{number}"))
+                file_w.write(_wrap_qualifier("locus_tag", f"LT_{number}"))
+                file_w.write('                     /product="hypothetical protein"\n')
+                file_w.write(_wrap_qualifier("translation", translation))
+                number += 1
+            file_w.write("ORIGIN\n        1 acgtacgtac\n//\n")
@@ -14,19 +14,28 @@
 from pathlib import Path
 from typing import Union
 import json
+import time
 import modules.fastq_tools
+import modules.fasta_tools
+import modules.genbank_tools
+import modules.io_tools
 
-def convert_multiline_fasta_to_oneline(input_fasta: str) -> None:
+def convert_multiline_fasta_to_oneline(input_fasta: str, output_fasta: str = None, line_width: int = None) -> None:
     '''
     A function processes fasta file: reads a fasta file supplied as input_fasta (str),
     where one sequence (DNA/RNA/protein/etc.) can be split into several lines,
     and then saves it into a new fasta file (output_fasta) where each sequence fits one line.
 
+    The file is processed as a stream: every record is written as soon as the next header is found,
+    so memory is bounded by the longest record. Records with the same header are all kept.
+
     Input:
         input_fasta: file with the input sequences
 
     Arguments:
         input_fasta: str
+        output_fasta: str, by default output_<input_fasta name> next to the input_fasta
+        line_width: int, if given sequences are re-wrapped to lines of line_width characters instead of one line
 
     Returns:
         output_fasta: a file where each sequence fits one line
@@ -35,151 +44,122 @@ def convert_multiline_fasta_to_oneline(input_fasta: str) -> None:
         exceptions if something went wrong.
     '''
 
-    path_to_write = Path(f"output_{input_fasta}")
-    
-    with open(input_fasta, "r") as file:
-        rez = {}
-        line = file.readline()
-        while line:
-            if line and line[0] == '>':
-                key_line = line.strip()
-                rez[key_line] = []
-                n_line = file.readline().strip()
-                while n_line and n_line[0] != '>':
-                    if n_line:
-                        rez[key_line].append(n_line)
-                    n_line = file.readline().strip()
-                    line = n_line
-            else:
-                line = file.readline().strip()
-        
-        with open(path_to_write, "w") as file_w:
-            for k in rez.keys():
-                file_w.write(k+'\n')
-                file_w.write(''.join(rez[k])+'\n')
-
-def parse_blast_output(input_gbk: str, genes: Union[int, tuple, list], output_fasta: str, n_before: int = 1, n_after: int = 1):
+    if output_fasta is None:
+        path_to_write = Path(input_fasta).with_name(f"output_{Path(input_fasta).name}")
+    else:
+        path_to_write = Path(output_fasta)
+
+    with modules.io_tools.open_input(input_fasta, "rt") as file, modules.fastq_tools.SeqWriter(path_to_write) as file_w:
+        for header, seq in modules.fasta_tools.iter_fasta_records(file):
+            if line_width:
+                seq = modules.fasta_tools.wrap_sequence(seq, line_width)
+            file_w.write_fasta(header, seq)
+
+def _named_genes(genes_of_interests):
+    '''
+    Yield (gene name, gene info) of (CDS number, gene info) pairs for the >gene_<name>|name_<name> headers,
+    the second and next CDS with the same name also get "cds": their CDS number.
+    '''
+    seen = set()
+    for number, gene_info in genes_of_interests:
+        if gene_info['gene'] in seen:
+            gene_info = {**gene_info, 'cds': number}
+        seen.add(gene_info['gene'])
+        yield gene_info['gene'], gene_info
+
+
+def _counted(items, stats, counter: str):
+    '''
+    Yield items and count them in stats.
+    '''
+    for item in items:
+        stats.count(counter)
+        yield item
+
+
+def parse_blast_output(input_gbk: str, genes: Union[int, tuple, list], output_fasta: str, n_before: int = 1, n_after: int = 1, use_cache: bool = True, save_json: bool = False, distance: int = None, stats=None, output_dir: str = None):
     '''
     Receives a GBK-file as input, extracts the specified number of genes before and after each gene of interest (gene), 
     and saves their protein sequence (translation) to a fasta file.
 
+    Parsed CDS records are cached in <input_gbk>.cds.cache, so next calls for the same GBK
+    do not parse it again, the cache is rebuilt when the GBK changes.
+    Without cache the GBK is streamed: CDS features are read one by one and the found genes
+    are written as soon as they are met. Neighbors are searched within one GBK record (LOCUS).
+
     Arguments:
         input_gbk: path to the input GBK file
         genes: genes of interest, near which neighbors are searched (string or collection of strings).
         n_before, n_after: number of genes before and after (>=1)
         output_fasta: output file name.
+        use_cache: read and write the parsed CDS cache
+        save_json: also save human readable version of the parsed genes to <input_gbk name>.json
+        distance: if given, genes that start within distance bp of a gene of interest are taken instead of n_before/n_after
+        stats: modules.metrics_tools.RunStats, if given stage times (parse, search, write or stream) and counters (cds, records_out) are added to it
+        output_dir: if given, output_fasta is written into this directory (created if missing), otherwise the output is output_<input_gbk name> in the current directory
 
     Returns:
-        output_fasta: a file where each sequence fits one line
+        output_fasta: a file where each sequence fits one line,
+        headers are >gene_<gene name>|name_<gene name> as before, a gene name that was already written
+        gets its CDS number (from 1 in the GBK order): >gene_<gene name>|name_<gene name>|cds_<CDS number>
 
     Raises:
-        exceptions if something went wrong.
+        KeyError: if there is no gene of interest in the GBK
+        other exceptions if something went wrong.
     '''
 
-    genes_parsed = {}
-    gene_count = 0
-    current_gene = None
-    current_translation = ""
-    in_translation = False
-    in_cds = False
-    path_to_write = Path(f"output_{input_gbk.split('.')[0]}")
-    
-    with open(input_gbk, 'r', encoding='utf-8') as file:
-        for line in file:
-            line = line.rstrip()
-            
-            if line.startswith('     CDS'):
-                if in_cds and current_gene is not None and current_translation:
-                    gene_count += 1
-                    genes_parsed[current_gene] = {
-                        'gene_count': gene_count,
-                        'gene': current_gene,
-                        'translation': current_translation
-                    }
-                
-                in_cds = True
-                current_gene = None
-                current_translation = ""
-                in_translation = False
-                continue
-            
-            if in_cds:
-                if line and not line.startswith('                     '):
-                    if current_gene is not None and current_translation:
-                        gene_count += 1
-                        genes_parsed[current_gene] = {
-                            'gene_count': gene_count,
-                            'gene': current_gene,
-                            'translation': current_translation
-                        }
-                    
-                    in_cds = line.startswith('     CDS')
-                    current_gene = None
-                    current_translation = ""
-                    in_translation = False
-                    if in_cds:
-                        continue
-                
-                if '/gene=' in line and current_gene is None:
-                    gene_part = line.split('/gene=')[1].strip()
-                    if gene_part.startswith('"'):
-                        current_gene = gene_part.split('"')[1]
-                    else:
-                        current_gene = gene_part.split()[0].strip('"')
-                
-                elif '/translation=' in line:
-                    in_translation = True
-                    translation_part = line.split('/translation=')[1].strip()
-                    if translation_part.startswith('"'):
-                        translation_part = translation_part[1:]
-                    if translation_part.endswith('"'):
-                        translation_part = translation_part[:-1]
-                        in_translation = False
-                    
-                    current_translation = translation_part
-                
-                elif in_translation:
-                    clean_line = line.strip()
-                    
-                    if '"' in clean_line:
-                        clean_line = clean_line.split('"')[0]
-                        in_translation = False
-                    
-                    if clean_line.startswith('/'):
-                        in_translation = False
-                    else:
-                        current_translation += clean_line
-
-    if in_cds and current_gene is not None and current_translation:
-        gene_count += 1
-        genes_parsed[current_gene] = {
-            'gene_count': gene_count,
-            'gene': current_gene,
-            'translation': current_translation
-        }
-
-    #print(genes_parsed)
-
-    # For future use: 
-    # to avoid new-parsing the if the data is already collected in a convenient form (dictionary)
-    with open(f'{input_gbk.split(".")[0]}.json', 'w', encoding='utf-8') as f:
-        json.dump(genes_parsed, f, ensure_ascii=False, indent=4)
-
-    print(f'saved human readable version of {input_gbk} in {input_gbk.split(".")[0]}.json')
-
-    genes_of_interests = modules.fastq_tools.find_genes_with_neighbors(genes_parsed, genes, n_before, n_after)
-
-    modules.fastq_tools.write_genes_seq_to_fasta(genes_of_interests, path_to_write)
+    if output_dir is None:
+        path_to_write = Path(f"output_{input_gbk.split('.')[0]}")
+    else:
+        path_to_write = Path(output_dir, output_fasta)
+        path_to_write.parent.mkdir(parents=True, exist_ok=True)
+
+    if not use_cache and not save_json and distance is None:
+        # the output is written atomically: a missing gene is known only at the end of the stream
+        features = modules.genbank_tools.iter_cds(input_gbk)
+        if stats is not None:
+            features = _counted(features, stats, "cds")
+        genes_of_interests = ((number, {'gene_count': number, 'gene': feature.get('gene'), 'translation': feature.get('translation')})
+                              for number, feature in modules.genbank_tools.iter_gene_neighbors(features, genes, n_before, n_after))
+        if stats is not None:
+            genes_of_interests = _counted(genes_of_interests, stats, "records_out")
+            # parsing, search and writing are interleaved in the streaming mode
+            with stats.timer("stream"):
+                modules.fastq_tools.write_genes_seq_to_fasta(_named_genes(genes_of_interests), path_to_write, atomic=True)
+        else:
+            modules.fastq_tools.write_genes_seq_to_fasta(_named_genes(genes_of_interests), path_to_write, atomic=True)
+        return None
+
+    start = time.perf_counter()
+    cds = modules.genbank_tools.load_cds(input_gbk, use_cache)
+    if stats is not None:
+        stats.add_time("parse", time.perf_counter() - start)
+        stats.count("cds", len(cds.genes))
+
+    if save_json:
+        genes_parsed = {}
+        for i, gene in enumerate(cds.genes):
+            genes_parsed[i + 1] = {'gene_count': i + 1, 'gene': gene, 'translation': cds.translation(i)}
+
+        with open(f'{input_gbk.split(".")[0]}.json', 'w', encoding='utf-8') as f:
+            json.dump(genes_parsed, f, ensure_ascii=False, indent=4)
+
+        print(f'saved human readable version of {input_gbk} in {input_gbk.split(".")[0]}.json')
+
+    # genes are found by position, so every CDS of a repeated gene name is used
+    start = time.perf_counter()
+    index = cds.gene_index()
+    genes_of_interests = {}
+    for i in index.neighbors(genes, n_before, n_after, distance):
+        genes_of_interests[i + 1] = {'gene_count': i + 1, 'gene': cds.genes[i], 'translation': cds.translation(i)}
+    searched = time.perf_counter()
+
+    modules.fastq_tools.write_genes_seq_to_fasta(_named_genes(genes_of_interests.items()), path_to_write)
+    cds.close()
+
+    if stats is not None:
+        stats.add_time("search", searched - start)
+        stats.add_time("write", time.perf_counter() - searched)
+        stats.count("records_out", len(genes_of_interests))
 
     return None
-
-    
-
-
-
-
-
-
-
-
-    
\ No newline at end of file
@@ -2,8 +2,27 @@ from typing import Union
 from os import path
 from sys import exit
 from pathlib import Path
+from functools import partial
+from itertools import islice, zip_longest
+from contextlib import ExitStack
+from collections import deque
+import argparse
+import json
+import os
+import time
 import modules.dna_rna_tools
 import modules.fastq_tools
+import modules.parallel_tools
+import modules.filter_tools
+import modules.io_tools
+import modules.checkpoint_tools
+import modules.batch_tools
+import modules.metrics_tools
+import modules.trim_tools
+import modules.dedup_tools
+import modules.qc_tools
+import modules.fasta_tools
+import bio_files_processor
 
 
 def run_dna_rna_tools(*seq_data):
@@ -58,81 +77,544 @@ def run_dna_rna_tools(*seq_data):
         return rez
 
 
-def filter_fastq(input_fastq: str, output_fastq: str, gc_bounds: Union[int, tuple] = (0, 100), length_bounds: Union[int, tuple] = (0, 2**32), quality_threshold: int = 0) -> None:
+def run_dna_rna_tools_batch(seqs, procedure: str, offsets=None, batch_size: int = 10000, workers: int = 1, pool: str = "thread"):
+    '''
+    Batch version of run_dna_rna_tools for large collections of sequences.
+
+    Sequences are taken lazily from seqs in batches of batch_size,
+    every batch is processed at once by modules.dna_rna_tools.apply_batch
+    and the results are yielded one by one in the input order.
+
+    Arguments:
+        seqs: iterable (list, generator, ...) of sequences or one buffer of concatenated sequences if offsets are given
+        procedure: name of the procedure, same as in run_dna_rna_tools (and is_dna, is_rna)
+        offsets: boundaries of the sequences in the seqs buffer, n+1 numbers for n sequences
+        batch_size: number of sequences processed at once
+        workers: number of workers, with workers > 1 batches are processed in a pool
+        pool: "thread" or "process"
+
+    Returns:
+        generator of results, one per sequence
+
+    Raises:
+        ValueError: if wrong procedure, the sequences are checked while the generator runs
+
+    Example:
+        list(run_dna_rna_tools_batch(['ATG', 'aT'], 'reverse')) # ['GTA', 'Ta']
+        list(run_dna_rna_tools_batch('ATGAT', 'complement', offsets=[0, 3, 5])) # ['TAC', 'TA']
+    '''
+    if procedure not in modules.dna_rna_tools.procedures:
+        raise ValueError(f"There are no procerure for the {procedure} method!")
+
+    if offsets is not None:
+        seqs = modules.dna_rna_tools.iter_packed(seqs, offsets)
+
+    apply = partial(modules.dna_rna_tools.apply_batch, procedure=procedure)
+    batches = _iter_batches(seqs, batch_size)
+
+    if workers > 1:
+        results = modules.parallel_tools.bounded_map(apply, batches, workers, pool=pool)
+    else:
+        results = map(apply, batches)
+
+    return (rez for batch_rez in results for rez in batch_rez)
+
+
+def _iter_batches(items, batch_size: int):
+    '''
+    Yield lists of batch_size items from an iterable (the last one may be shorter).
+    '''
+    items = iter(items)
+    while batch := list(islice(items, batch_size)):
+        yield batch
+
+
+IF_EXISTS = ("ask", "overwrite", "skip", "error", "resume")
+
+
+def _prepare_output(output_fastq: str, if_exists: str = "ask", output_dir: str = "filtered"):
+    '''
+    Return path of output_fastq in the output_dir directory (created if missing), an existing file is handled by the if_exists policy:
+        ask - ask before overwriting, exit if not confirmed
+        overwrite - remove the file
+        skip - return None
+        error - raise FileExistsError
+        resume - keep the file, filter_fastq continues it from its checkpoint
+    '''
+    if if_exists not in IF_EXISTS: raise ValueError(f"There are no policy {if_exists}, use one of {', '.join(IF_EXISTS)}")
+
+    path_to_write = Path(output_dir, f"{output_fastq}")
+    path_to_write.parent.mkdir(parents=True, exist_ok=True)
+
+    if path_to_write.is_file():
+        match if_exists:
+            case "ask":
+                is_overwtire = input(f"The file {path_to_write} already exists, want to overwrite it? Y/N")
+                if is_overwtire in {'Y', 'y'}: path_to_write.unlink()
+                else: exit()
+            case "overwrite":
+                path_to_write.unlink()
+            case "skip":
+                return None
+            case "error":
+                raise FileExistsError(f"The file {path_to_write} already exists")
+
+    return path_to_write
+
+
+def _tracked_blocks(reader, done: deque, stats=None):
+    '''
+    Yield blocks of the reader, (input offset, records) after every block is appended to done.
+    With stats the reading time and the input size are added to it.
+    '''
+    start = time.perf_counter()
+    for block in reader.blocks():
+        done.append((reader.offset, reader.records))
+        if stats is not None:
+            stats.add_time("read", time.perf_counter() - start)
+            stats.count("bytes_in", len(block))
+        yield block
+        start = time.perf_counter()
+
+
+def _remove_duplicates(text: str, dedup, stats=None, qc_filtered=None) -> str:
+    '''
+    Return fastq text without the reads already seen by dedup, with stats the time and the number of duplicates are added to it,
+    the remaining reads are added to qc_filtered.
+    '''
+    start = time.perf_counter()
+    duplicates = dedup.duplicates
+    records = dedup.filter_new(modules.fastq_tools.split_fastq_block(text))
+    text = modules.fastq_tools.format_fastq(records)
+    if qc_filtered is not None:
+        qc_filtered.update(records)
+    if stats is not None:
+        removed = dedup.duplicates - duplicates
+        stats.add_time("dedup", time.perf_counter() - start)
+        stats.count("duplicates", removed)
+        stats.count("records_out", -removed)
+    return text
+
+
+def filter_fastq(input_fastq: str, output_fastq: str, gc_bounds: Union[int, tuple] = (0, 100), length_bounds: Union[int, tuple] = (0, 2**32), quality_threshold: int = 0, chunk_size: int = 2**22, flush_size: int = 2**22, atomic: bool = False, workers: int = 1, phred_offset: int = 33, predicates: tuple = (), if_exists: str = "ask", checkpoint_every: int = 2**28, stats=None, trimmer=None, dedup=None, qc=None, qc_filtered=None, output_dir: str = "filtered") -> None:
     '''
     A function working with fastq sequences.
     All bounds is included.
-    Quality in Phred33.
+    Quality in Phred33 (or Phred64 with phred_offset=64).
 
     Input:
-        input_fastq: file with the input sequences
-        output_fastq: file to store filtered sequences a special directory "filtered" will be created for it
+        input_fastq: file with the input sequences, may be compressed (gzip, bgzip, bzip2, zstd)
+        output_fastq: file to store filtered sequences in the output_dir directory (created if missing), compressed if it ends with .gz, .bz2 or .zst
 
     Arguments:
         gc_bounds: tuple = (0, 100) # bound included
         length_bounds: tuple = (0, 2**32) # bound included
         quality_threshold: int = 0 # in phred33
+        chunk_size: int = 2**22 # number of input bytes read at once, the chunk cut on record boundaries is one block: the unit of filtering, of worker tasks and of checkpoints
+        flush_size: int = 2**22 # number of characters buffered before writing to the output_fastq
+        atomic: bool = False # write to a temporary file and rename it to output_fastq at the end
+        workers: int = 1 # number of processes, with workers > 1 record-aligned blocks of input_fastq are filtered in a process pool, output keeps the input order
+        phred_offset: int = 33 # 33 for phred33 or 64 for phred64 quality strings
+        predicates: tuple = () # additional criteria, callables record -> bool, e.g. modules.filter_tools.MaxNFraction(0.1)
+        if_exists: str = "ask" # what to do if output_fastq exists: "ask", "overwrite", "skip", "error" or "resume" (continue an interrupted run from its checkpoint)
+        checkpoint_every: int = 2**28 # minimal number of input bytes between checkpoints (<output_fastq>.ckpt), taken after whole blocks, None to disable
+        trimmer: modules.trim_tools.Trimmer = None # trim reads (adapters, low-quality ends, sliding window) before the criteria, trimmed reads are written
+        dedup: modules.dedup_tools.Deduplicator = None # remove duplicate reads among the reads that passed the criteria, the first read is kept
+        qc: modules.qc_tools.QcStats = None # collect QC statistics (per-position quality, GC and length histograms, N content) of the input reads
+        qc_filtered: modules.qc_tools.QcStats = None # the same for the written reads
+        stats: modules.metrics_tools.RunStats = None # collect stage times (read, parse, filter, format, write), records and bytes in/out and per-criterion checked/rejected counts
+        output_dir: str = "filtered" # directory of output_fastq
+
+    All criteria are compiled once by modules.filter_tools.compile_filters and checked cheapest first
+    (length, GC, quality, then predicates by their cost), a read is dropped at the first failed criterion.
+    With a trimmer reads are trimmed first, the criteria are checked on the trimmed reads.
+
+    Checkpoints save the input offset and the output size after a flush, an interrupted run started again
+    with if_exists="resume" truncates the output to the saved size and continues from the saved offset.
+    The first checkpoint (offset 0) is written before the first output byte and the checkpoint is removed
+    only when the run is complete, so an output with a checkpoint is unfinished: resume continues it and
+    skip does not skip it. An existing output without a checkpoint may be complete or not, resume filters it
+    again from the start. Checkpoints are not written for atomic or compressed output
+    and with dedup or qc (seen reads and QC tables are not saved in the checkpoint).
+
+    With workers > 1 the parse, filter and format times are summed over the workers.
 
     Intermediate:
-        seqs: dict of a fastq sequences key: sequence_name string, value: tupple: (sequence: str, quality: str)
+        block: record-aligned fastq text read by FastqReader
 
     Returns:
         dictionary consisting only of sequences that satisfy all conditions.
 
     Raises:
+        FileExistsError: if output_fastq exists and if_exists="error"
+        ValueError: if resume is impossible (no checkpoints or a checkpoint of another input or parameters)
         exceptions if something went wrong.
     '''
 
-    output_dir = Path("filtered")
-    output_dir.mkdir(exist_ok=True)
+    if if_exists == "skip" and modules.checkpoint_tools.checkpoint_path(Path(output_dir, output_fastq)).is_file():
+        # the run writing this output was interrupted, it is not skipped
+        print(f"the file {output_fastq} is unfinished, it is filtered again")
+        if_exists = "overwrite"
+
+    path_to_write = _prepare_output(output_fastq, if_exists, output_dir)
+    if path_to_write is None:
+        print(f"the file {output_fastq} already exists, skipped")
+        return None
+
+    fastq_filter = modules.filter_tools.compile_filters(gc_bounds, length_bounds, quality_threshold, phred_offset, predicates, trimmer)
+
+    checkpoint = None
+    if checkpoint_every is not None and not atomic and dedup is None and qc is None and qc_filtered is None and modules.io_tools.compression_from_name(path_to_write) is None:
+        params = {"gc_bounds": gc_bounds, "length_bounds": length_bounds, "quality_threshold": quality_threshold, "phred_offset": phred_offset, "criteria": fastq_filter.names, "trimmer": repr(trimmer)}
+        checkpoint = modules.checkpoint_tools.Checkpoint(path_to_write, input_fastq, params, checkpoint_every)
+    elif if_exists == "resume":
+        raise ValueError("resume needs checkpoints: checkpoint_every, atomic=False, no dedup or qc and not compressed output_fastq")
+
+    state = None
+    if if_exists == "resume":
+        state = checkpoint.load()
+        if state is None and path_to_write.is_file():
+            # without a checkpoint it is unknown how much of the output was written
+            print(f"there is no checkpoint of {output_fastq}, it is filtered again from the start")
+        if state is not None:
+            os.truncate(path_to_write, state["output_size"])
+    elif checkpoint is not None:
+        checkpoint.remove()
+
+    mode = "w" if state is None else "a"
+    with modules.io_tools.open_input(input_fastq, "rb") as file, modules.fastq_tools.SeqWriter(path_to_write, flush_size, atomic, mode, encoding="latin-1") as writer:
+        if checkpoint is not None and state is None:
+            # marks the output as unfinished until the run is complete
+            checkpoint.save(writer, 0, 0)
+        reader = modules.fastq_tools.FastqReader(file, chunk_size=chunk_size)
+        if state is not None:
+            modules.checkpoint_tools.skip_input(file, state["input_offset"])
+            reader.offset, reader.records = state["input_offset"], state["records"]
+
+        measure = stats is not None or qc is not None or qc_filtered is not None
+        if measure:
+            qc_spec = qc.spec() if qc is not None else None
+            # with dedup the written reads are known only after it, they are added to qc_filtered in this process
+            qc_filtered_spec = qc_filtered.spec() if qc_filtered is not None and dedup is None else None
+            filter_block = partial(modules.fastq_tools.filter_fastq_block_stats, fastq_filter=fastq_filter, qc_spec=qc_spec, qc_filtered_spec=qc_filtered_spec)
+        else:
+            filter_block = partial(modules.fastq_tools.filter_fastq_block, fastq_filter=fastq_filter)
+        done = deque()
+        blocks = _tracked_blocks(reader, done, stats)
+        if workers > 1:
+            results = modules.parallel_tools.bounded_map(filter_block, blocks, workers)
+        else:
+            results = map(filter_block, blocks)
+
+        for text in results:
+            if measure:
+                text, part = text
+                if stats is not None:
+                    stats.update(part)
+                if "qc" in part:
+                    qc.merge(part["qc"])
+                if "qc_filtered" in part:
+                    qc_filtered.merge(part["qc_filtered"])
+            if dedup is not None:
+                text = _remove_duplicates(text, dedup, stats, qc_filtered)
+
+            if stats is None:
+                writer.write(text)
+            else:
+                with stats.timer("write"):
+                    writer.write(text)
+                stats.count("bytes_out", len(text))
+                stats.tick()
+            offset, records = done.popleft()
+            if checkpoint is not None:
+                checkpoint.update(writer, offset, records)
+
+    if checkpoint is not None:
+        checkpoint.remove()
+
+    print(f"processing of the {input_fastq} is complete, filtering results are saved in {path_to_write}")
 
-    path_to_write = Path("filtered", f"{output_fastq}")
-    if path_to_write.is_file():
-        is_overwtire = input(f"The file {path_to_write} already exists, want to overwrite it? Y/N")
-        if is_overwtire in {'Y', 'y'}: path_to_write.unlink()
-        else: exit()
-            
-    status = True
-    
-    with open(input_fastq, "r") as file:
-        while status:
-            seqs = modules.fastq_tools.read_seq_from_file(file)
-            if not status:
-                print(f"processing of the {input_fastq} is complete, filtering results are saved in {output_fastq}")
-                break
-            
-            if len(seqs.keys()) == 0:
-                print(f"processing of the {input_fastq} is complete, filtering results are saved in {output_fastq}")
-                break
-            
-
-            if not isinstance(seqs, dict): raise TypeError("seqs must be a dictionary")
-            if isinstance(gc_bounds, int): gc_bounds = (0, gc_bounds)
-            if isinstance(length_bounds, int): length_bounds = (0, length_bounds)
-        
-            rez_gc_bounds = {}
-        
-            for key in seqs.keys():
-                if (gc_bounds[0] <= modules.fastq_tools.gc_count(seqs[key][0])) and (modules.fastq_tools.gc_count(seqs[key][0]) <= gc_bounds[1]):
-                    rez_gc_bounds[key] = seqs[key]
-        
-            rez_length_bounds = {}
-        
-            for key in rez_gc_bounds.keys():
-                if (length_bounds[0] <= len(seqs[key][0])) and (len(seqs[key][0]) <= length_bounds[1]):
-                    rez_length_bounds[key] = rez_gc_bounds[key]
-        
-            rez_quality_threshold = {}
-        
-            for key in rez_length_bounds.keys():
-                if (modules.fastq_tools.average_quality(seqs[key]) >= quality_threshold):
-                    rez_quality_threshold[key] = rez_length_bounds[key]
-
-            if len(rez_quality_threshold.keys())>0: modules.fastq_tools.write_seq_to_fle(path_to_write, rez_quality_threshold)
-            else: continue
-    
     return None
 
 
+def filter_fastq_paired(input_r1: str, input_r2: str, output_r1: str, output_r2: str, gc_bounds: Union[int, tuple] = (0, 100), length_bounds: Union[int, tuple] = (0, 2**32), quality_threshold: int = 0, singletons: str = None, batch_size: int = 10000, flush_size: int = 2**22, atomic: bool = False, workers: int = 1, phred_offset: int = 33, predicates: tuple = (), check_ids: bool = True, if_exists: str = "ask", trimmer=None, output_dir: str = "filtered") -> None:
+    '''
+    Paired-end version of filter_fastq.
+    R1 and R2 are read in lockstep in batches of batch_size mates, in one pass with bounded memory.
+    A pair is kept only if both mates pass all criteria, so the outputs stay synchronized.
+
+    Input:
+        input_r1, input_r2: files with the first and the second mates, may be compressed
+        output_r1, output_r2: files to store filtered mates in the output_dir directory
+
+    Arguments:
+        gc_bounds, length_bounds, quality_threshold, phred_offset, predicates: criteria as in filter_fastq, applied to every mate
+        singletons: str = None # file in the output_dir directory for mates that passed while the other mate failed, dropped by default
+        batch_size: int = 10000 # number of pairs read at once
+        flush_size: int = 2**22 # number of characters buffered before writing to each output
+        atomic: bool = False # write to temporary files and rename them at the end
+        workers: int = 1 # number of processes, with workers > 1 pairs of batches are filtered in a process pool, output keeps the input order
+        check_ids: bool = True # check that mates have the same read name (without /1, /2 and the description)
+        if_exists: str = "ask" # what to do if an output exists: "ask", "overwrite", "skip" or "error", as in filter_fastq (resume is not supported)
+        trimmer: modules.trim_tools.Trimmer = None # trim every mate before the criteria, as in filter_fastq
+        output_dir: str = "filtered" # directory of the outputs
+
+    Returns:
+        None, filtered mates are saved to output_r1 and output_r2.
+
+    Raises:
+        ValueError: if R1 and R2 have different number of reads or mates are out of sync
+    '''
+    if if_exists == "resume": raise ValueError("resume is not supported for paired-end filtering")
+
+    outputs = [output_r1, output_r2] if singletons is None else [output_r1, output_r2, singletons]
+    paths = [_prepare_output(output, if_exists, output_dir) for output in outputs]
+    if None in paths:
+        print(f"the files {', '.join(outputs)} already exist, skipped")
+        return None
+
+    fastq_filter = modules.filter_tools.compile_filters(gc_bounds, length_bounds, quality_threshold, phred_offset, predicates, trimmer)
+    filter_pairs = partial(modules.fastq_tools.filter_fastq_pairs, fastq_filter=fastq_filter, check_ids=check_ids)
+
+    with ExitStack() as stack:
+        file_r1 = stack.enter_context(modules.io_tools.open_input(input_r1, "rb"))
+        file_r2 = stack.enter_context(modules.io_tools.open_input(input_r2, "rb"))
+        writers = [stack.enter_context(modules.fastq_tools.SeqWriter(path, flush_size, atomic, encoding="latin-1")) for path in paths]
+
+        batches = zip_longest(modules.fastq_tools.FastqReader(file_r1, batch_size).batches(), modules.fastq_tools.FastqReader(file_r2, batch_size).batches(), fillvalue=[])
+
+        if workers > 1:
+            results = modules.parallel_tools.bounded_map(filter_pairs, batches, workers)
+        else:
+            results = map(filter_pairs, batches)
+
+        for texts in results:
+            for writer, text in zip(writers, texts):
+                writer.write(text)
+
+    print(f"processing of the {input_r1} and {input_r2} is complete, filtering results are saved in {output_r1} and {output_r2}")
+
+    return None
+
+
+def _filter_fastq_job(job, options: dict) -> dict:
+    '''
+    Filter job.input to job.output by filter_fastq, return the record counters.
+
+    options are keyword arguments of filter_fastq plus "trimmer" (Trimmer arguments or None),
+    "dedup" (Deduplicator arguments or None), "qc" (save QC of the input to <output>.qc.json)
+    and "save_stats" (save RunStats to <output>.stats.json).
+    '''
+    options = dict(options)
+    trimmer_options, dedup_options = options.pop("trimmer"), options.pop("dedup")
+    qc = modules.qc_tools.QcStats() if options.pop("qc") else None
+    save_stats = options.pop("save_stats")
+
+    output = Path(job.output)
+    if options["if_exists"] == "skip" and output.is_file() and not modules.checkpoint_tools.checkpoint_path(output).is_file():
+        return {"skipped": True}
+
+    trimmer = modules.trim_tools.Trimmer(**trimmer_options) if trimmer_options else None
+    stats = modules.metrics_tools.RunStats()
+    with ExitStack() as stack:
+        dedup = stack.enter_context(modules.dedup_tools.Deduplicator(**dedup_options)) if dedup_options else None
+        filter_fastq(job.input, output.name, output_dir=output.parent, stats=stats, trimmer=trimmer, dedup=dedup, qc=qc, **options)
+
+    if qc is not None:
+        qc.to_json(f"{output}.qc.json")
+    if save_stats:
+        stats.to_json(f"{output}.stats.json")
+    return {name: stats.counters[name] for name in ("records_in", "records_out", "duplicates") if name in stats.counters}
+
+
+def _convert_fasta_job(job, line_width: int = None) -> None:
+    '''
+    Convert job.input to job.output by convert_multiline_fasta_to_oneline.
+    '''
+    bio_files_processor.convert_multiline_fasta_to_oneline(job.input, job.output, line_width)
+
+
+def _parse_gbk_job(job, options: dict) -> dict:
+    '''
+    Write neighbors of the genes of job.input to job.output by parse_blast_output, return the numbers of CDS and written genes.
+    '''
+    stats = modules.metrics_tools.RunStats()
+    output = Path(job.output)
+    bio_files_processor.parse_blast_output(job.input, output_fasta=output.name, output_dir=output.parent, stats=stats, **options)
+    return dict(stats.counters)
+
+
+def _seq_op_job(job, procedure: str, batch_size: int = 10000) -> dict:
+    '''
+    Apply procedure to every sequence of the fasta job.input, write a fasta of the results
+    or, for the is_* checks, lines "<header>\\t<True/False>" to job.output.
+    '''
+    check = procedure.startswith("is_")
+    records = 0
+    with modules.io_tools.open_input(job.input, "rt") as file, modules.fastq_tools.SeqWriter(job.output) as writer:
+        for batch in _iter_batches(modules.fasta_tools.iter_fasta_records(file), batch_size):
+            results = modules.dna_rna_tools.apply_batch([seq for _, seq in batch], procedure)
+            for (header, _), rez in zip(batch, results):
+                if check:
+                    writer.write(f"{header[1:]}\t{rez}\n")
+                else:
+                    writer.write_fasta(header, rez)
+            records += len(batch)
+    return {"records": records}
+
+
+def _base_name(name: str) -> str:
+    '''
+    Return file name without the compression extension and the format extension: reads.fastq.gz -> reads.
+    '''
+    if modules.io_tools.compression_from_name(name) is not None:
+        name = Path(name).stem
+    return Path(name).stem
+
+
+def _add_batch_arguments(parser, output_dir: str = None) -> None:
+    '''
+    Add arguments of the inputs, outputs and the job pool to a subcommand parser.
+    '''
+    parser.add_argument("inputs", nargs="*", help="input files or glob patterns (quoted patterns are expanded here, ** matches subdirectories)")
+    parser.add_argument("-m", "--manifest", action="append", default=[], help="file with one input per line, optionally followed by a tab and the output name")
+    where = f"default {output_dir}" if output_dir is not None else "default next to every input"
+    parser.add_argument("-o", "--output-dir", default=output_dir, help=f"directory of the outputs ({where})")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of files processed at once in a process pool (default 1)")
+    parser.add_argument("--fail-fast", action="store_true", help="do not start new files after a failed one")
+    parser.add_argument("--report", help="save JSON with the time, status and counters of every file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print progress of every file")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    '''
+    Return parser of the command line: subcommands filter-fastq, convert-fasta, parse-gbk and seq-op.
+    '''
+    parser = argparse.ArgumentParser(prog="main.py", description="Batch processing of sequence files, every input file is one job of a process pool.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("filter-fastq", help="filter fastq files by GC content, length and quality (filter_fastq)")
+    _add_batch_arguments(command, "filtered")
+    command.add_argument("--gc-bounds", type=float, nargs=2, default=(0, 100), metavar=("MIN", "MAX"), help="GC content bounds, percent (default 0 100)")
+    command.add_argument("--length-bounds", type=int, nargs=2, default=(0, 2**32), metavar=("MIN", "MAX"), help="read length bounds")
+    command.add_argument("--quality-threshold", type=float, default=0, help="minimal mean read quality (default 0)")
+    command.add_argument("--phred-offset", type=int, choices=(33, 64), default=33)
+    command.add_argument("--max-n-fraction", type=float, help="maximal fraction of N in a read")
+    command.add_argument("--workers", type=int, default=1, help="number of processes filtering one file (default 1)")
+    command.add_argument("--chunk-size", type=int, default=2**22, help="number of input bytes in a block, the unit of filtering, worker tasks and checkpoints (default 4194304)")
+    command.add_argument("--if-exists", choices=("overwrite", "skip", "error", "resume"), default="error", help="what to do with an existing output (default error)")
+    command.add_argument("--atomic", action="store_true", help="write to a temporary file and rename it at the end")
+    command.add_argument("--no-checkpoints", action="store_true", help="do not write checkpoints (no resume)")
+    command.add_argument("--adapter", action="append", default=[], help="adapter sequence to trim, may be repeated")
+    command.add_argument("--window", type=int, default=4, help="sliding window size (default 4)")
+    command.add_argument("--window-quality", type=int, help="cut reads at the first window with mean quality below it")
+    command.add_argument("--leading", type=int, help="trim 5' bases with quality below it")
+    command.add_argument("--trailing", type=int, help="trim 3' bases with quality below it")
+    command.add_argument("--min-length", type=int, default=1, help="drop reads shorter than it after trimming (default 1)")
+    command.add_argument("--dedup", choices=("exact", "rc"), help="remove duplicate reads, rc - also reverse complement duplicates")
+    command.add_argument("--dedup-method", choices=("compact", "set", "bloom", "disk"), default="compact",
+                         help="compact: about 8.5 bytes per unique read (default), set: faster, about 70 bytes per read, bloom: fixed size, may drop unique reads, disk: spills to temporary files")
+    command.add_argument("--dedup-capacity", type=int, default=10**7, help="expected number of unique reads of the bloom method (default 10000000, about 18 MB)")
+    command.add_argument("--qc", action="store_true", help="save QC statistics of the input reads to <output>.qc.json")
+    command.add_argument("--stats", action="store_true", help="save run statistics to <output>.stats.json")
+
+    command = commands.add_parser("convert-fasta", help="write multiline fasta files with one line per sequence (convert_multiline_fasta_to_oneline)")
+    _add_batch_arguments(command)
+    command.add_argument("--line-width", type=int, help="re-wrap sequences to lines of this width instead of one line")
+
+    command = commands.add_parser("parse-gbk", help="write proteins of the neighbors of genes of GBK files to fasta (parse_blast_output)")
+    _add_batch_arguments(command)
+    command.add_argument("-g", "--genes", nargs="+", required=True, help="genes of interest")
+    command.add_argument("--n-before", type=int, default=1, help="number of genes before (default 1)")
+    command.add_argument("--n-after", type=int, default=1, help="number of genes after (default 1)")
+    command.add_argument("--distance", type=int, help="take genes starting within this distance (bp) instead of n-before/n-after")
+    command.add_argument("--no-cache", action="store_true", help="do not read or write the parsed CDS cache")
+
+    command = commands.add_parser("seq-op", help="apply a DNA/RNA procedure to every sequence of fasta files or to --seq sequences")
+    command.add_argument("procedure", choices=list(modules.dna_rna_tools.procedures))
+    _add_batch_arguments(command)
+    command.add_argument("-s", "--seq", action="append", default=[], help="sequence to process and print instead of files, may be repeated")
+
+    return parser
+
+
+def main(argv=None) -> int:
+    '''
+    Run the command line, return the exit code: 0 if all files are done, 1 if some failed.
+
+    Example:
+        python main.py filter-fastq "run1/*.fastq.gz" -o run1_filtered --gc-bounds 20 80 --quality-threshold 20 -j 8
+        python main.py parse-gbk genomes/*.gbk -g dnaA gyrB --n-before 2 --n-after 2 -j 4
+        python main.py seq-op reverse_complement -s ATG -s aT
+    '''
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+
+    match args.command:
+        case "filter-fastq":
+            trimmer = None
+            if args.adapter or args.window_quality is not None or args.leading is not None or args.trailing is not None or args.min_length > 1:
+                trimmer = {"window": args.window, "window_quality": args.window_quality, "leading": args.leading, "trailing": args.trailing,
+                           "adapters": args.adapter, "min_length": args.min_length, "phred_offset": args.phred_offset}
+            options = {
+                "gc_bounds": tuple(args.gc_bounds), "length_bounds": tuple(args.length_bounds), "quality_threshold": args.quality_threshold,
+                "chunk_size": args.chunk_size, "atomic": args.atomic, "workers": args.workers, "phred_offset": args.phred_offset,
+                "predicates": () if args.max_n_fraction is None else (modules.filter_tools.MaxNFraction(args.max_n_fraction),),
+                "if_exists": args.if_exists, "checkpoint_every": None if args.no_checkpoints else 2**28,
+                "trimmer": trimmer, "dedup": {"mode": args.dedup, "method": args.dedup_method, "capacity": args.dedup_capacity} if args.dedup else None,
+                "qc": args.qc, "save_stats": args.stats,
+            }
+            func = partial(_filter_fastq_job, options=options)
+            default_name = str
+        case "convert-fasta":
+            func = partial(_convert_fasta_job, line_width=args.line_width)
+            default_name = lambda name: f"output_{name}"
+        case "parse-gbk":
+            options = {"genes": args.genes, "n_before": args.n_before, "n_after": args.n_after, "distance": args.distance, "use_cache": not args.no_cache}
+            func = partial(_parse_gbk_job, options=options)
+            default_name = lambda name: f"output_{name.split('.')[0]}.fasta"
+        case "seq-op":
+            if args.seq:
+                func = modules.dna_rna_tools.procedures[args.procedure]
+                failed = 0
+                for seq in args.seq:
+                    try:
+                        print(f"{seq}\t{func(seq)}")
+                    except ValueError as error:
+                        print(f"{seq}\terror: {error}")
+                        failed += 1
+                return 1 if failed else 0
+            func = partial(_seq_op_job, procedure=args.procedure)
+            extension = "tsv" if args.procedure.startswith("is_") else "fasta"
+            default_name = lambda name: f"{_base_name(name)}.{args.procedure}.{extension}"
+
+    try:
+        jobs = modules.batch_tools.collect_jobs(args.inputs, args.manifest)
+        jobs = modules.batch_tools.assign_outputs(jobs, args.output_dir, default_name)
+    except (FileNotFoundError, ValueError) as error:
+        parser.error(str(error))
+    if not jobs:
+        parser.error("no input files, give files, glob patterns or --manifest")
+    for job in jobs:
+        Path(job.output).parent.mkdir(parents=True, exist_ok=True)
+
+    # one job per process is in flight, so after a failure with --fail-fast no queued file is started
+    results = modules.batch_tools.run_jobs(func, jobs, args.jobs, in_flight=args.jobs, progress=None if args.quiet else print, keep_going=not args.fail_fast)
+    if args.quiet:
+        for rez in results:
+            if rez["status"] == "failed":
+                print(f"{rez['input']} failed: {rez['error']}")
+    summary = modules.batch_tools.summarize(results, time.perf_counter() - start)
+    print(f"{summary['done']} of {summary['jobs']} files done, {summary['failed']} failed, {summary['cancelled']} not started, "
+          f"{summary['elapsed']:.1f} s elapsed, {summary['seconds']:.1f} s of jobs")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as file_w:
+            json.dump({"command": args.command, "summary": summary, "jobs": results}, file_w, indent=4)
+
+    return 1 if summary["failed"] else 0
+
+
 if __name__ == "__main__":
-    pass
+    exit(main())
@@ -0,0 +1,224 @@
+'''
+    Running one function over many input files in a bounded process pool.
+
+    Inputs are glob patterns (** matches subdirectories) or manifests: text files with one input
+    per line, optionally followed by a tab and the output name, empty lines and lines starting
+    with # are skipped, relative paths are relative to the manifest directory.
+    Every input file is one job. At most in_flight jobs are submitted to the pool at once,
+    a job is reported as soon as it finishes (with its time and the overall progress and ETA),
+    and a failed job does not stop the others, its error is kept in its result.
+
+    Classes:
+        Job: input file and output path of one job
+
+    Functions:
+        expand_inputs: input files of glob patterns and paths
+        read_manifest: jobs of a manifest file
+        collect_jobs: jobs of patterns and manifests
+        assign_outputs: set output paths of jobs, check that they are unique
+        run_jobs: run a function for every job in a process pool, report progress
+        summarize: totals of job results
+
+    Example:
+        jobs = assign_outputs(collect_jobs(["run1/*.fastq.gz"], ["samples.tsv"]), "filtered", lambda name: name)
+        results = run_jobs(partial(filter_job, options=options), jobs, workers=8)
+        summarize(results) # {"jobs": ..., "done": ..., "failed": ..., "seconds": ...}
+
+    Raises:
+        FileNotFoundError: if a pattern matches no file or a manifest input does not exist
+        ValueError: if wrong number of workers or outputs of jobs collide
+'''
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import NamedTuple
+import glob
+import time
+
+
+class Job(NamedTuple):
+    '''
+    Input file and output path (None until assign_outputs) of one job.
+    '''
+    input: str
+    output: str = None
+
+
+def expand_inputs(patterns) -> list:
+    '''
+    Return input files of glob patterns and plain paths, in the order of patterns (matches of a pattern are sorted),
+    every file is taken once.
+
+    Raises:
+        FileNotFoundError: if a pattern matches no file or a path does not exist
+    '''
+    files = {}
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = [match for match in sorted(glob.glob(pattern, recursive=True)) if Path(match).is_file()]
+            if not matches: raise FileNotFoundError(f"no files match {pattern}")
+        else:
+            if not Path(pattern).is_file(): raise FileNotFoundError(f"There is no file {pattern}")
+            matches = [pattern]
+        files.update(dict.fromkeys(matches))
+    return list(files)
+
+
+def read_manifest(manifest: str) -> list:
+    '''
+    Return jobs of a manifest: lines "input" or "input<TAB>output".
+
+    Raises:
+        FileNotFoundError: if an input does not exist
+    '''
+    root = Path(manifest).parent
+    jobs = []
+    with open(manifest, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split("\t")
+            input_file = root / fields[0].strip()
+            if not input_file.is_file(): raise FileNotFoundError(f"There is no file {input_file} (manifest {manifest})")
+            output = fields[1].strip() if len(fields) > 1 and fields[1].strip() else None
+            jobs.append(Job(str(input_file), output))
+    return jobs
+
+
+def collect_jobs(patterns=(), manifests=()) -> list:
+    '''
+    Return jobs of the inputs of glob patterns followed by the jobs of manifests.
+    '''
+    jobs = [Job(file) for file in expand_inputs(patterns)]
+    for manifest in manifests:
+        jobs.extend(read_manifest(manifest))
+    return jobs
+
+
+def assign_outputs(jobs, output_dir: str = None, default_name=None) -> list:
+    '''
+    Return jobs with output paths in output_dir (next to the input if None).
+    Output names of manifests are kept, other jobs get default_name(input file name).
+
+    Raises:
+        ValueError: if two jobs have the same output or an output is an input file
+    '''
+    inputs = {Path(job.input).resolve() for job in jobs}
+    outputs = set()
+    rez = []
+    for job in jobs:
+        name = job.output if job.output is not None else default_name(Path(job.input).name)
+        output = Path(output_dir if output_dir is not None else Path(job.input).parent, name)
+        resolved = output.resolve()
+        if resolved in outputs: raise ValueError(f"several jobs write to {output}, set output names in a manifest")
+        if resolved in inputs: raise ValueError(f"output {output} is an input file, choose another output directory")
+        outputs.add(resolved)
+        rez.append(Job(job.input, str(output)))
+    return rez
+
+
+def _run_job(func, job: Job) -> dict:
+    '''
+    Run func(job), return its result dict with the status, time and error.
+    '''
+    start = time.perf_counter()
+    rez = {"input": job.input, "output": job.output, "status": "done", "seconds": 0.0, "result": None, "error": None}
+    try:
+        rez["result"] = func(job)
+    except Exception as error:
+        rez["status"] = "failed"
+        rez["error"] = f"{type(error).__name__}: {error}"
+    rez["seconds"] = time.perf_counter() - start
+    return rez
+
+
+def format_progress(rez: dict, finished: int, total: int, elapsed: float) -> str:
+    '''
+    Return progress line of a finished job: number of finished jobs, the job time and result or error, elapsed time and ETA.
+    '''
+    eta = elapsed / finished * (total - finished)
+    if rez["status"] == "done":
+        details = ", ".join(f"{name}={value}" for name, value in (rez["result"] or {}).items())
+        line = f"[{finished}/{total}] {rez['input']} -> {rez['output']} done in {rez['seconds']:.2f} s"
+        if details:
+            line += f" ({details})"
+    else:
+        line = f"[{finished}/{total}] {rez['input']} {rez['status']}: {rez['error']}"
+    return f"{line} | elapsed {elapsed:.1f} s, eta {eta:.1f} s"
+
+
+def run_jobs(func, jobs, workers: int = 1, in_flight: int = None, progress=print, keep_going: bool = True) -> list:
+    '''
+    Run func(job) for every job, with workers > 1 in a process pool, at most in_flight jobs are submitted at once.
+
+    Arguments:
+        func: picklable function Job -> dict or None (module-level function or functools.partial of it)
+        jobs: list of Job
+        workers: number of processes, jobs are run in this process if workers = 1
+        in_flight: maximum number of submitted but not finished jobs, by default 2*workers
+        progress: callable called with a progress line (format_progress) when a job finishes, None for silence
+        keep_going: run the remaining jobs after a failed one, otherwise they are not started ("cancelled" status)
+
+    Returns:
+        list of dicts input, output, status ("done", "failed" or "cancelled"), seconds, result, error in the order of jobs
+
+    Raises:
+        ValueError: if wrong number of workers or in_flight
+    '''
+    if workers < 1: raise ValueError("workers must be positive")
+    if in_flight is None: in_flight = 2 * workers
+    if in_flight < 1: raise ValueError("in_flight must be positive")
+
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+    start = time.perf_counter()
+    finished = 0
+    failed = False
+
+    def report(i: int, rez: dict) -> None:
+        nonlocal finished, failed
+        results[i] = rez
+        finished += 1
+        failed = failed or rez["status"] == "failed"
+        if progress is not None:
+            progress(format_progress(rez, finished, len(jobs), time.perf_counter() - start))
+
+    if workers == 1:
+        for i, job in enumerate(jobs):
+            if failed and not keep_going:
+                break
+            report(i, _run_job(func, job))
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            pending = {}
+            queue = iter(enumerate(jobs))
+            while True:
+                while len(pending) < in_flight and (keep_going or not failed):
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    i, job = item
+                    pending[executor.submit(_run_job, func, job)] = i
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    report(pending.pop(future), future.result())
+
+    for i, job in enumerate(jobs):
+        if results[i] is None:
+            results[i] = {"input": job.input, "output": job.output, "status": "cancelled", "seconds": 0.0, "result": None, "error": None}
+    return results
+
+
+def summarize(results: list, elapsed: float = None) -> dict:
+    '''
+    Return numbers of jobs by status, the sum of job times (seconds) and the elapsed wall time if given.
+    '''
+    rez = {"jobs": len(results), "done": 0, "failed": 0, "cancelled": 0, "seconds": sum(job["seconds"] for job in results)}
+    for job in results:
+        rez[job["status"]] += 1
+    if elapsed is not None:
+        rez["elapsed"] = elapsed
+    return rez
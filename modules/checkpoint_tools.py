@@ -0,0 +1,131 @@
+'''
+    Checkpoints of long streaming runs.
+
+    A checkpoint is a small JSON file next to the output (<output>.ckpt) with the input byte offset
+    and the output size at a moment when every record before the offset was written and flushed.
+    An interrupted run is resumed by truncating the output to the saved size and seeking the input
+    to the saved offset. The checkpoint also keeps the input size, mtime and the run parameters,
+    a checkpoint of another input or other parameters is never used.
+
+    Classes:
+        Checkpoint: periodic checkpoints of one output file
+
+    Functions:
+        checkpoint_path: path of the checkpoint of an output file
+        skip_input: move an opened input file forward to an offset
+
+    Example:
+        checkpoint = Checkpoint("filtered/out.fastq", "reads.fastq", {"gc_bounds": [20, 80]})
+        state = checkpoint.load() # None or dict with input_offset, output_size, records
+        ...
+        checkpoint.update(writer, reader.offset, reader.records) # saves every `every` bytes of input
+        ...
+        checkpoint.remove() # the run is complete
+
+    Raises:
+        ValueError: if the checkpoint belongs to another input or other parameters
+'''
+
+from pathlib import Path
+import json
+import os
+
+_VERSION = 1
+
+
+def checkpoint_path(output_file: str) -> Path:
+    '''
+    Return path of the checkpoint of output_file: <output_file>.ckpt.
+    '''
+    output = Path(output_file)
+    return output.with_name(f"{output.name}.ckpt")
+
+
+def skip_input(file, offset: int, chunk_size: int = 2**22) -> None:
+    '''
+    Move an opened input file to offset: seek if the file is seekable, read and drop the data otherwise
+    (decompressed streams).
+    '''
+    if file.seekable():
+        file.seek(offset)
+        return None
+
+    while offset > 0:
+        chunk = file.read(min(chunk_size, offset))
+        if not chunk:
+            raise ValueError("input is shorter than the checkpoint offset")
+        offset -= len(chunk)
+
+
+class Checkpoint:
+    '''
+    Periodic checkpoints of one output file.
+
+    Arguments:
+        output_file: path to the output file, the checkpoint is <output_file>.ckpt
+        input_file: path to the input file
+        params: JSON-serializable parameters of the run
+        every: number of input bytes processed between checkpoints
+    '''
+
+    def __init__(self, output_file: str, input_file: str, params: dict, every: int = 2**28):
+        if every < 1: raise ValueError("every must be positive")
+
+        self.output = Path(output_file)
+        self.path = checkpoint_path(output_file)
+        self.every = every
+        stat = os.stat(input_file)
+        self._input = {"input": str(Path(input_file).resolve()), "input_size": stat.st_size, "input_mtime_ns": stat.st_mtime_ns, "params": json.loads(json.dumps(params))}
+        self._last_offset = 0
+
+    def load(self):
+        '''
+        Return saved state (dict with input_offset, output_size, records) or None if there is no checkpoint.
+
+        Raises:
+            ValueError: if the checkpoint is broken or belongs to another input or other parameters
+        '''
+        if not self.path.is_file():
+            return None
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            raise ValueError(f"checkpoint {self.path} is broken") from None
+
+        if state.get("version") != _VERSION or any(state.get(key) != value for key, value in self._input.items()):
+            raise ValueError(f"checkpoint {self.path} belongs to another input or other parameters")
+        if not self.output.is_file() or self.output.stat().st_size < state["output_size"]:
+            raise ValueError(f"output {self.output} is shorter than its checkpoint {self.path}")
+
+        self._last_offset = state["input_offset"]
+        return state
+
+    def save(self, writer, input_offset: int, records: int) -> None:
+        '''
+        Flush and sync the writer, then save the checkpoint atomically.
+        '''
+        writer.sync()
+        state = {"version": _VERSION, **self._input, "input_offset": input_offset, "output_size": self.output.stat().st_size, "records": records}
+
+        path_to_write = self.path.with_name(f".{self.path.name}.tmp")
+        with open(path_to_write, "w", encoding="utf-8") as file_w:
+            json.dump(state, file_w)
+            file_w.flush()
+            os.fsync(file_w.fileno())
+        os.replace(path_to_write, self.path)
+        self._last_offset = input_offset
+
+    def update(self, writer, input_offset: int, records: int) -> None:
+        '''
+        Save a checkpoint if at least `every` input bytes were processed since the last one.
+        '''
+        if input_offset - self._last_offset >= self.every:
+            self.save(writer, input_offset, records)
+
+    def remove(self) -> None:
+        '''
+        Remove the checkpoint, called when the run is complete.
+        '''
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,258 @@
+'''
+    Memory-bounded removal of duplicate reads from a stream of fastq records.
+
+    Reads are compared by a 64-bit blake2b hash of the sequence (case-insensitive), the first
+    occurrence of a sequence is kept. In the "rc" mode a read and its reverse complement are
+    duplicates (the smaller of the two sequences is hashed).
+
+    Hashes are kept by one of the methods:
+        compact - 64-bit hashes in 65536 sorted arrays of uint64 (bucketed by the top 16 bits of the hash),
+                  about 8.5 bytes per unique read, exact up to hash collisions
+        set - Python set of 64-bit ints, the fastest, but about 70 bytes per unique read
+        bloom - Bloom filter in a bytearray of a fixed size (capacity and error_rate), allocated at once:
+                about 1.8 bytes per read of capacity at error_rate 0.001 (18 MB for the default 10**7),
+                a unique read is dropped as a duplicate with probability about error_rate
+        disk - a set of at most memory_limit hashes, full sets are sorted and spilled to
+               temporary files as arrays of uint64, which are searched by bisect in a memory map,
+               runs are merged into one when there are more than max_runs of them
+
+    Classes:
+        Deduplicator: remove duplicate reads, count them
+
+    Example:
+        dedup = Deduplicator(mode="rc") # compact
+        dedup = Deduplicator(mode="rc", method="disk", memory_limit=10**7)
+        kept = dedup.filter_new(records) # records not seen before, in the input order
+        dedup.duplicates # number of removed reads
+        filter_fastq("reads.fastq", "out.fastq", dedup=dedup)
+
+    Raises:
+        ValueError: if wrong mode, method or settings
+'''
+
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+import heapq
+import math
+import mmap
+import os
+import sys
+import tempfile
+
+_REVERSE_COMPLEMENT = str.maketrans("ACGTUN", "TGCAAN")
+
+
+def _read_key(seq: str, mode: str) -> bytes:
+    '''
+    Return 16-byte digest of the read sequence (of the smaller of the read and its reverse complement in "rc" mode).
+    '''
+    seq = seq.upper()
+    if mode == "rc":
+        seq = min(seq, seq.translate(_REVERSE_COMPLEMENT)[::-1])
+    return blake2b(seq.encode('latin-1'), digest_size=16).digest()
+
+
+class _CompactHashes:
+    _BITS = 16
+
+    def __init__(self):
+        self._shift = 64 - self._BITS
+        self._buckets = [array('Q') for _ in range(1 << self._BITS)]
+
+    def add_if_new(self, key: bytes) -> bool:
+        value = int.from_bytes(key[:8], 'little')
+        bucket = self._buckets[value >> self._shift]
+        i = bisect_left(bucket, value)
+        if i < len(bucket) and bucket[i] == value:
+            return False
+        bucket.insert(i, value)
+        return True
+
+    def close(self) -> None:
+        self._buckets = []
+
+
+class _SetHashes:
+    def __init__(self):
+        self._hashes = set()
+
+    def add_if_new(self, key: bytes) -> bool:
+        value = int.from_bytes(key[:8], 'little')
+        if value in self._hashes:
+            return False
+        self._hashes.add(value)
+        return True
+
+    def close(self) -> None:
+        self._hashes = set()
+
+
+class _BloomHashes:
+    def __init__(self, capacity: int, error_rate: float):
+        if capacity < 1: raise ValueError("capacity must be positive")
+        if not 0 < error_rate < 1: raise ValueError("error_rate must be between 0 and 1")
+
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add_if_new(self, key: bytes) -> bool:
+        # double hashing: positions h1 + i*h2 of the two halves of the digest
+        h1, h2 = int.from_bytes(key[:8], 'little'), int.from_bytes(key[8:], 'little') | 1
+        bits, size = self._bits, self.size
+        new = False
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % size
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        return new
+
+    def close(self) -> None:
+        self._bits = bytearray()
+
+
+class _DiskHashes:
+    def __init__(self, memory_limit: int, max_runs: int, tmp_dir: str = None):
+        if memory_limit < 1: raise ValueError("memory_limit must be positive")
+        if max_runs < 1: raise ValueError("max_runs must be positive")
+
+        self.memory_limit = memory_limit
+        self.max_runs = max_runs
+        self._dir = tempfile.TemporaryDirectory(prefix="dedup_", dir=tmp_dir)
+        self._memory = set()
+        self._runs = []
+        self._files = 0
+
+    def add_if_new(self, key: bytes) -> bool:
+        value = int.from_bytes(key[:8], 'little')
+        if value in self._memory:
+            return False
+        for _, _, _, run in self._runs:
+            i = bisect_left(run, value)
+            if i < len(run) and run[i] == value:
+                return False
+
+        self._memory.add(value)
+        if len(self._memory) >= self.memory_limit:
+            self._spill(sorted(self._memory))
+            self._memory = set()
+            if len(self._runs) > self.max_runs:
+                self._compact()
+        return True
+
+    def _spill(self, values) -> None:
+        '''
+        Write sorted values to a new run file and map it.
+        '''
+        self._files += 1
+        path = os.path.join(self._dir.name, f"run_{self._files}.u64")
+        with open(path, 'wb') as file_w:
+            chunk = array('Q')
+            for value in values:
+                chunk.append(value)
+                if len(chunk) >= 2**20:
+                    file_w.write(chunk.tobytes())
+                    chunk = array('Q')
+            file_w.write(chunk.tobytes())
+
+        file = open(path, 'rb')
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._runs.append((path, file, mapped, memoryview(mapped).cast('Q')))
+
+    def _close_run(self, run: tuple) -> None:
+        path, file, mapped, view = run
+        view.release()
+        mapped.close()
+        file.close()
+        os.remove(path)
+
+    def _compact(self) -> None:
+        '''
+        Merge all runs into one.
+        '''
+        runs, self._runs = self._runs, []
+        self._spill(heapq.merge(*(run[3] for run in runs)))
+        for run in runs:
+            self._close_run(run)
+
+    def close(self) -> None:
+        for run in self._runs:
+            self._close_run(run)
+        self._runs = []
+        self._memory = set()
+        self._dir.cleanup()
+
+
+class Deduplicator:
+    '''
+    Remove reads whose sequence was already seen.
+
+    Arguments:
+        mode: "exact" - the same sequence, "rc" - the same sequence or its reverse complement
+        method: "compact", "set", "bloom" or "disk" (see the module description)
+        capacity: expected number of unique reads (bloom)
+        error_rate: probability to drop a unique read (bloom)
+        memory_limit: number of hashes kept in memory before they are spilled to a file (disk)
+        max_runs: number of spilled files before they are merged into one (disk)
+        tmp_dir: directory for the spilled files (disk), the system temporary directory by default
+
+    Attributes:
+        reads: number of checked reads
+        duplicates: number of removed reads
+    '''
+
+    def __init__(self, mode: str = "exact", method: str = "compact", capacity: int = 10**7, error_rate: float = 0.001, memory_limit: int = 10**7, max_runs: int = 16, tmp_dir: str = None):
+        if mode not in {"exact", "rc"}: raise ValueError(f"There are no mode {mode}, use 'exact' or 'rc'")
+        if sys.byteorder != 'little' and method == "disk": raise ValueError("disk method needs a little-endian machine")
+
+        match method:
+            case "compact":
+                self._hashes = _CompactHashes()
+            case "set":
+                self._hashes = _SetHashes()
+            case "bloom":
+                self._hashes = _BloomHashes(capacity, error_rate)
+            case "disk":
+                self._hashes = _DiskHashes(memory_limit, max_runs, tmp_dir)
+            case _:
+                raise ValueError(f"There are no method {method}, use 'compact', 'set', 'bloom' or 'disk'")
+
+        self.mode = mode
+        self.method = method
+        self.reads = 0
+        self.duplicates = 0
+
+    def is_new(self, seq: str) -> bool:
+        '''
+        Return True if seq was not seen before and remember it.
+        '''
+        self.reads += 1
+        if self._hashes.add_if_new(_read_key(seq, self.mode)):
+            return True
+        self.duplicates += 1
+        return False
+
+    def filter_new(self, records) -> list:
+        '''
+        Return list of records with sequences not seen before, in the input order.
+        '''
+        return [record for record in records if self.is_new(record[1])]
+
+    def stats(self) -> dict:
+        return {"reads": self.reads, "duplicates": self.duplicates, "unique": self.reads - self.duplicates}
+
+    def close(self) -> None:
+        '''
+        Free the hashes and remove the spilled files.
+        '''
+        self._hashes.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
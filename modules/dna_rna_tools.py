@@ -1,6 +1,9 @@
 '''
     Specialized functions for processing DNA/RNA sequences
     Each function performs one processing of one sequence (str).
+    bytes, bytearray and memoryview sequences are supported as well and
+    are processed without per-base Python objects, the result has the type of the input
+    (bytes for memoryview).
 
     Functions:
         is_nucleic_acid: Validate if sequence contains only valid nucleotides
@@ -10,6 +13,8 @@
         reverse: Reverse the sequence order
         complement: Return complementary sequence (A<->T, A<->U, C<->G)
         reverse_complement: Return reverse complementary sequence
+        apply_batch: Apply one of the procedures to a batch of sequences
+        iter_packed: Split a buffer of concatenated sequences by offsets
 
     Example:
         is_nucleic_acid('TTUU') # False
@@ -19,7 +24,7 @@
         reverse('ATG') # 'GTA'
         complement('AtG') # 'TaC'
         reverse_complement('ATg') # 'cAT'
-        reverse('ATG') # 'GTA'
+        reverse_complement(b'ATg') # b'cAT'
 
     Raises:
         ValueError: if wrong sequence
@@ -29,64 +34,184 @@ compliments_dna = {"A": "T", "a": "t", "T": "A", "t": "a", "G": "C", "g": "c", "
 compliments_rna = {"A": "U", "a": "u", "U": "A", "u": "a", "G": "C", "g": "c", "C": "G", "c": "g"}
 trinscribets = {"A": "A", "a": "a", "T": "U", "t": "u", "G": "G", "g": "g", "C": "C", "c": "c"}
 
+# translate tables are built once from the dicts above:
+# str.translate for str and bytes.translate for bytes/bytearray, both run in C
+_str_tables = {name: str.maketrans(table) for name, table in (("dna", compliments_dna), ("rna", compliments_rna), ("transcribe", trinscribets))}
+_bytes_tables = {name: bytes.maketrans("".join(table).encode(), "".join(table.values()).encode()) for name, table in (("dna", compliments_dna), ("rna", compliments_rna), ("transcribe", trinscribets))}
+
+_dna_letters = "ATCGatcg"
+_rna_letters = "AUCGaucg"
+_nucleic_letters = "ATUCGatucg"
+_str_deletes = {letters: str.maketrans("", "", letters) for letters in (_dna_letters, _rna_letters, _nucleic_letters)}
+
+
+def _as_sequence(seq):
+    '''
+    Return seq as str, bytes or bytearray, memoryview is copied to bytes once.
+    '''
+    if isinstance(seq, memoryview):
+        return seq.tobytes()
+    return seq
+
+
+def _short(seq) -> str:
+    '''
+    Return a printable head of a (possibly huge) sequence for error messages.
+    '''
+    if not isinstance(seq, str):
+        seq = bytes(seq[:60]).decode("latin-1")
+    return seq if len(seq) <= 50 else f"{seq[:50]}..."
+
+
+def _has_only(seq, letters: str) -> bool:
+    '''
+    Check in one pass that seq consists only of letters: deleting them must leave nothing.
+    '''
+    if isinstance(seq, str):
+        return not seq.translate(_str_deletes[letters])
+    return not seq.translate(None, letters.encode())
+
+
+def _kind(seq):
+    '''
+    Return "dna", "rna" or None if seq is not a nucleic acid.
+    A sequence without T and U (e.g. "GCC") is "dna".
+    '''
+    if not _has_only(seq, _nucleic_letters):
+        return None
+    if isinstance(seq, str):
+        has_t, has_u = "T" in seq or "t" in seq, "U" in seq or "u" in seq
+    else:
+        has_t, has_u = b"T" in seq or b"t" in seq, b"U" in seq or b"u" in seq
+    if has_t and has_u:
+        return None
+    return "rna" if has_u else "dna"
+
+
+def _translate(seq, name: str):
+    if isinstance(seq, str):
+        return seq.translate(_str_tables[name])
+    return seq.translate(_bytes_tables[name])
+
+
 def is_nucleic_acid(seq: str) -> bool:
     '''
     Check if sequence (seq) is valid DNA or RNA sequence.
     '''
-    dna = set("atcg")
-    rna = set("aucg")
-
-    return set(seq.lower()) <= dna or set(seq.lower()) <= rna
+    return _kind(_as_sequence(seq)) is not None
 
 
 def is_dna(seq: str) -> bool:
     '''
     Check if sequence (seq) is valid DNA sequence.
     '''
-    dna = set("atcg")
-    return set(seq.lower()) <= dna
+    return _has_only(_as_sequence(seq), _dna_letters)
 
 
 def is_rna(seq: str) -> bool:
     '''
     Check if sequence (seq) is valid RNA sequence.
     '''
-    rna = set("aucg")
-    return set(seq.lower()) <= rna
+    return _has_only(_as_sequence(seq), _rna_letters)
 
 
 def transcribe(seq: str) -> str:
     '''
     Return transcribed RNA from DNA sequence.
     '''
-    if not is_dna(seq): raise ValueError(f"{seq} is not DNA, can transcribe only DNA.")
-    else: return "".join([trinscribets[n] for n in seq])
+    seq = _as_sequence(seq)
+    if not is_dna(seq): raise ValueError(f"{_short(seq)} is not DNA, can transcribe only DNA.")
+    else: return _translate(seq, "transcribe")
 
 
 def reverse(seq: str) -> str:
     '''
     Return reversed sequence.
     '''
-    return seq[::-1]
+    return _as_sequence(seq)[::-1]
 
 
 def complement(seq: str) -> str:
     '''
     Return complimented sequence.
     '''
-    if not is_nucleic_acid(seq):
-        raise ValueError(f"{seq} is not DNA or RNA sqeuence!")
-
-    if is_dna(seq): return "".join([compliments_dna[n] for n in seq])
+    seq = _as_sequence(seq)
+    kind = _kind(seq)
+    if kind is None:
+        raise ValueError(f"{_short(seq)} is not DNA or RNA sqeuence!")
 
-    if is_rna(seq): return "".join([compliments_rna[n] for n in seq])
+    return _translate(seq, kind)
 
 
 def reverse_complement(seq: str) -> str:
     '''
     Return reversed complimented sequence.
     '''
-    return reverse(complement(seq))
+    rez = complement(seq)
+    if isinstance(rez, bytearray):
+        rez.reverse()
+        return rez
+    return rez[::-1]
+
+
+procedures = {
+    "is_nucleic_acid": is_nucleic_acid,
+    "is_dna": is_dna,
+    "is_rna": is_rna,
+    "transcribe": transcribe,
+    "reverse": reverse,
+    "complement": complement,
+    "reverse_complement": reverse_complement
+}
+
+
+def apply_batch(seqs: list, procedure: str) -> list:
+    '''
+    Apply procedure to every sequence of a batch (list of sequences).
+
+    For a batch of str sequences complement, reverse_complement and transcribe
+    translate the whole batch at once when it is all DNA (or all RNA with U in every sequence),
+    otherwise every sequence is processed (and validated) on its own.
+
+    Returns:
+        list of results in the order of seqs
+
+    Raises:
+        ValueError: if wrong procedure or wrong sequence
+    '''
+    if procedure not in procedures:
+        raise ValueError(f"There are no procerure for the {procedure} method!")
+
+    if seqs and procedure in {"transcribe", "complement", "reverse_complement"} and all(isinstance(seq, str) for seq in seqs):
+        kind = _kind("".join(seqs))
+        if procedure == "transcribe" and kind != "dna":
+            kind = None
+        # a sequence without T and U is DNA on its own, so the RNA table is used only if every sequence has U
+        if kind == "rna" and not all("U" in seq or "u" in seq for seq in seqs):
+            kind = None
+        if kind is not None:
+            joined = _translate("\n".join(seqs), "transcribe" if procedure == "transcribe" else kind)
+            if procedure == "reverse_complement":
+                return joined[::-1].split("\n")[::-1]
+            return joined.split("\n")
+
+    func = procedures[procedure]
+    return [func(seq) for seq in seqs]
+
+
+def iter_packed(buffer, offsets):
+    '''
+    Yield sequences packed one after another into one buffer (str, bytes, bytearray).
+
+    Arguments:
+        buffer: all sequences concatenated
+        offsets: boundaries of the sequences, n+1 numbers for n sequences: sequence i is buffer[offsets[i]:offsets[i+1]]
+    '''
+    offsets = iter(offsets)
+    start = next(offsets, None)
+    for end in offsets:
+        yield buffer[start:end]
+        start = end
 
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+'''
+    Streaming functions for fasta files.
+    Records are read from large blocks of the file one at a time,
+    so memory is bounded by the longest record, not by the file size.
+
+    Functions:
+        iter_fasta_records: yield (header, sequence) records of an opened fasta file
+        wrap_sequence: split a sequence into lines of a given width
+
+    Example:
+        with open("genome.fasta") as file:
+            for header, seq in iter_fasta_records(file):
+                ...
+'''
+
+
+def iter_fasta_records(file, chunk_size: int = 2**22):
+    '''
+    Yield fasta records of an opened file, lines of one sequence are joined.
+    Lines before the first header and empty lines are skipped.
+
+    Arguments:
+        file: file object opened for reading in text mode
+        chunk_size: number of characters read from the file at once
+
+    Returns:
+        generator of tuples (header, sequence), header keeps ">"
+    '''
+    header = None
+    parts = []
+    tail = ''
+
+    while True:
+        chunk = file.read(chunk_size)
+
+        if chunk:
+            lines = (tail + chunk).split('\n')
+            tail = lines.pop()
+        else:
+            lines = [tail]
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] == '>':
+                if header is not None:
+                    yield header, ''.join(parts)
+                header = line
+                parts = []
+            elif header is not None:
+                parts.append(line)
+
+        if not chunk:
+            break
+
+    if header is not None:
+        yield header, ''.join(parts)
+
+
+def wrap_sequence(seq: str, line_width: int) -> str:
+    '''
+    Return sequence split into lines of line_width characters (without the trailing newline).
+    '''
+    if line_width < 1: raise ValueError("line_width must be positive")
+    return '\n'.join([seq[i:i + line_width] for i in range(0, len(seq), line_width)])
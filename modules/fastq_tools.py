@@ -3,8 +3,10 @@
     Each function performs one processing of one sequence, the sequence is a string.
 
     Functions:
+        base_composition: count A/C/G/T/U/N in sequence in one go
         nucl_count: count nucleotides in sequence
         gc_count: count GC-content in sequenct
+        gc_content: count GC-content in sequence without validation
         average_quality: count average quality of sequence from the sequence quality string
 
     Raises:
@@ -12,24 +14,82 @@
 
 '''
 
-from . import dna_rna_tools
+from . import quality_tools
+from . import genbank_tools
+from . import io_tools
 from sys import exit
 from typing import Union
+from pathlib import Path
+import os
+import time
+
+BASES = "ACGTUN"
+
+
+def base_composition(read: Union[str, bytes]) -> dict:
+    '''
+    Count nucleotides of the read in one go, case-insensitive.
+    Counting is done by str.count (bytes.count) in C, no per-base Python loop.
+
+    Arguments:
+        read: str or bytes of nucleotides
+
+    Returns:
+        dict of a form {'A': int, 'C': int, 'G': int, 'T': int, 'U': int, 'N': int, 'other': int}
+        'other' is the number of symbols that are not A/C/G/T/U/N
+    '''
+    read = read.upper()
+    if isinstance(read, str):
+        counts = {base: read.count(base) for base in BASES}
+    else:
+        counts = {base: read.count(base.encode()) for base in BASES}
+    counts['other'] = len(read) - sum(counts.values())
+
+    return counts
+
+
+def base_composition_batch(reads) -> dict:
+    '''
+    Return total base_composition of a batch (iterable) of reads.
+    '''
+    reads = list(reads)
+    if reads and not isinstance(reads[0], str):
+        return base_composition(b"".join(reads))
+    return base_composition("".join(reads))
+
+
+def gc_content(read: Union[str, bytes]) -> float:
+    '''
+    Return GC-content (in %) of the read without validation, N and other symbols count in the length.
+    0 for an empty read.
+    '''
+    if not read:
+        return 0.0
+    if isinstance(read, str):
+        gc = read.count('G') + read.count('C') + read.count('g') + read.count('c')
+    else:
+        gc = read.count(b'G') + read.count(b'C') + read.count(b'g') + read.count(b'c')
+
+    return gc*100/len(read)
+
+
+def _is_nucleic_composition(counts: dict) -> bool:
+    return not (counts['other'] or counts['N'] or (counts['T'] and counts['U']))
+
 
 def nucl_count(posl: str, nucl: str) -> int:
     '''
     Returns the number (amount) of nucleotide (nucl) in a sequence (posl)
+
+    Raises:
+        ValueError: if posl is not DNA or RNA sequence
     '''
 
-    if dna_rna_tools.is_nucleic_acid(posl):
-        posl = posl.lower()
-        nucl = nucl.lower()
-        nc = 0
-        for i in range(len(posl)):
-            if posl[i] == nucl:
-                nc += 1
+    counts = base_composition(posl)
+    if not _is_nucleic_composition(counts):
+        raise ValueError(f"{posl} is not DNA or RNA sqeuence!")
 
-    return nc
+    return counts.get(nucl.upper(), 0)
 
 
 def gc_count(read: str) -> float:
@@ -41,24 +101,26 @@ def gc_count(read: str) -> float:
 
     Returns:
         float number: percentage of guanine and cetosine to read length
+        None if the read is not DNA or RNA sequence
 
     Raises:
         exceptions if something went wrong
     '''
 
-    if dna_rna_tools.is_nucleic_acid(read):
-        g_count = nucl_count(read, 'G')
-        c_count = nucl_count(read, 'C')
-
-        return (g_count + c_count)*100/len(read)
+    counts = base_composition(read)
+    if _is_nucleic_composition(counts):
+        if not read:
+            return 0.0
+        return (counts['G'] + counts['C'])*100/len(read)
 
 
-def average_quality(read: tuple) -> int:
+def average_quality(read: tuple, offset: int = 33) -> int:
     '''
     Return average quality (in phred33) of the read
 
     Arguments:
-        read: string of nucleotides
+        read: tuple (seq_read, seq_quality, ...)
+        offset: 33 for phred33 or 64 for phred64 quality strings
 
     Returns:
         int number: quality number in phred33 score
@@ -66,18 +128,14 @@ def average_quality(read: tuple) -> int:
         Symbol ! " # $ % & ' ( ) * +  ,  -  .  /  0  1  2  3  4  5  6  7  8  9  :  ;  <  =  >  ?  @  A  B  C  D  E  F  G  H  I
          Score 0 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15 16 17 18 19 20 21 22 23 24 25 26 27 28 29 30 31 32 33 34 35 36 37 38 39 40
 
+        Scores above 40 (J, K, ...) are counted as well.
+
     Raises:
-        exceptions if something went wrong
+        ValueError: if the quality string has symbols below the offset
     '''
 
-    scores = {'!': '0', '"': '1', '#': '2', '$': '3', '%': '4', '&': '5', "'": '6', '(': '7', ')': '8', '*': '9', '+': '10', ',': '11', '-': '12', '.': '13', '/': '14', '0': '15', '1': '16', '2': '17', '3': '18', '4': '19', '5': '20', '6': '21', '7': '22', '8': '23', '9': '24', ':': '25', ';': '26', '<': '27', '=': '28', '>': '29', '?': '30', '@': '31', 'A': '32', 'B': '33', 'C': '34', 'D': '35', 'E': '36', 'F': '37', 'G': '38', 'H': '39', 'I': '40'}
-
-    seq_score = 0
-
-    for i in range(len(read[0])):
-        seq_score += int(scores[read[1][i]])
+    return round(quality_tools.mean_quality(read[1], offset))
 
-    return round(seq_score/len(read[0]))
 
 def read_seq_from_file(file_name: str) -> dict:
     '''
@@ -108,7 +166,350 @@ def read_seq_from_file(file_name: str) -> dict:
         seq_plus = file_name.readline().strip()
         seq_qual = file_name.readline().strip()
         return {seq_id: (seq_seq, seq_qual, seq_plus)}
-    
+
+
+def split_fastq_block(block: str) -> list:
+    '''
+    Split a record-aligned block of fastq text into records.
+
+    Arguments:
+        block: str with whole fastq records (four lines each)
+
+    Returns:
+        list of tuples of a form (seq_id, seq_read, seq_quality, seq_plus)
+
+    Raises:
+        ValueError: if the block is not made of whole four-line records
+    '''
+    if '\r' in block:
+        block = block.replace('\r', '')
+
+    lines = block.split('\n')
+    if lines and not lines[-1]:
+        lines.pop()
+
+    if len(lines) % 4:
+        raise ValueError("fastq block is truncated, expected four lines per record")
+
+    return list(zip(lines[0::4], lines[1::4], lines[3::4], lines[2::4]))
+
+
+class FastqReader:
+    '''
+    Streaming reader of fastq records.
+
+    Reads the file in large chunks, cuts them on record boundaries and splits
+    them into records without per-record readline calls.
+    The file should be opened in binary mode ("rb"), then offset is exact in bytes.
+
+    Arguments:
+        file: opened file object for reading
+        batch_size: number of records in one batch
+        chunk_size: number of bytes read from the file at once
+        offset: position of the file when reading starts (if it was moved forward, e.g. to resume a run)
+
+    Attributes:
+        offset: position in the file right after the last yielded block
+        records: number of records yielded so far
+
+    Example:
+        with open("reads.fastq", "rb") as file:
+            for batch in FastqReader(file).batches():
+                ...
+    '''
+
+    def __init__(self, file, batch_size: int = 10000, chunk_size: int = 2**22, offset: int = 0):
+        if batch_size < 1: raise ValueError("batch_size must be positive")
+        if chunk_size < 1: raise ValueError("chunk_size must be positive")
+
+        self.file = file
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.offset = offset
+        self.records = 0
+
+    def blocks(self):
+        '''
+        Yield record-aligned blocks of fastq text (str).
+        '''
+        tail = ''
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                break
+            if isinstance(chunk, bytes):
+                chunk = chunk.decode('latin-1')
+
+            block = tail + chunk
+            lines = block.count('\n')
+            if lines < 4:
+                tail = block
+                continue
+
+            # cut the block after the last complete record
+            cut = len(block)
+            for _ in range(lines % 4 + 1):
+                cut = block.rfind('\n', 0, cut)
+            cut += 1
+
+            tail = block[cut:]
+            self.offset += cut
+            self.records += lines // 4
+            yield block[:cut]
+
+        if tail.strip():
+            # the last record without a trailing newline
+            self.offset += len(tail)
+            self.records += len(split_fastq_block(tail))
+            yield tail
+
+    def batches(self):
+        '''
+        Yield lists of records, each list holds batch_size records (the last one may be shorter).
+        '''
+        pending = []
+        for block in self.blocks():
+            pending.extend(split_fastq_block(block))
+            start = 0
+            while len(pending) - start >= self.batch_size:
+                yield pending[start:start + self.batch_size]
+                start += self.batch_size
+            del pending[:start]
+
+        if pending:
+            yield pending
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from batch
+
+
+def iter_fastq_records(file_name: str, batch_size: int = 10000):
+    '''
+    Yield fastq records of the file one by one.
+
+    Arguments:
+        file_name: path to the fastq file, may be compressed (gzip, bgzip, bzip2, zstd)
+        batch_size: number of records parsed at once
+
+    Returns:
+        generator of tuples of a form (seq_id, seq_read, seq_quality, seq_plus)
+    '''
+    with io_tools.open_input(file_name, "rb") as file:
+        yield from FastqReader(file, batch_size)
+
+
+def format_fastq(records) -> str:
+    '''
+    Return fastq text of records, tuples of a form (seq_id, seq_read, seq_quality, seq_plus).
+    '''
+    return "".join([f"{seq_id}\n{seq_seq}\n{seq_plus}\n{seq_qual}\n" for seq_id, seq_seq, seq_qual, seq_plus in records])
+
+
+def filter_fastq_block(block: str, fastq_filter) -> str:
+    '''
+    Filter a record-aligned block of fastq text and return fastq text of passed records.
+    Used by the workers of the parallel filter_fastq, so only str is sent between processes.
+
+    Arguments:
+        block: str with whole fastq records
+        fastq_filter: filter_tools.FastqFilter (or any object with filter(records) -> list)
+    '''
+    return format_fastq(fastq_filter.filter(split_fastq_block(block)))
+
+
+def filter_fastq_block_stats(block: str, fastq_filter, qc_spec: dict = None, qc_filtered_spec: dict = None) -> tuple:
+    '''
+    filter_fastq_block that also measures its stages and collects QC statistics, used by filter_fastq with stats or qc.
+
+    Arguments:
+        block: str with whole fastq records
+        fastq_filter: filter_tools.FastqFilter
+        qc_spec: settings of qc_tools.QcStats (QcStats.spec()) to collect for the input records, None to skip
+        qc_filtered_spec: the same for the passed records
+
+    Returns:
+        (fastq text of passed records, partial statistics in the metrics_tools.RunStats.as_dict form
+        plus "qc" and "qc_filtered" QcStats of the block if requested)
+    '''
+    start = time.perf_counter()
+    records = split_fastq_block(block)
+    parsed = time.perf_counter()
+    passed, criteria = fastq_filter.filter_with_stats(records)
+    filtered = time.perf_counter()
+    text = format_fastq(passed)
+    formatted = time.perf_counter()
+
+    stages = {"parse": parsed - start, "filter": filtered - parsed, "format": formatted - filtered}
+    counters = {"records_in": len(records), "records_out": len(passed)}
+    part = {"stages": stages, "counters": counters, "criteria": criteria}
+
+    from .qc_tools import QcStats # not at the top: qc_tools imports this module
+
+    for name, spec, qc_records in (("qc", qc_spec, records), ("qc_filtered", qc_filtered_spec, passed)):
+        if spec is not None:
+            qc_start = time.perf_counter()
+            part[name] = QcStats(**spec)
+            part[name].update(qc_records)
+            stages["qc"] = stages.get("qc", 0.0) + time.perf_counter() - qc_start
+
+    return text, part
+
+
+def mate_id(seq_id: str) -> str:
+    '''
+    Return read name shared by both mates: seq_id without "@", the description and the /1 or /2 suffix.
+    '''
+    name = seq_id.split(maxsplit=1)[0].lstrip('@') if seq_id.strip() else ''
+    if name.endswith(('/1', '/2')):
+        name = name[:-2]
+    return name
+
+
+def filter_fastq_pairs(batches: tuple, fastq_filter, check_ids: bool = True) -> tuple:
+    '''
+    Filter a pair of batches of mates (record i of the first batch is the mate of record i of the second).
+    Used by the paired filter_fastq_paired, also in the workers of a process pool.
+
+    Arguments:
+        batches: (batch_r1, batch_r2), lists of fastq records
+        fastq_filter: filter_tools.FastqFilter, its apply (trimming and criteria) is used for every mate
+        check_ids: check that mates have the same read name (see mate_id)
+
+    Returns:
+        fastq text of (passed r1 mates, passed r2 mates, singletons),
+        singletons are the mates that passed when the other mate failed
+
+    Raises:
+        ValueError: if the batches have different length or mates have different names
+    '''
+    batch_r1, batch_r2 = batches
+    if len(batch_r1) != len(batch_r2): raise ValueError("R1 and R2 have different number of reads")
+
+    passed_r1, passed_r2, singletons = [], [], []
+    for mate_r1, mate_r2 in zip(batch_r1, batch_r2):
+        if check_ids and mate_r1[0] != mate_r2[0] and mate_id(mate_r1[0]) != mate_id(mate_r2[0]):
+            raise ValueError(f"mates are out of sync: {mate_r1[0]} and {mate_r2[0]}")
+
+        mate_r1, mate_r2 = fastq_filter.apply(mate_r1), fastq_filter.apply(mate_r2)
+        if mate_r1 is not None and mate_r2 is not None:
+            passed_r1.append(mate_r1)
+            passed_r2.append(mate_r2)
+        elif mate_r1 is not None:
+            singletons.append(mate_r1)
+        elif mate_r2 is not None:
+            singletons.append(mate_r2)
+
+    return format_fastq(passed_r1), format_fastq(passed_r2), format_fastq(singletons)
+
+
+class SeqWriter:
+    '''
+    Buffered writer of sequences that stays open for the whole run.
+
+    Collects the written text in memory and writes it to the file in large blocks.
+    With atomic=True the data goes to a temporary file next to the target one,
+    which is renamed to file_name only when the writer is closed without errors.
+    Output is compressed if file_name ends with .gz, .bz2 or .zst (see io_tools.open_output).
+
+    Arguments:
+        file_name: path to the output file
+        flush_size: number of characters collected before they are written to the file
+        atomic: write to a temporary file and rename it on close
+        mode: "w" to overwrite or "a" to append to file_name
+        encoding: encoding of the output file
+        compress_level: compression level of a compressed output
+
+    Example:
+        with SeqWriter("filtered.fastq") as writer:
+            writer.write_fastq(records)
+    '''
+
+    def __init__(self, file_name: str, flush_size: int = 2**22, atomic: bool = False, mode: str = "w", encoding: str = "utf-8", compress_level: int = 6):
+        if mode not in {"w", "a"}: raise ValueError(f"unsupported mode {mode}, use 'w' or 'a'")
+        if atomic and mode == "a": raise ValueError("atomic writing is supported only in 'w' mode")
+
+        self.path = Path(file_name)
+        self.flush_size = flush_size
+        self.atomic = atomic
+        self.encoding = encoding
+        self._path_to_write = self.path.with_name(f".{self.path.name}.tmp") if atomic else self.path
+        self._file = io_tools.open_output(self._path_to_write, mode, encoding, io_tools.compression_from_name(self.path), compress_level, newline="\n")
+        self._buffer = []
+        self._buffered = 0
+
+    def write(self, text: str) -> None:
+        '''
+        Add text to the buffer, write the buffer out when it exceeds flush_size.
+        '''
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.flush_size:
+            self.flush()
+
+    def write_fastq(self, records) -> None:
+        '''
+        Write fastq records, tuples of a form (seq_id, seq_read, seq_quality, seq_plus).
+        '''
+        self.write(format_fastq(records))
+
+    def write_fasta(self, header: str, seq: str) -> None:
+        '''
+        Write one fasta record, header is written as is (with ">").
+        '''
+        self.write(f"{header}\n{seq}\n")
+
+    def flush(self) -> None:
+        '''
+        Write out the buffered text.
+        '''
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+        self._file.flush()
+
+    def sync(self) -> None:
+        '''
+        Write out the buffered text and force it to the disk.
+        '''
+        self.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        '''
+        Flush the buffer, close the file and finalize the atomic write.
+        '''
+        if self._file.closed:
+            return None
+        self.flush()
+        self._file.close()
+        if self.atomic:
+            os.replace(self._path_to_write, self.path)
+
+    def abort(self) -> None:
+        '''
+        Close the file dropping the buffer, the temporary file of the atomic write is removed.
+        '''
+        if self._file.closed:
+            return None
+        self._buffer = []
+        self._file.close()
+        if self.atomic:
+            self._path_to_write.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self.atomic:
+            self.abort()
+        else:
+            self.close()
+        return False
+
 
 def write_seq_to_fle(file_name: str, seq: dict, ) -> None:
     '''
@@ -139,24 +540,28 @@ def write_seq_to_fle(file_name: str, seq: dict, ) -> None:
 
     return None
 
-def write_genes_seq_to_fasta(genes_data: dict, output_file: str):
+def write_genes_seq_to_fasta(genes_data: dict, output_file: str, atomic: bool = False):
     """
     Writes genes to a FASTA file.
 
     Arguments:
-        genes_data: dictionary with gene data
+        genes_data: dictionary with gene data or iterable (e.g. generator) of pairs (gene_num, gene_info),
+                    the header is >gene_<gene_num>|name_<gene>, with |cds_<cds> if gene_info has "cds"
         output_file: name of the output FASTA file
+        atomic: write to a temporary file and rename it when done
 
     Returns:
         None
         
     """
     
-    with open(output_file, 'w', encoding='utf-8') as file:
-        for gene_num, gene_info in genes_data.items():
+    with SeqWriter(output_file, atomic=atomic) as file:
+        for gene_num, gene_info in (genes_data.items() if isinstance(genes_data, dict) else genes_data):
             header = f">gene_{gene_num}"
             if gene_info['gene']:
                 header += f"|name_{gene_info['gene']}"
+            if gene_info.get('cds') is not None:
+                header += f"|cds_{gene_info['cds']}"
             
             file.write(header + "\n")
             file.write(gene_info['translation'] + "\n\n")
@@ -183,16 +588,16 @@ def find_genes_with_neighbors(genes_all: dict, genes: Union[int, tuple, list], n
     
     rez = {}
     genes_to_check = list(genes_all.keys())
+    index = genbank_tools.GeneIndex(genes_to_check)
     
     for gene in genes:
-        idx = genes_to_check.index(gene)
-        
-        left_end = max(idx - n_before, 0)
-        right_end = min(idx + n_after + 1, len(genes_to_check))
-        
-        for i in range(left_end, right_end):
-            key = genes_to_check[i]
-            rez[key] = genes_all[key]
+        if gene not in index:
+            raise ValueError(f"{gene} is not in genes")
+
+        for idx in index.positions(gene):
+            for i in index.window(idx, n_before, n_after):
+                key = genes_to_check[i]
+                rez[key] = genes_all[key]
 
     return rez
 
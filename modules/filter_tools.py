@@ -0,0 +1,237 @@
+'''
+    Compiled filter pipeline for fastq records.
+
+    compile_filters turns the filter_fastq arguments and user predicates into one FastqFilter.
+    Criteria are normalized once, criteria that can not reject a read are dropped,
+    and the rest are ordered cheapest first (length, GC, ..., mean quality),
+    so a record is rejected by the first criterion it fails.
+
+    A criterion is any callable record -> bool, record is a tuple (seq_id, seq_read, seq_quality, seq_plus).
+    Optional attributes: cost (smaller runs earlier, 10 by default) and name (used in reports).
+    For the parallel filter_fastq criteria must be picklable (classes below or module-level functions).
+
+    Classes:
+        LengthBounds, GcBounds, MeanQuality: criteria of filter_fastq
+        MaxNFraction: maximal fraction of N in the read
+        MinBaseQuality: minimal per-base quality
+        NoAdapter: the read does not contain an adapter sequence
+        FastqFilter: ordered, short-circuit pipeline of criteria, optionally after trimming
+
+    Functions:
+        compile_filters: build FastqFilter from filter_fastq arguments
+
+    Example:
+        fastq_filter = compile_filters((20, 80), (50, 300), 20, predicates=[MaxNFraction(0.05), NoAdapter("AGATCGGAAGAGC")])
+        fastq_filter.filter(records) # records that pass all criteria
+'''
+
+from typing import Union
+import time
+
+from . import fastq_tools
+from . import quality_tools
+
+
+class LengthBounds:
+    '''
+    Read length is within [low, high].
+    '''
+    cost = 1
+    name = "length"
+
+    def __init__(self, low: int, high: int):
+        self.low, self.high = low, high
+
+    def __call__(self, record: tuple) -> bool:
+        return self.low <= len(record[1]) <= self.high
+
+
+class GcBounds:
+    '''
+    GC-content (in %) of the read is within [low, high].
+    '''
+    cost = 2
+    name = "gc"
+
+    def __init__(self, low: float, high: float):
+        self.low, self.high = low, high
+
+    def __call__(self, record: tuple) -> bool:
+        return self.low <= fastq_tools.gc_content(record[1]) <= self.high
+
+
+class MaxNFraction:
+    '''
+    Fraction of N in the read is at most fraction.
+    '''
+    cost = 2
+    name = "n_fraction"
+
+    def __init__(self, fraction: float):
+        self.fraction = fraction
+
+    def __call__(self, record: tuple) -> bool:
+        seq = record[1]
+        if not seq:
+            return True
+        return (seq.count('N') + seq.count('n')) <= self.fraction * len(seq)
+
+
+class NoAdapter:
+    '''
+    The read does not contain the adapter sequence (exact match).
+    '''
+    cost = 3
+    name = "adapter"
+
+    def __init__(self, adapter: str):
+        self.adapter = adapter.upper()
+
+    def __call__(self, record: tuple) -> bool:
+        return self.adapter not in record[1].upper()
+
+
+class MinBaseQuality:
+    '''
+    Every base of the read has quality at least threshold.
+    '''
+    cost = 3
+    name = "min_quality"
+
+    def __init__(self, threshold: int, offset: int = quality_tools.PHRED33):
+        self.threshold, self.offset = threshold, offset
+
+    def __call__(self, record: tuple) -> bool:
+        return not record[2] or quality_tools.min_quality(record[2], self.offset) >= self.threshold
+
+
+class MeanQuality:
+    '''
+    Rounded average quality of the read is at least threshold (as average_quality).
+    '''
+    cost = 4
+    name = "quality"
+
+    def __init__(self, threshold: int, offset: int = quality_tools.PHRED33):
+        self.threshold, self.offset = threshold, offset
+
+    def __call__(self, record: tuple) -> bool:
+        return round(quality_tools.mean_quality(record[2], self.offset)) >= self.threshold
+
+
+def _cost(criterion) -> float:
+    return getattr(criterion, "cost", 10)
+
+
+def criterion_name(criterion) -> str:
+    '''
+    Return name of a criterion: its name attribute, function name or class name.
+    '''
+    return getattr(criterion, "name", None) or getattr(criterion, "__name__", None) or type(criterion).__name__
+
+
+class FastqFilter:
+    '''
+    Pipeline of criteria ordered by cost, evaluation stops at the first failed criterion.
+    With a trimmer, filter, filter_with_stats and apply trim the records before the criteria.
+
+    Arguments:
+        criteria: callables record -> bool
+        trimmer: callable record -> trimmed record or None (e.g. trim_tools.Trimmer) with trim_records(records)
+    '''
+
+    def __init__(self, criteria: list, trimmer=None):
+        self.criteria = sorted(criteria, key=_cost)
+        self.names = [criterion_name(criterion) for criterion in self.criteria]
+        self.trimmer = trimmer
+
+    def __call__(self, record: tuple) -> bool:
+        for criterion in self.criteria:
+            if not criterion(record):
+                return False
+        return True
+
+    def check(self, record: tuple):
+        '''
+        Return number of the first failed criterion (in self.criteria) or None if the record passes.
+        '''
+        for i, criterion in enumerate(self.criteria):
+            if not criterion(record):
+                return i
+        return None
+
+    def apply(self, record: tuple):
+        '''
+        Return the (trimmed) record if it passes all criteria, None otherwise.
+        '''
+        if self.trimmer is not None:
+            record = self.trimmer(record)
+            if record is None:
+                return None
+        return record if self(record) else None
+
+    def filter(self, records) -> list:
+        '''
+        Return list of (trimmed) records that pass all criteria, in the input order.
+        '''
+        if self.trimmer is not None:
+            records = self.trimmer.trim_records(records)
+        criteria = self.criteria
+        if not criteria:
+            return list(records)
+        if len(criteria) == 1:
+            return list(filter(criteria[0], records))
+        return [record for record in records if self(record)]
+
+    def filter_with_stats(self, records) -> tuple:
+        '''
+        Filter records criterion by criterion and measure every criterion.
+        Gives the same records as filter: a record is counted as rejected by the first criterion it fails.
+
+        Returns:
+            (passed records, {criterion name: {"checked": int, "rejected": int, "seconds": float}}),
+            with a trimmer its time and the dropped short reads are reported as "trim"
+        '''
+        passed = list(records)
+        stats = {}
+        if self.trimmer is not None:
+            start = time.perf_counter()
+            checked = len(passed)
+            passed = self.trimmer.trim_records(passed)
+            stats["trim"] = {"checked": checked, "rejected": checked - len(passed), "seconds": time.perf_counter() - start}
+        for name, criterion in zip(self.names, self.criteria):
+            start = time.perf_counter()
+            checked = len(passed)
+            passed = list(filter(criterion, passed))
+            stats[name] = {"checked": checked, "rejected": checked - len(passed), "seconds": time.perf_counter() - start}
+        return passed, stats
+
+
+def compile_filters(gc_bounds: Union[int, tuple] = (0, 100), length_bounds: Union[int, tuple] = (0, 2**32), quality_threshold: int = 0, phred_offset: int = quality_tools.PHRED33, predicates=(), trimmer=None) -> FastqFilter:
+    '''
+    Build FastqFilter from filter_fastq arguments, all bounds are included.
+
+    Arguments:
+        gc_bounds: (min, max) GC-content in %, a single number is the upper bound
+        length_bounds: (min, max) read length, a single number is the upper bound
+        quality_threshold: minimal rounded average quality
+        phred_offset: 33 for phred33 or 64 for phred64 quality strings
+        predicates: additional criteria (callables record -> bool)
+        trimmer: trim_tools.Trimmer applied to the records before the criteria
+
+    Returns:
+        FastqFilter with criteria ordered cheapest first
+    '''
+    if isinstance(gc_bounds, (int, float)): gc_bounds = (0, gc_bounds)
+    if isinstance(length_bounds, int): length_bounds = (0, length_bounds)
+
+    criteria = []
+    if length_bounds[0] > 0 or length_bounds[1] < 2**32:
+        criteria.append(LengthBounds(*length_bounds))
+    if gc_bounds[0] > 0 or gc_bounds[1] < 100:
+        criteria.append(GcBounds(*gc_bounds))
+    if quality_threshold > 0:
+        criteria.append(MeanQuality(quality_threshold, phred_offset))
+    criteria.extend(predicates)
+
+    return FastqFilter(criteria, trimmer)
@@ -0,0 +1,568 @@
+'''
+    Functions for reading features of GenBank (GBK) files.
+
+    iter_genbank_features is a streaming parser: it yields one feature at a time,
+    multi-record (multi-LOCUS) files are supported, memory does not grow with the file size.
+
+    Parsed CDS records are kept in a binary cache next to the GBK file (<input_gbk>.cds.cache),
+    so the same genome is parsed only once. The cache is keyed on the GBK size and
+    modification time and is rebuilt automatically when the GBK changes.
+
+    Cache layout:
+        magic line b"NTCDS4\n"
+        blob: all translations one after another, translation i is blob[offsets[i]:offsets[i+1]]
+        columns: raw arrays offsets (uint64, n+1), starts (uint64, n), ends (uint64, n), strands (int8, n)
+        header: UTF-8 JSON {'size', 'mtime_ns', 'byteorder', 'blob_size', 'genes', 'contigs'}
+        8 bytes: length of the header (little endian)
+
+    The cache holds only data (no pickle), so a cache file placed next to a shared GBK can not run code.
+    Only the header and the columns are loaded, translations are read from the memory-mapped
+    blob when they are requested.
+
+    Functions:
+        parse_location: start, end and strand of a feature location
+        iter_genbank_features: yield features of a GBK file one by one
+        iter_cds: yield CDS features with /gene and /translation
+        iter_gene_neighbors: yield genes of interest and their neighbors from a stream of features
+        parse_gbk_cds: parse CDS records (gene, translation) of a GBK file
+        load_cds: return CdsRecords of a GBK file, from the cache if it is valid
+
+    Classes:
+        GbkFeature: one feature of a GBK file
+        GeneIndex: O(1) gene name -> positions lookups and neighbor windows
+
+    Example:
+        for feature in iter_genbank_features("genome.gbk", {"CDS"}):
+            feature.get("gene"), feature.start, feature.end, feature.strand
+
+        cds = load_cds("genome.gbk")
+        cds.genes[0] # name of the first CDS
+        cds.translation(0) # its protein sequence
+'''
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from pathlib import Path
+from typing import NamedTuple
+import json
+import mmap
+import os
+import re
+import sys
+
+from . import io_tools
+
+_CACHE_MAGIC = b"NTCDS4\n"
+_QUALIFIER_INDENT = " " * 21
+_COORDINATE = re.compile(r"\d+")
+_LOCATION_TOKEN = re.compile(r"\w+\(|\)|[^,()]+")
+
+
+class GbkFeature(NamedTuple):
+    '''
+    One feature of a GBK file.
+
+    contig: name of the record (LOCUS) of the feature
+    type: feature key (CDS, gene, ...)
+    location: location string as in the file
+    start, end: 1-based coordinates, end included
+    strand: 1 or -1 (complement)
+    qualifiers: dict {name: [values]}, a qualifier may be repeated
+    '''
+    contig: str
+    type: str
+    location: str
+    start: int
+    end: int
+    strand: int
+    qualifiers: dict
+
+    def get(self, name: str, default=None):
+        '''
+        Return the first value of the qualifier name or default.
+        '''
+        values = self.qualifiers.get(name)
+        return values[0] if values else default
+
+
+def parse_location(location: str) -> tuple:
+    '''
+    Return (start, end, strand) of a GBK location.
+    start and end are the smallest and the largest coordinates (1-based), strand is -1 if every part
+    of the location is complemented (by an outer complement or by complement of every part of join/order).
+
+    Example:
+        parse_location("complement(join(<1..200,300..>450))") # (1, 450, -1)
+        parse_location("join(complement(4918..5163),complement(2691..4571))") # (2691, 5163, -1)
+    '''
+    coordinates = [int(coordinate) for coordinate in _COORDINATE.findall(location)]
+    if not coordinates:
+        return 0, 0, 1
+
+    # a part is complemented if it is inside an odd number of complement(...)
+    operators = []
+    strands = set()
+    for token in _LOCATION_TOKEN.findall(location):
+        if token.endswith("("):
+            operators.append(token == "complement(")
+        elif token == ")":
+            if operators:
+                operators.pop()
+        elif _COORDINATE.search(token):
+            strands.add(-1 if sum(operators) % 2 else 1)
+    strand = -1 if strands == {-1} else 1
+    return min(coordinates), max(coordinates), strand
+
+
+def _make_feature(contig: str, key: str, location_parts: list, qualifiers: list) -> GbkFeature:
+    '''
+    Build GbkFeature from collected lines: location lines and (name, value lines) of qualifiers.
+    '''
+    location = "".join(location_parts)
+    start, end, strand = parse_location(location)
+
+    values = {}
+    for name, parts in qualifiers:
+        # protein sequences are wrapped without spaces, text is wrapped by words
+        value = ("" if name == "translation" else " ").join(parts)
+        if value.startswith('"'):
+            value = value[1:-1] if value.endswith('"') and len(value) > 1 else value[1:]
+            value = value.replace('""', '"')
+        values.setdefault(name, []).append(value)
+
+    return GbkFeature(contig, key, location, start, end, strand, values)
+
+
+def iter_genbank_features(input_gbk, feature_types=None):
+    '''
+    Yield features of a GBK file one at a time.
+
+    Multi-line locations and qualifiers are gathered into lists of lines and joined once,
+    all records (LOCUS ... //) of a multi-record file are parsed.
+
+    Arguments:
+        input_gbk: path to the GBK file (may be compressed: gzip, bgzip, bzip2, zstd) or a file object opened in text mode
+        feature_types: collection of feature keys to yield (e.g. {"CDS"}), all features by default
+
+    Returns:
+        generator of GbkFeature
+    '''
+    if isinstance(input_gbk, (str, os.PathLike)):
+        with io_tools.open_input(input_gbk, 'rt', encoding='utf-8') as file:
+            yield from iter_genbank_features(file, feature_types)
+        return
+
+    contig = ""
+    in_features = False
+    key = None
+    location_parts = []
+    qualifiers = []
+    open_quote = False
+
+    for line in input_gbk:
+        line = line.rstrip()
+
+        if not in_features:
+            if line.startswith("LOCUS"):
+                fields = line.split()
+                contig = fields[1] if len(fields) > 1 else ""
+            elif line.startswith("FEATURES"):
+                in_features = True
+            continue
+
+        # blank lines inside the feature table do not end a feature
+        if not line:
+            continue
+
+        if line.startswith(_QUALIFIER_INDENT) or (open_quote and line):
+            text = line.strip()
+            if open_quote:
+                qualifiers[-1][1].append(text)
+                open_quote = text.count('"') % 2 == 0
+            elif text.startswith("/"):
+                name, _, value = text[1:].partition("=")
+                qualifiers.append((name, [value] if value else []))
+                open_quote = value.count('"') % 2 == 1
+            elif qualifiers:
+                qualifiers[-1][1].append(text)
+            else:
+                location_parts.append(text)
+            continue
+
+        if key is not None and (feature_types is None or key in feature_types):
+            yield _make_feature(contig, key, location_parts, qualifiers)
+        key = None
+
+        if line.startswith("     ") and line[5] != " ":
+            key, _, location = line.strip().partition(" ")
+            location_parts = [location.strip()]
+            qualifiers = []
+        elif line and not line.startswith(" "):
+            # ORIGIN, CONTIG, BASE COUNT or // end the feature table
+            in_features = False
+
+    if key is not None and (feature_types is None or key in feature_types):
+        yield _make_feature(contig, key, location_parts, qualifiers)
+
+
+def iter_cds(input_gbk):
+    '''
+    Yield CDS features that have both /gene and /translation qualifiers.
+    '''
+    for feature in iter_genbank_features(input_gbk, {"CDS"}):
+        if feature.get("gene") and feature.get("translation"):
+            yield feature
+
+
+def parse_gbk_cds(input_gbk: str) -> list:
+    '''
+    Parse CDS features of a GBK file that have both /gene and /translation qualifiers.
+
+    Arguments:
+        input_gbk: path to the input GBK file
+
+    Returns:
+        list of tuples (gene, translation) in the file order, duplicate gene names are kept
+    '''
+    return [(feature.get("gene"), feature.get("translation")) for feature in iter_cds(input_gbk)]
+
+
+def iter_gene_neighbors(features, genes, n_before: int = 1, n_after: int = 1):
+    '''
+    Yield genes of interest and their neighbors from a stream of features, keeping only n_before features in memory.
+    Windows do not cross records (contigs).
+
+    Arguments:
+        features: iterable of GbkFeature (e.g. iter_cds(...)) in the file order
+        genes: name or collection of names of genes of interest
+        n_before: how many genes before the target gene to include
+        n_after: how many genes after the target gene to include
+
+    Returns:
+        generator of tuples (number, feature), number is the 1-based position of the feature in features
+
+    Raises:
+        KeyError: at the end of features, if there is no gene with one of the names
+    '''
+    if isinstance(genes, str):
+        genes = [genes]
+    names = list(genes)
+    genes = set(names)
+    found = set()
+
+    before = deque(maxlen=max(n_before, 0))
+    after = 0
+    contig = None
+
+    for number, feature in enumerate(features, 1):
+        if feature.contig != contig:
+            contig = feature.contig
+            before.clear()
+            after = 0
+
+        if feature.get("gene") in genes:
+            found.add(feature.get("gene"))
+            yield from before
+            before.clear()
+            yield number, feature
+            after = n_after
+        elif after > 0:
+            yield number, feature
+            after -= 1
+        else:
+            before.append((number, feature))
+
+    for gene in names:
+        if gene not in found:
+            raise KeyError(f"There is no gene {gene}")
+
+
+class CdsRecords:
+    '''
+    CDS records of one GBK file: gene names, coordinates in the file order and lazily read translations.
+
+    Arguments:
+        genes: list of gene names
+        offsets: boundaries of the translations in blob, len(genes)+1 numbers
+        blob: bytes-like object with all translations
+        base: position of the first translation in blob
+        contigs, starts, ends, strands: records (LOCUS names), coordinates and strands of the CDS
+    '''
+
+    def __init__(self, genes: list, offsets, blob, base: int = 0, contigs: list = None, starts=None, ends=None, strands=None):
+        self.genes = genes
+        self.contigs = contigs
+        self.starts = starts
+        self.ends = ends
+        self.strands = strands
+        self._offsets = offsets
+        self._blob = blob
+        self._base = base
+
+    def __len__(self) -> int:
+        return len(self.genes)
+
+    def translation(self, i: int) -> str:
+        '''
+        Return translation of the CDS number i (0-based).
+        '''
+        start = self._base + self._offsets[i]
+        end = self._base + self._offsets[i + 1]
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def gene_index(self):
+        '''
+        Return GeneIndex of the CDS with coordinates and contigs.
+        '''
+        return GeneIndex(self.genes, self.starts, self.ends, self.contigs)
+
+    def close(self) -> None:
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+
+
+def _cache_path(input_gbk: str) -> Path:
+    return Path(f"{input_gbk}.cds.cache")
+
+
+class _CdsColumns:
+    '''
+    Columns of CDS records collected from a stream of features, translations go to write_translation.
+    '''
+
+    def __init__(self):
+        self.genes = []
+        self.contigs = []
+        self.starts = array('Q')
+        self.ends = array('Q')
+        self.strands = array('b')
+        self.offsets = array('Q', [0])
+
+    def add(self, feature: GbkFeature, write_translation) -> None:
+        translation = feature.get("translation").encode('utf-8')
+        write_translation(translation)
+        self.genes.append(feature.get("gene"))
+        self.contigs.append(feature.contig)
+        self.starts.append(feature.start)
+        self.ends.append(feature.end)
+        self.strands.append(feature.strand)
+        self.offsets.append(self.offsets[-1] + len(translation))
+
+    def arrays(self) -> tuple:
+        return self.offsets, self.starts, self.ends, self.strands
+
+
+def _write_cache(input_gbk: str, cache_path: Path, stat) -> None:
+    '''
+    Parse input_gbk and stream its CDS into the cache file, the blob is written as the GBK is read.
+    '''
+    columns = _CdsColumns()
+    path_to_write = cache_path.with_name(f".{cache_path.name}.tmp")
+    try:
+        with open(path_to_write, 'wb') as file_w:
+            file_w.write(_CACHE_MAGIC)
+            for feature in iter_cds(input_gbk):
+                columns.add(feature, file_w.write)
+
+            for column in columns.arrays():
+                file_w.write(column.tobytes())
+            header = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'byteorder': sys.byteorder,
+                      'blob_size': columns.offsets[-1], 'genes': columns.genes, 'contigs': columns.contigs}
+            header = json.dumps(header).encode('utf-8')
+            file_w.write(header)
+            file_w.write(len(header).to_bytes(8, 'little'))
+    except BaseException:
+        path_to_write.unlink(missing_ok=True)
+        raise
+    os.replace(path_to_write, cache_path)
+
+
+def _read_cache(cache_path: Path, stat):
+    '''
+    Return CdsRecords from the cache or None if the cache is missing, broken or stale.
+    '''
+    try:
+        with open(cache_path, 'rb') as file:
+            if file.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+                return None
+            file.seek(-8, os.SEEK_END)
+            header_len = int.from_bytes(file.read(8), 'little')
+            file.seek(-8 - header_len, os.SEEK_END)
+            header = json.loads(file.read(header_len).decode('utf-8'))
+            if header['size'] != stat.st_size or header['mtime_ns'] != stat.st_mtime_ns or header['byteorder'] != sys.byteorder:
+                return None
+
+            n = len(header['genes'])
+            if len(header['contigs']) != n:
+                return None
+            file.seek(len(_CACHE_MAGIC) + header['blob_size'])
+            columns = []
+            for typecode, length in (('Q', n + 1), ('Q', n), ('Q', n), ('b', n)):
+                column = array(typecode)
+                column.frombytes(file.read(column.itemsize * length))
+                if len(column) != length:
+                    return None
+                columns.append(column)
+            offsets, starts, ends, strands = columns
+            if offsets[-1] != header['blob_size']:
+                return None
+            blob = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, EOFError, KeyError, TypeError, ValueError):
+        return None
+
+    return CdsRecords(header['genes'], offsets, blob, len(_CACHE_MAGIC),
+                      header['contigs'], starts, ends, strands)
+
+
+def load_cds(input_gbk: str, use_cache: bool = True) -> CdsRecords:
+    '''
+    Return CDS records of a GBK file.
+
+    With use_cache the records are read from <input_gbk>.cds.cache if it matches
+    the current size and modification time of input_gbk, otherwise the GBK is parsed
+    straight into a new cache. If the cache can not be written, or without use_cache,
+    the records are kept in memory.
+
+    Arguments:
+        input_gbk: path to the input GBK file
+        use_cache: read and write the cache
+
+    Returns:
+        CdsRecords
+    '''
+    stat = os.stat(input_gbk)
+    cache_path = _cache_path(input_gbk)
+
+    if use_cache:
+        cds = _read_cache(cache_path, stat)
+        if cds is not None:
+            return cds
+        try:
+            _write_cache(input_gbk, cache_path, stat)
+        except OSError:
+            pass
+        else:
+            cds = _read_cache(cache_path, stat)
+            if cds is not None:
+                return cds
+
+    columns = _CdsColumns()
+    blob = []
+    for feature in iter_cds(input_gbk):
+        columns.add(feature, blob.append)
+
+    return CdsRecords(columns.genes, columns.offsets, b"".join(blob), 0,
+                      columns.contigs, columns.starts, columns.ends, columns.strands)
+
+
+class GeneIndex:
+    '''
+    Positional index of genes for neighbor queries.
+
+    Gene names map to the list of their positions, so a name met several times
+    keeps all its positions and a lookup is O(1). Neighbor windows are slices of positions.
+    If gene coordinates are given, windows can also be taken by distance in bp.
+
+    Arguments:
+        genes: gene names in the genome order
+        starts: optional start coordinates of the genes (same order as genes)
+        ends: optional end coordinates of the genes, by default equal to starts
+        contigs: optional names of the records (contigs) of the genes, distance windows do not cross them
+
+    Example:
+        index = GeneIndex(["dnaA", "dnaN", "recF", "dnaN"])
+        index.positions("dnaN") # [1, 3]
+        index.neighbors("recF", 1, 1) # [1, 2, 3]
+    '''
+
+    def __init__(self, genes: list, starts: list = None, ends: list = None, contigs: list = None):
+        self.genes = list(genes)
+        self._positions = {}
+        for i, gene in enumerate(self.genes):
+            self._positions.setdefault(gene, []).append(i)
+
+        self.starts = list(starts) if starts is not None else None
+        self.ends = list(ends) if ends is not None else self.starts
+        self.contigs = list(contigs) if contigs is not None else None
+
+        # positions where a new contig starts
+        self._runs = [0]
+        if self.contigs is not None:
+            self._runs += [i for i in range(1, len(self.contigs)) if self.contigs[i] != self.contigs[i - 1]]
+
+    def __len__(self) -> int:
+        return len(self.genes)
+
+    def __contains__(self, gene: str) -> bool:
+        return gene in self._positions
+
+    def positions(self, gene: str) -> list:
+        '''
+        Return positions of all genes with the name.
+
+        Raises:
+            KeyError: if there is no gene with the name
+        '''
+        if gene not in self._positions:
+            raise KeyError(f"There is no gene {gene}")
+        return self._positions[gene]
+
+    def _contig_bounds(self, position: int) -> tuple:
+        '''
+        Return (first, last+1) positions of the contig of the gene at position.
+        '''
+        run = bisect_right(self._runs, position) - 1
+        lo = self._runs[run]
+        hi = self._runs[run + 1] if run + 1 < len(self._runs) else len(self.genes)
+        return lo, hi
+
+    def window(self, position: int, n_before: int = 1, n_after: int = 1) -> range:
+        '''
+        Return range of positions from n_before genes before to n_after genes after position
+        (on the same contig if contigs are known).
+        '''
+        lo, hi = self._contig_bounds(position)
+        return range(max(position - n_before, lo), min(position + n_after + 1, hi))
+
+    def window_bp(self, position: int, distance: int) -> range:
+        '''
+        Return range of positions of genes that start within distance bp of the gene at position
+        (on the same contig if contigs are known). Genes must be sorted by start within a contig.
+
+        Raises:
+            ValueError: if the index has no coordinates
+        '''
+        if self.starts is None:
+            raise ValueError("GeneIndex has no coordinates, pass starts (and ends) to use distance windows")
+
+        lo, hi = self._contig_bounds(position)
+        first = bisect_left(self.starts, self.starts[position] - distance, lo, position)
+        last = bisect_right(self.starts, self.ends[position] + distance, position, hi)
+        return range(first, last)
+
+    def neighbors(self, genes, n_before: int = 1, n_after: int = 1, distance: int = None) -> list:
+        '''
+        Return sorted positions of genes of interest and their neighbors.
+
+        Arguments:
+            genes: name or collection of names of genes of interest, every position of a name is used
+            n_before: how many genes before the target gene to include
+            n_after: how many genes after the target gene to include
+            distance: if given, genes within distance bp are included instead of n_before/n_after
+
+        Raises:
+            KeyError: if there is no gene with one of the names
+        '''
+        if isinstance(genes, str):
+            genes = [genes]
+
+        selected = set()
+        for gene in genes:
+            for position in self.positions(gene):
+                if distance is None:
+                    selected.update(self.window(position, n_before, n_after))
+                else:
+                    selected.update(self.window_bp(position, distance))
+
+        return sorted(selected)
@@ -0,0 +1,257 @@
+'''
+    Indexed random access to fasta and fastq files.
+
+    build_index scans a file once and saves a samtools-compatible sidecar index
+    (<file>.fai) with the name, length, byte offset and line layout of every record.
+    IndexedReader loads the index and fetches any record or region of it from
+    the memory-mapped file with a few seeks, without a linear scan.
+
+    Index columns (tab-separated):
+        fasta: name, length, offset, line_bases, line_width
+        fastq: name, length, offset, line_bases, line_width, qual_offset
+
+    Functions:
+        build_index: scan a fasta/fastq file and write its .fai index
+        read_index: load entries of a .fai index
+
+    Classes:
+        IndexedReader: fetch records and regions by name
+
+    Example:
+        with IndexedReader("genome.fasta") as reader:
+            reader.fetch("chr1", 1000, 1100) # 100 bases of chr1, 0-based, end excluded
+
+    Raises:
+        ValueError: if the file layout can not be indexed (lines of different width inside a record, duplicate names, compressed file)
+        KeyError: if there is no record with the requested name
+'''
+
+from pathlib import Path
+from typing import NamedTuple
+import mmap
+
+from . import io_tools
+
+
+class IndexEntry(NamedTuple):
+    name: str
+    length: int
+    offset: int
+    line_bases: int
+    line_width: int
+    qual_offset: int = -1
+
+
+def _record_name(header: bytes) -> str:
+    fields = header[1:].split(maxsplit=1)
+    return fields[0].decode('latin-1') if fields else ''
+
+
+def _fasta_entries(file):
+    '''
+    Yield IndexEntry of every record of a fasta file opened in binary mode.
+    '''
+    name = None
+    pos = 0
+    for line in file:
+        line_len = len(line)
+        if line.startswith(b'>'):
+            if name is not None:
+                yield IndexEntry(name, length, offset, line_bases, line_width)
+            name = _record_name(line)
+            length = 0
+            offset = pos + line_len
+            line_bases = line_width = 0
+            last_short = False
+            blank = False
+        elif name is not None:
+            bases = len(line.rstrip(b'\r\n'))
+            if not bases:
+                blank = True
+            else:
+                # only the last line of a record may be shorter than the others
+                if blank or last_short or (line_bases and bases > line_bases):
+                    raise ValueError(f"record {name} has lines of different width, can not index it")
+                if not line_bases:
+                    line_bases, line_width = bases, line_len
+                last_short = bases < line_bases or line_len != line_width
+                length += bases
+        pos += line_len
+
+    if name is not None:
+        yield IndexEntry(name, length, offset, line_bases, line_width)
+
+
+def _fastq_entries(file):
+    '''
+    Yield IndexEntry of every record of a fastq file (four lines per record) opened in binary mode.
+    '''
+    pos = 0
+    while True:
+        header = file.readline()
+        if not header.strip():
+            if not header:
+                break
+            pos += len(header)
+            continue
+        seq = file.readline()
+        plus = file.readline()
+        qual = file.readline()
+        if not qual:
+            raise ValueError("fastq file is truncated, expected four lines per record")
+
+        bases = len(seq.rstrip(b'\r\n'))
+        offset = pos + len(header)
+        yield IndexEntry(_record_name(header), bases, offset, bases, len(seq), offset + len(seq) + len(plus))
+        pos += len(header) + len(seq) + len(plus) + len(qual)
+
+
+def _index_path(file_name) -> Path:
+    return Path(f"{file_name}.fai")
+
+
+def build_index(file_name: str, index_file: str = None) -> list:
+    '''
+    Scan a fasta or fastq file and save its index.
+
+    Arguments:
+        file_name: path to the fasta/fastq file (format is detected by the first symbol: ">" or "@")
+        index_file: path to the index, by default <file_name>.fai
+
+    Returns:
+        list of IndexEntry in the file order
+
+    Raises:
+        ValueError: if the file can not be indexed
+    '''
+    if io_tools.detect_compression(file_name): raise ValueError(f"{file_name} is compressed, only plain files can be indexed")
+
+    with open(file_name, "rb") as file:
+        first = file.read(1)
+        file.seek(0)
+        match first:
+            case b'>':
+                entries = list(_fasta_entries(file))
+            case b'@':
+                entries = list(_fastq_entries(file))
+            case b'':
+                entries = []
+            case _:
+                raise ValueError(f"{file_name} is neither fasta nor fastq file")
+
+    names = set()
+    for entry in entries:
+        if entry.name in names:
+            raise ValueError(f"duplicate record name {entry.name} in {file_name}, can not index it")
+        names.add(entry.name)
+
+    index_file = _index_path(file_name) if index_file is None else Path(index_file)
+    with open(index_file, "w", encoding="latin-1") as file_w:
+        for entry in entries:
+            columns = entry if entry.qual_offset >= 0 else entry[:5]
+            file_w.write("\t".join(map(str, columns)) + "\n")
+
+    return entries
+
+
+def read_index(index_file: str) -> list:
+    '''
+    Return list of IndexEntry of a .fai index file.
+    '''
+    entries = []
+    with open(index_file, "r", encoding="latin-1") as file:
+        for line in file:
+            fields = line.rstrip("\r\n").split("\t")
+            if len(fields) < 5:
+                continue
+            entries.append(IndexEntry(fields[0], *map(int, fields[1:6])))
+
+    return entries
+
+
+class IndexedReader:
+    '''
+    Random access to records of an indexed fasta or fastq file.
+
+    The index is built if it is missing or older than the file.
+
+    Arguments:
+        file_name: path to the fasta/fastq file
+        index_file: path to the index, by default <file_name>.fai
+
+    Example:
+        reader = IndexedReader("reads.fastq")
+        reader.fetch("read_1") # sequence of read_1
+        reader.fetch_quality("read_1") # quality string of read_1
+        reader.close()
+    '''
+
+    def __init__(self, file_name: str, index_file: str = None):
+        self.path = Path(file_name)
+        index_path = _index_path(file_name) if index_file is None else Path(index_file)
+        if not index_path.is_file() or index_path.stat().st_mtime < self.path.stat().st_mtime:
+            entries = build_index(file_name, index_path)
+        else:
+            entries = read_index(index_path)
+
+        self.index = {entry.name: entry for entry in entries}
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.path.stat().st_size else b''
+
+    def keys(self):
+        return self.index.keys()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, name: str) -> str:
+        return self.fetch(name)
+
+    def _region(self, entry: IndexEntry, offset: int, start: int, end: int) -> str:
+        if end is None or end > entry.length: end = entry.length
+        if start < 0: start = 0
+        if start >= end:
+            return ''
+
+        # byte positions of the first and the last bases of the region
+        first = offset + (start // entry.line_bases) * entry.line_width + start % entry.line_bases
+        last = offset + ((end - 1) // entry.line_bases) * entry.line_width + (end - 1) % entry.line_bases
+        return self._map[first:last + 1].translate(None, b'\r\n').decode('latin-1')
+
+    def fetch(self, name: str, start: int = 0, end: int = None) -> str:
+        '''
+        Return sequence of the record name, or its region [start, end) (0-based, end excluded).
+
+        Raises:
+            KeyError: if there is no record with the name
+        '''
+        entry = self.index[name]
+        return self._region(entry, entry.offset, start, end)
+
+    def fetch_quality(self, name: str, start: int = 0, end: int = None) -> str:
+        '''
+        Return quality string of the fastq record name, or its region [start, end).
+
+        Raises:
+            KeyError: if there is no record with the name
+            ValueError: if the file is not fastq
+        '''
+        entry = self.index[name]
+        if entry.qual_offset < 0:
+            raise ValueError(f"{self.path} is not fastq, there are no qualities")
+        return self._region(entry, entry.qual_offset, start, end)
+
+    def close(self) -> None:
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
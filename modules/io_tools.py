@@ -0,0 +1,330 @@
+'''
+    Transparent compressed input and output.
+
+    open_input detects the compression of a file by its first bytes (gzip, BGZF, bzip2, zstd)
+    and returns a file object with the decompressed data. Decompression runs in a background
+    thread that feeds the reader through a bounded queue, so parsing and decompression overlap.
+    BGZF files (bgzip) consist of independent blocks, they are decompressed block-parallel
+    in a thread pool (zlib releases the GIL).
+
+    open_output chooses the compression by the file extension (.gz, .bgz, .bz2, .zst)
+    and supports a compression level. .bgz files are written as BGZF (blocks of at most
+    65280 bytes of data and the end-of-file block), as bgzip does, so tabix and faidx accept them.
+
+    zstd needs the optional zstandard package, other formats use the standard library.
+
+    Functions:
+        detect_compression: compression of a file by its magic bytes
+        compression_from_name: compression of an output file by its extension
+        open_input: open a (possibly compressed) file for reading
+        open_output: open a (possibly compressed) file for writing
+
+    Example:
+        with open_input("reads.fastq.gz", "rb") as file:
+            for batch in fastq_tools.FastqReader(file).batches():
+                ...
+
+    Raises:
+        ImportError: if a .zst file is used without the zstandard package
+        ValueError: if wrong mode or a broken BGZF block
+'''
+
+from functools import partial
+from pathlib import Path
+import bz2
+import gzip
+import io
+import queue
+import threading
+import zlib
+
+from . import parallel_tools
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_BZ2_MAGIC = b"BZh"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_BGZF_BLOCK_SIZE = 0xff00
+_BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+_EXTENSIONS = {".gz": "gzip", ".bgz": "bgzf", ".gzip": "gzip", ".bz2": "bz2", ".zst": "zstd", ".zstd": "zstd"}
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstandard package is required for .zst files: pip install zstandard") from None
+    return zstandard
+
+
+def detect_compression(file_name: str):
+    '''
+    Return "bgzf", "gzip", "bz2", "zstd" or None (plain file) by the first bytes of the file.
+    '''
+    with open(file_name, "rb") as file:
+        head = file.read(18)
+
+    if head.startswith(_GZIP_MAGIC):
+        # BGZF is gzip with the FEXTRA flag and a "BC" extra subfield
+        if len(head) >= 14 and head[3] & 4 and head[12:14] == b"BC":
+            return "bgzf"
+        return "gzip"
+    if head.startswith(_BZ2_MAGIC):
+        return "bz2"
+    if head.startswith(_ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def compression_from_name(file_name: str):
+    '''
+    Return "gzip", "bgzf", "bz2", "zstd" or None by the extension of the file name.
+    '''
+    return _EXTENSIONS.get(Path(file_name).suffix.lower())
+
+
+class _ThreadedReader(io.RawIOBase):
+    '''
+    Raw binary stream over chunks produced by a generator in a background thread.
+    At most queue_size chunks wait in the queue.
+    '''
+
+    def __init__(self, chunks, queue_size: int = 8):
+        super().__init__()
+        self._queue = queue.Queue(queue_size)
+        self._stop = threading.Event()
+        self._chunk = b""
+        self._pos = 0
+        self._eof = False
+        self._thread = threading.Thread(target=self._produce, args=(chunks,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, chunks) -> None:
+        try:
+            for chunk in chunks:
+                if not self._put(chunk):
+                    break
+            else:
+                self._put(None)
+        except BaseException as error:
+            self._put(error)
+        finally:
+            chunks.close()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self._pos >= len(self._chunk):
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            self._chunk, self._pos = item, 0
+
+        n = min(len(buffer), len(self._chunk) - self._pos)
+        buffer[:n] = self._chunk[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._thread.join()
+        super().close()
+
+
+def _stream_chunks(opener, chunk_size: int):
+    with opener() as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+def _bgzf_blocks(file):
+    '''
+    Yield compressed BGZF blocks (whole gzip members) of a file opened in binary mode.
+    '''
+    while header := file.read(12):
+        if len(header) < 12 or not header.startswith(_GZIP_MAGIC):
+            raise ValueError("broken BGZF block header")
+        xlen = int.from_bytes(header[10:12], "little")
+        extra = file.read(xlen)
+
+        bsize = None
+        pos = 0
+        while pos + 4 <= len(extra):
+            slen = int.from_bytes(extra[pos + 2:pos + 4], "little")
+            if extra[pos:pos + 2] == b"BC":
+                bsize = int.from_bytes(extra[pos + 4:pos + 6], "little")
+            pos += 4 + slen
+        if bsize is None:
+            raise ValueError("BGZF block without BC subfield")
+
+        rest = file.read(bsize - xlen - 11)
+        yield header + extra + rest
+
+
+def _inflate_blocks(blocks: list) -> bytes:
+    return b"".join([zlib.decompress(block, 31) for block in blocks])
+
+
+def _bgzf_chunks(file_name: str, workers: int, blocks_per_task: int):
+    with open(file_name, "rb") as file:
+        blocks = _bgzf_blocks(file)
+        tasks = iter(lambda: [block for _, block in zip(range(blocks_per_task), blocks)], [])
+        yield from parallel_tools.bounded_map(_inflate_blocks, tasks, workers, pool="thread")
+
+
+def open_input(file_name: str, mode: str = "rb", encoding: str = "utf-8", threaded: bool = True, workers: int = 4, queue_size: int = 8, chunk_size: int = 2**20):
+    '''
+    Open a plain or compressed file for reading, compression is detected by the first bytes.
+
+    Arguments:
+        file_name: path to the file
+        mode: "rb" (binary) or "r"/"rt" (text)
+        encoding: encoding of text mode
+        threaded: decompress in a background thread that fills a bounded queue
+        workers: number of threads decompressing BGZF blocks in parallel
+        queue_size: number of decompressed chunks that may wait for the reader
+        chunk_size: size of decompressed chunks of gzip, bz2 and zstd streams
+
+    Returns:
+        file object
+
+    Raises:
+        ValueError: if wrong mode
+    '''
+    if mode not in {"rb", "r", "rt"}: raise ValueError(f"unsupported mode {mode}, use 'rb' or 'rt'")
+
+    compression = detect_compression(file_name)
+    if compression is None:
+        return open(file_name, mode, encoding=None if mode == "rb" else encoding)
+
+    match compression:
+        case "bgzf" if threaded and workers > 1:
+            # about 4 MB of decompressed data per task: BGZF blocks hold up to 64 KB
+            chunks = _bgzf_chunks(file_name, workers, 64)
+        case "bgzf" | "gzip":
+            opener = partial(gzip.open, file_name, "rb")
+        case "bz2":
+            opener = partial(bz2.open, file_name, "rb")
+        case "zstd":
+            zstandard = _zstandard()
+            opener = partial(zstandard.open, file_name, "rb")
+
+    if threaded:
+        if compression != "bgzf" or workers <= 1:
+            chunks = _stream_chunks(opener, chunk_size)
+        raw = io.BufferedReader(_ThreadedReader(chunks, queue_size), chunk_size)
+    else:
+        raw = opener()
+
+    if mode == "rb":
+        return raw
+    return io.TextIOWrapper(raw, encoding=encoding)
+
+
+def _bgzf_block(data: bytes, level: int) -> bytes:
+    '''
+    Return one BGZF block (gzip member with the "BC" extra subfield) of at most _BGZF_BLOCK_SIZE bytes of data.
+    '''
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    # BSIZE is the block size minus 1: 18 bytes of header, the deflated data and 8 bytes of CRC32 and ISIZE
+    header = _GZIP_MAGIC + b"\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00" + (len(deflated) + 25).to_bytes(2, "little")
+    return header + deflated + zlib.crc32(data).to_bytes(4, "little") + len(data).to_bytes(4, "little")
+
+
+class _BgzfWriter(io.RawIOBase):
+    '''
+    Binary writer of a BGZF file, the data is collected into blocks of _BGZF_BLOCK_SIZE bytes,
+    the end-of-file block is written on close.
+    '''
+
+    def __init__(self, file_name: str, mode: str = "wb", level: int = 6):
+        self._file = open(file_name, mode)
+        self._level = level
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= _BGZF_BLOCK_SIZE:
+            full = len(self._buffer) - len(self._buffer) % _BGZF_BLOCK_SIZE
+            view = memoryview(self._buffer)
+            self._file.write(b"".join(_bgzf_block(view[i:i + _BGZF_BLOCK_SIZE], self._level) for i in range(0, full, _BGZF_BLOCK_SIZE)))
+            view.release()
+            del self._buffer[:full]
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            try:
+                if self._buffer:
+                    self._file.write(_bgzf_block(bytes(self._buffer), self._level))
+                    self._buffer = bytearray()
+                self._file.write(_BGZF_EOF)
+            finally:
+                self._file.close()
+                super().close()
+
+
+def open_output(file_name: str, mode: str = "wb", encoding: str = "utf-8", compression: str = "auto", level: int = 6, newline: str = None):
+    '''
+    Open a plain or compressed file for writing.
+
+    Arguments:
+        file_name: path to the file
+        mode: "wb", "ab" (binary) or "w", "a", "wt", "at" (text)
+        encoding: encoding of text mode
+        compression: "gzip", "bgzf", "bz2", "zstd", None for a plain file or "auto" to choose by the extension of file_name
+        level: compression level (1-9 for gzip and bz2, 1-22 for zstd)
+        newline: newline translation of text mode, as in open()
+
+    Returns:
+        file object
+    '''
+    if compression == "auto":
+        compression = compression_from_name(file_name)
+
+    binary = "b" in mode
+    raw_mode = mode.replace("t", "").replace("b", "") + "b"
+
+    match compression:
+        case None:
+            return open(file_name, mode, encoding=None if binary else encoding, newline=None if binary else newline)
+        case "gzip":
+            raw = gzip.open(file_name, raw_mode, compresslevel=level)
+        case "bgzf":
+            raw = _BgzfWriter(file_name, raw_mode, level)
+        case "bz2":
+            raw = bz2.open(file_name, raw_mode, compresslevel=level)
+        case "zstd":
+            zstandard = _zstandard()
+            raw = zstandard.open(file_name, raw_mode, cctx=zstandard.ZstdCompressor(level=level))
+        case _:
+            raise ValueError(f"There are no compression {compression}")
+
+    if binary:
+        return raw
+    return io.TextIOWrapper(raw, encoding=encoding, newline=newline)
@@ -0,0 +1,264 @@
+'''
+    k-mer counting on reads of fastq/fasta files.
+
+    k-mers are cut from reads with C-level slicing (map over slices fed to Counter),
+    parts of reads with N or other symbols are skipped. Canonical counting folds every
+    k-mer with its reverse complement (the smaller one in A<C<G<T order is kept).
+    Finished tables are stored as two sorted arrays: 2-bit codes of k-mers (k <= 32)
+    and their counts, which is also the binary format of saved tables.
+
+    Functions:
+        iter_kmers: yield k-mers of a sequence
+        kmer_code: 2-bit code of a k-mer
+        read_sequences: yield sequences of a fastq or fasta file
+        count_kmers: count k-mers of reads, optionally in a process pool
+
+    Classes:
+        KmerCounter: k-mer count table
+
+    Example:
+        counter = count_kmers(read_sequences("reads.fastq"), k=21, canonical=True, workers=8)
+        counter["ACGTACGTACGTACGTACGTA"] # count of the k-mer
+        counter.spectrum() # {count: number of k-mers with this count}
+        counter.save("reads.k21.kmers")
+
+    Raises:
+        ValueError: if wrong k or a broken table file
+'''
+
+from array import array
+from collections import Counter
+from functools import partial
+from itertools import islice
+import re
+import sys
+
+from . import fastq_tools
+from . import fasta_tools
+from . import io_tools
+from . import parallel_tools
+
+MAX_K = 32
+_MAGIC = b"NTKMER1\n"
+_NOT_ACGT = re.compile(r"[^ACGT]+")
+_CODES = str.maketrans("ACGT", "0123")
+_COMPLEMENT = str.maketrans("ACGT", "TGCA")
+_HEX_TO_BASES = str.maketrans({format(i, "x"): "ACGT"[i >> 2] + "ACGT"[i & 3] for i in range(16)})
+
+
+def _check_k(k: int) -> None:
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be from 1 to {MAX_K}")
+
+
+def iter_kmers(seq: str, k: int):
+    '''
+    Yield k-mers (upper case) of a sequence, k-mers with symbols other than A/C/G/T are skipped.
+    '''
+    for part in _NOT_ACGT.split(seq.upper()):
+        yield from map(part.__getitem__, map(slice, range(len(part) - k + 1), range(k, len(part) + 1)))
+
+
+def kmer_code(kmer: str) -> int:
+    '''
+    Return 2-bit code of a k-mer of A/C/G/T (A=0, C=1, G=2, T=3, first base in the high bits).
+    '''
+    return int(kmer.translate(_CODES), 4)
+
+
+def _decode(code: int, k: int) -> str:
+    return code.to_bytes((k + 1) // 2, 'big').hex().translate(_HEX_TO_BASES)[-k:]
+
+
+def _count_batch(seqs: list, k: int) -> Counter:
+    counts = Counter()
+    for seq in seqs:
+        counts.update(iter_kmers(seq, k))
+    return counts
+
+
+class KmerCounter:
+    '''
+    Table of k-mer counts.
+
+    Arguments:
+        k: length of k-mers, 1 <= k <= 32
+        canonical: count a k-mer and its reverse complement together
+
+    Raises:
+        ValueError: if wrong k
+    '''
+
+    def __init__(self, k: int, canonical: bool = False):
+        _check_k(k)
+        self.k = k
+        self.canonical = canonical
+        self._counts = Counter()
+        self._folded = True
+
+    def update(self, seq: str) -> None:
+        '''
+        Count k-mers of one sequence.
+        '''
+        self._counts.update(iter_kmers(seq, self.k))
+        self._folded = False
+
+    def update_reads(self, seqs) -> None:
+        '''
+        Count k-mers of an iterable of sequences.
+        '''
+        for seq in seqs:
+            self.update(seq)
+
+    def merge(self, other) -> None:
+        '''
+        Add counts of another KmerCounter (or Counter of k-mers) with the same k.
+
+        Raises:
+            ValueError: if k or canonical differ
+        '''
+        if isinstance(other, KmerCounter):
+            if other.k != self.k or other.canonical != self.canonical:
+                raise ValueError("can merge only tables with the same k and canonical")
+            other = other._counts
+        self._counts.update(other)
+        self._folded = False
+
+    def _fold(self) -> Counter:
+        '''
+        Return counts, with canonical k-mers folded with their reverse complements.
+        '''
+        if self.canonical and not self._folded:
+            folded = Counter()
+            for kmer, count in self._counts.items():
+                reverse = kmer.translate(_COMPLEMENT)[::-1]
+                folded[min(kmer, reverse)] += count
+            self._counts = folded
+        self._folded = True
+        return self._counts
+
+    def _key(self, kmer: str) -> str:
+        kmer = kmer.upper()
+        if self.canonical:
+            return min(kmer, kmer.translate(_COMPLEMENT)[::-1])
+        return kmer
+
+    def __getitem__(self, kmer: str) -> int:
+        return self._fold().get(self._key(kmer), 0)
+
+    def __len__(self) -> int:
+        return len(self._fold())
+
+    def items(self):
+        '''
+        Return (k-mer, count) pairs.
+        '''
+        return self._fold().items()
+
+    def total(self) -> int:
+        '''
+        Return number of counted k-mers.
+        '''
+        return sum(self._counts.values())
+
+    def spectrum(self) -> dict:
+        '''
+        Return k-mer spectrum: {count: number of distinct k-mers with this count}, sorted by count.
+        '''
+        return dict(sorted(Counter(self._fold().values()).items()))
+
+    def to_arrays(self) -> tuple:
+        '''
+        Return (codes, counts): arrays('Q') of sorted 2-bit k-mer codes and their counts.
+        '''
+        pairs = sorted(zip(map(kmer_code, self._fold().keys()), self._counts.values()))
+        return array('Q', [code for code, _ in pairs]), array('Q', [count for _, count in pairs])
+
+    def save(self, file_name: str) -> None:
+        '''
+        Save the table in binary form: header, then sorted codes and counts as little-endian uint64.
+        '''
+        codes, counts = self.to_arrays()
+        if sys.byteorder != 'little':
+            codes.byteswap()
+            counts.byteswap()
+
+        with open(file_name, 'wb') as file_w:
+            file_w.write(_MAGIC)
+            file_w.write(bytes([self.k, int(self.canonical)]))
+            file_w.write(len(codes).to_bytes(8, 'little'))
+            file_w.write(codes.tobytes())
+            file_w.write(counts.tobytes())
+
+    @classmethod
+    def load(cls, file_name: str):
+        '''
+        Load a table saved by save.
+
+        Raises:
+            ValueError: if the file is not a k-mer table
+        '''
+        with open(file_name, 'rb') as file:
+            if file.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{file_name} is not a k-mer table")
+            k, canonical = file.read(2)
+            size = int.from_bytes(file.read(8), 'little')
+            codes, counts = array('Q'), array('Q')
+            codes.frombytes(file.read(8 * size))
+            counts.frombytes(file.read(8 * size))
+
+        if len(codes) != size or len(counts) != size:
+            raise ValueError(f"{file_name} is truncated")
+        if sys.byteorder != 'little':
+            codes.byteswap()
+            counts.byteswap()
+
+        counter = cls(k, bool(canonical))
+        counter._counts = Counter(dict(zip((_decode(code, k) for code in codes), counts)))
+        return counter
+
+
+def read_sequences(file_name: str, batch_size: int = 10000):
+    '''
+    Yield sequences of a fastq ("@" first) or fasta (">" first) file, the file may be compressed.
+    '''
+    with io_tools.open_input(file_name, "rb", threaded=False) as file:
+        first = file.read(1)
+
+    if first == b'@':
+        for record in fastq_tools.iter_fastq_records(file_name, batch_size):
+            yield record[1]
+    else:
+        with io_tools.open_input(file_name, "rt") as file:
+            for _, seq in fasta_tools.iter_fasta_records(file):
+                yield seq
+
+
+def count_kmers(seqs, k: int, canonical: bool = False, workers: int = 1, batch_size: int = 10000) -> KmerCounter:
+    '''
+    Count k-mers of sequences.
+
+    With workers > 1 batches of sequences are counted in a process pool,
+    partial tables are merged in the main process.
+
+    Arguments:
+        seqs: iterable of sequences (e.g. read_sequences(...))
+        k: length of k-mers
+        canonical: count a k-mer and its reverse complement together
+        workers: number of processes
+        batch_size: number of sequences sent to a worker at once
+
+    Returns:
+        KmerCounter
+    '''
+    counter = KmerCounter(k, canonical)
+
+    if workers > 1:
+        seqs = iter(seqs)
+        batches = iter(lambda: list(islice(seqs, batch_size)), [])
+        for counts in parallel_tools.bounded_map(partial(_count_batch, k=k), batches, workers):
+            counter.merge(counts)
+    else:
+        counter.update_reads(seqs)
+
+    return counter
@@ -0,0 +1,116 @@
+'''
+    Opt-in run statistics: stage timers, counters, per-criterion pass/fail counts and progress reports.
+
+    Functions of the package take stats=None, nothing is measured then. With a RunStats object
+    they add timings of their stages (read, parse, filter, write, ...), counters (records and bytes
+    in and out) and counts of records checked and rejected by every filter criterion.
+    Partial statistics of pool workers are plain dicts of the as_dict form and are merged by update.
+
+    Classes:
+        RunStats: collected statistics of one run
+
+    Example:
+        stats = RunStats(progress=print, progress_every=10)
+        filter_fastq("reads.fastq", "out.fastq", (20, 80), stats=stats)
+        stats.as_dict()["criteria"] # {"length": {"checked": ..., "rejected": ..., "seconds": ...}, ...}
+        stats.to_json("out.stats.json")
+'''
+
+from contextlib import contextmanager
+import json
+import time
+
+
+class RunStats:
+    '''
+    Statistics of one run.
+
+    Arguments:
+        progress: callable called with as_dict() at most every progress_every seconds (from tick)
+        progress_every: minimal interval between progress calls, seconds
+    '''
+
+    def __init__(self, progress=None, progress_every: float = 5.0):
+        self.stages = {}
+        self.counters = {}
+        self.criteria = {}
+        self.progress = progress
+        self.progress_every = progress_every
+        self._start = time.perf_counter()
+        self._last_progress = self._start
+
+    @contextmanager
+    def timer(self, stage: str):
+        '''
+        Context manager adding its run time to the stage.
+        '''
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_criterion(self, name: str, checked: int, rejected: int, seconds: float = 0.0) -> None:
+        '''
+        Add numbers of records checked and rejected by a filter criterion.
+        '''
+        criterion = self.criteria.setdefault(name, {"checked": 0, "rejected": 0, "seconds": 0.0})
+        criterion["checked"] += checked
+        criterion["rejected"] += rejected
+        criterion["seconds"] += seconds
+
+    def update(self, part: dict) -> None:
+        '''
+        Merge partial statistics of the as_dict form (e.g. returned by a pool worker).
+        '''
+        for stage, seconds in part.get("stages", {}).items():
+            self.add_time(stage, seconds)
+        for name, n in part.get("counters", {}).items():
+            self.count(name, n)
+        for name, criterion in part.get("criteria", {}).items():
+            self.add_criterion(name, criterion["checked"], criterion["rejected"], criterion["seconds"])
+
+    def tick(self) -> None:
+        '''
+        Call the progress callback if progress_every seconds passed since the last call.
+        '''
+        if self.progress is not None:
+            now = time.perf_counter()
+            if now - self._last_progress >= self.progress_every:
+                self._last_progress = now
+                self.progress(self.as_dict())
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def as_dict(self) -> dict:
+        '''
+        Return statistics as a dict: elapsed, stages, counters, criteria and records_per_s (if records_in is counted).
+        '''
+        elapsed = self.elapsed
+        rez = {
+            "elapsed": elapsed,
+            "stages": dict(self.stages),
+            "counters": dict(self.counters),
+            "criteria": {name: dict(criterion) for name, criterion in self.criteria.items()},
+        }
+        if "records_in" in self.counters and elapsed > 0:
+            rez["records_per_s"] = self.counters["records_in"] / elapsed
+        return rez
+
+    def to_json(self, file_name: str = None) -> str:
+        '''
+        Return statistics as JSON text, also save it to file_name if given.
+        '''
+        text = json.dumps(self.as_dict(), indent=4)
+        if file_name is not None:
+            with open(file_name, "w", encoding="utf-8") as file_w:
+                file_w.write(text)
+        return text
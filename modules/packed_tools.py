@@ -0,0 +1,259 @@
+'''
+    Compact 2-bit packed nucleotide sequence.
+
+    PackedSeq keeps 4 bases per byte (A=0, C=1, G=2, T/U=3, first base in the high bits),
+    plus sparse lists of runs of N and of soft-masked (lowercase) bases.
+    Complement, reverse_complement, transcribe, GC-content and slicing work directly on
+    the packed bytes with bytes.translate and big int shifts, without unpacking to str.
+
+    Classes:
+        PackedSeq: packed DNA/RNA sequence
+
+    Example:
+        seq = PackedSeq('ACGTNNacgt')
+        len(seq) # 10
+        str(seq.reverse_complement()) # 'acgtNNACGT'
+        str(seq[2:6]) # 'GTNN'
+        seq.gc_content() # 40.0
+        seq.nbytes # 3
+
+    Raises:
+        ValueError: if wrong sequence
+'''
+
+from array import array
+import re
+
+_CODES = str.maketrans("ACGTUNacgtun", "012330012330")
+_VALID = str.maketrans("", "", "ACGTUNacgtun")
+_HEX_TO_BASES = str.maketrans({format(i, "x"): "ACGT"[i >> 2] + "ACGT"[i & 3] for i in range(16)})
+_TO_RNA = str.maketrans("Tt", "Uu")
+_N_RUNS = re.compile(r"[Nn]+")
+_SOFT_RUNS = re.compile(r"[a-z]+")
+
+
+def _byte_table(func) -> bytes:
+    return bytes(func(b) for b in range(256))
+
+
+def _reverse_groups(b: int) -> int:
+    return ((b & 3) << 6) | (((b >> 2) & 3) << 4) | (((b >> 4) & 3) << 2) | (b >> 6)
+
+
+# complement of every 2-bit code is 3 - code, i.e. all bits flipped
+_COMPLEMENT = _byte_table(lambda b: b ^ 0xFF)
+_REVERSE = _byte_table(_reverse_groups)
+_REVERSE_COMPLEMENT = _byte_table(lambda b: _reverse_groups(b ^ 0xFF))
+# number of C (01) and G (10) codes in a byte
+_GC = _byte_table(lambda b: sum(1 for shift in (0, 2, 4, 6) if (b >> shift) & 3 in (1, 2)))
+
+
+def _runs(pattern, seq: str) -> array:
+    '''
+    Return flat array [start, end, start, end, ...] of the runs matched by pattern.
+    '''
+    runs = array('Q')
+    for match in pattern.finditer(seq):
+        runs.extend(match.span())
+    return runs
+
+
+def _apply_runs(seq: str, runs: array, func) -> str:
+    '''
+    Return seq with func applied to every run.
+    '''
+    if not runs:
+        return seq
+    parts = []
+    prev = 0
+    for i in range(0, len(runs), 2):
+        start, end = runs[i], runs[i + 1]
+        parts.append(seq[prev:start])
+        parts.append(func(seq[start:end]))
+        prev = end
+    parts.append(seq[prev:])
+    return "".join(parts)
+
+
+def _clip_runs(runs: array, start: int, stop: int) -> array:
+    '''
+    Return runs clipped to [start, stop) and shifted by -start.
+    '''
+    clipped = array('Q')
+    for i in range(0, len(runs), 2):
+        run_start, run_end = max(runs[i], start), min(runs[i + 1], stop)
+        if run_start < run_end:
+            clipped.extend((run_start - start, run_end - start))
+    return clipped
+
+
+def _mirror_runs(runs: array, length: int) -> array:
+    '''
+    Return runs of the reversed sequence.
+    '''
+    mirrored = array('Q')
+    for i in range(len(runs) - 2, -1, -2):
+        mirrored.extend((length - runs[i + 1], length - runs[i]))
+    return mirrored
+
+
+class PackedSeq:
+    '''
+    DNA/RNA sequence packed into 2 bits per base.
+
+    Arguments:
+        seq: str or bytes of A/C/G/T/U/N in any case (T and U can not be mixed)
+
+    Raises:
+        ValueError: if seq has other symbols or both T and U
+    '''
+
+    __slots__ = ('_data', '_length', '_n_runs', '_soft_runs', '_rna')
+
+    def __init__(self, seq):
+        if not isinstance(seq, str):
+            seq = bytes(seq).decode('latin-1')
+        if seq.translate(_VALID):
+            raise ValueError(f"{seq[:50]} is not DNA or RNA sqeuence!")
+
+        has_t, has_u = "T" in seq or "t" in seq, "U" in seq or "u" in seq
+        if has_t and has_u:
+            raise ValueError(f"{seq[:50]} is not DNA or RNA sqeuence!")
+
+        length = len(seq)
+        pad = -length % 4
+        digits = seq.translate(_CODES) + "0" * pad
+        # int() of a base-4 string is linear, base 4 is a power of two
+        self._data = int(digits, 4).to_bytes((length + pad) // 4, 'big') if length else b''
+        self._length = length
+        self._n_runs = _runs(_N_RUNS, seq)
+        self._soft_runs = _runs(_SOFT_RUNS, seq)
+        self._rna = has_u
+
+    @classmethod
+    def _make(cls, data: bytes, length: int, n_runs: array, soft_runs: array, rna: bool):
+        seq = cls.__new__(cls)
+        seq._data = data
+        seq._length = length
+        seq._n_runs = n_runs
+        seq._soft_runs = soft_runs
+        seq._rna = rna
+        return seq
+
+    @property
+    def nbytes(self) -> int:
+        '''
+        Number of bytes of the packed bases (without the N and soft-mask runs).
+        '''
+        return len(self._data)
+
+    @property
+    def is_rna(self) -> bool:
+        return self._rna
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __str__(self) -> str:
+        seq = self._data.hex().translate(_HEX_TO_BASES)[:self._length]
+        seq = _apply_runs(seq, self._n_runs, lambda run: "N" * len(run))
+        seq = _apply_runs(seq, self._soft_runs, str.lower)
+        if self._rna:
+            seq = seq.translate(_TO_RNA)
+        return seq
+
+    def __repr__(self) -> str:
+        seq = str(self[:50]) + ("..." if self._length > 50 else "")
+        return f"PackedSeq('{seq}')"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PackedSeq):
+            return NotImplemented
+        return (self._length, self._data, self._n_runs, self._soft_runs, self._rna) == (other._length, other._data, other._n_runs, other._soft_runs, other._rna)
+
+    def __hash__(self) -> int:
+        return hash((self._length, self._data, bytes(self._n_runs), bytes(self._soft_runs), self._rna))
+
+    def _clear_padding(self, data: bytes) -> bytes:
+        pad = -self._length % 4
+        if not pad or not data:
+            return data
+        return data[:-1] + bytes([data[-1] & (0xFF << 2 * pad) & 0xFF])
+
+    def _reversed_data(self, table: bytes) -> bytes:
+        '''
+        Return packed bytes of the reversed sequence, table is applied to every byte.
+        '''
+        data = self._data.translate(table)[::-1]
+        pad = -self._length % 4
+        if pad and data:
+            # the padding is now in front of the first base, shift it back to the end
+            nbytes = len(data)
+            data = ((int.from_bytes(data, 'big') << 2 * pad) & ((1 << 8 * nbytes) - 1)).to_bytes(nbytes, 'big')
+        return data
+
+    def complement(self):
+        '''
+        Return complementary sequence.
+        '''
+        return self._make(self._clear_padding(self._data.translate(_COMPLEMENT)), self._length, self._n_runs, self._soft_runs, self._rna)
+
+    def reverse(self):
+        '''
+        Return reversed sequence.
+        '''
+        return self._make(self._reversed_data(_REVERSE), self._length, _mirror_runs(self._n_runs, self._length), _mirror_runs(self._soft_runs, self._length), self._rna)
+
+    def reverse_complement(self):
+        '''
+        Return reverse complementary sequence.
+        '''
+        return self._make(self._reversed_data(_REVERSE_COMPLEMENT), self._length, _mirror_runs(self._n_runs, self._length), _mirror_runs(self._soft_runs, self._length), self._rna)
+
+    def transcribe(self):
+        '''
+        Return transcribed RNA from DNA sequence, the packed bases are shared.
+
+        Raises:
+            ValueError: if the sequence is RNA
+        '''
+        if self._rna:
+            raise ValueError(f"{self!r} is not DNA, can transcribe only DNA.")
+        return self._make(self._data, self._length, self._n_runs, self._soft_runs, True)
+
+    def gc_content(self) -> float:
+        '''
+        Return GC-content (in %), N count in the length, 0 for an empty sequence.
+        '''
+        if not self._length:
+            return 0.0
+        return sum(self._data.translate(_GC)) * 100 / self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            if key < 0:
+                key += self._length
+            if not 0 <= key < self._length:
+                raise IndexError("PackedSeq index out of range")
+            return str(self[key:key + 1])
+
+        if not isinstance(key, slice):
+            raise TypeError(f"PackedSeq indices must be integers or slices, not {type(key).__name__}")
+
+        start, stop, step = key.indices(self._length)
+        if step != 1:
+            return PackedSeq(str(self)[key])
+
+        length = max(stop - start, 0)
+        if not length:
+            return self._make(b'', 0, array('Q'), array('Q'), self._rna)
+
+        first, last = start // 4, (stop + 3) // 4
+        value = int.from_bytes(self._data[first:last], 'big')
+        # drop the bases after stop, keep the bases from start, and pad to whole bytes
+        value >>= 2 * (last * 4 - stop)
+        value &= (1 << 2 * length) - 1
+        pad = -length % 4
+        data = (value << 2 * pad).to_bytes((length + pad) // 4, 'big')
+
+        return self._make(data, length, _clip_runs(self._n_runs, start, stop), _clip_runs(self._soft_runs, start, stop), self._rna)
@@ -0,0 +1,65 @@
+'''
+    Helpers for running the sequence processing on several cores.
+
+    Functions:
+        bounded_map: ordered map over an iterable in a process or thread pool
+        with a bounded number of tasks in flight
+
+    Example:
+        for rez in bounded_map(len, ["ATG", "AT"], workers=2): # 3, 2
+            ...
+
+    Raises:
+        ValueError: if wrong number of workers or pool kind
+'''
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def bounded_map(func, iterable, workers: int, in_flight: int = None, pool: str = "process"):
+    '''
+    Apply func to every item of iterable in a pool of workers and yield the results in the input order.
+
+    Items are taken from the iterable lazily, at most in_flight tasks are submitted at once,
+    so memory is bounded by in_flight items and results, not by the iterable size.
+
+    Arguments:
+        func: picklable function of one argument (module-level function or functools.partial of it)
+        iterable: items to process, may be a generator
+        workers: number of workers in the pool
+        in_flight: maximum number of submitted but not yet yielded tasks, by default 2*workers
+        pool: "process" or "thread"
+
+    Returns:
+        generator of func(item) in the order of items
+
+    Raises:
+        ValueError: if wrong number of workers, in_flight or pool kind
+        exceptions raised by func are re-raised in the caller
+    '''
+    if workers < 1: raise ValueError("workers must be positive")
+    if in_flight is None: in_flight = 2 * workers
+    if in_flight < 1: raise ValueError("in_flight must be positive")
+
+    match pool:
+        case "process":
+            executor = ProcessPoolExecutor(workers)
+        case "thread":
+            executor = ThreadPoolExecutor(workers)
+        case _:
+            raise ValueError(f"There are no pool {pool}, use 'process' or 'thread'")
+
+    futures = deque()
+    try:
+        for item in iterable:
+            futures.append(executor.submit(func, item))
+            if len(futures) >= in_flight:
+                yield futures.popleft().result()
+
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
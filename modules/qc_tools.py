@@ -0,0 +1,225 @@
+'''
+    Single-pass quality control statistics of fastq reads.
+
+    QcStats accumulates, batch by batch, fixed-size tables:
+        per-position quality distribution (positions x quality scores),
+        per-position N counts, read length histogram, GC-content histogram (by 1 %),
+        and totals of reads, bases, GC and N.
+    Reads longer than max_length are counted in the last position and length bins,
+    quality scores are clipped to [0, max_quality].
+
+    The tables are NumPy arrays if numpy is installed (a batch is processed with bincount),
+    otherwise arrays of ints filled column by column with collections.Counter.
+    Both give the same results. Statistics of different batches or pool workers are merged by adding the tables.
+
+    Classes:
+        QcStats: QC statistics collector
+
+    Example:
+        qc = QcStats(max_length=300)
+        filter_fastq("reads.fastq", "out.fastq", (20, 80), qc=qc)
+        qc.as_dict()["gc_histogram"]
+        qc.to_json("reads.qc.json")
+
+    Raises:
+        ValueError: if wrong settings, a read with different lengths of the sequence and the quality
+        or statistics with other settings are merged
+'''
+
+from array import array
+from collections import Counter
+from itertools import zip_longest
+import json
+
+from . import fastq_tools
+from . import quality_tools
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class QcStats:
+    '''
+    QC statistics collector.
+
+    Arguments:
+        max_length: number of position and length bins
+        max_quality: maximal quality score bin
+        phred_offset: 33 for phred33 or 64 for phred64 quality strings
+        use_numpy: use numpy arrays, by default if numpy is installed
+
+    Attributes:
+        reads, bases, gc_bases, n_bases: totals
+    '''
+
+    def __init__(self, max_length: int = 500, max_quality: int = 60, phred_offset: int = quality_tools.PHRED33, use_numpy: bool = None):
+        if max_length < 1: raise ValueError("max_length must be positive")
+        if max_quality < 1: raise ValueError("max_quality must be positive")
+        if use_numpy is None: use_numpy = np is not None
+        if use_numpy and np is None: raise ValueError("numpy is not installed")
+
+        self.max_length = max_length
+        self.max_quality = max_quality
+        self.phred_offset = phred_offset
+        self.use_numpy = use_numpy
+
+        self.reads = 0
+        self.bases = 0
+        self.gc_bases = 0
+        self.n_bases = 0
+        sizes = {"quality": max_length * (max_quality + 1), "n_by_position": max_length, "lengths": max_length + 1, "gc": 101}
+        if use_numpy:
+            self._tables = {name: np.zeros(size, dtype=np.int64) for name, size in sizes.items()}
+        else:
+            self._tables = {name: array('q', bytes(8 * size)) for name, size in sizes.items()}
+
+    def spec(self) -> dict:
+        '''
+        Return settings, QcStats(**spec) is an empty collector that can be merged with this one.
+        '''
+        return {"max_length": self.max_length, "max_quality": self.max_quality, "phred_offset": self.phred_offset, "use_numpy": self.use_numpy}
+
+    def update(self, records) -> None:
+        '''
+        Add a batch of fastq records (seq_id, seq_read, seq_quality, seq_plus).
+
+        Raises:
+            ValueError: if the sequence and the quality of a read have different lengths, nothing is added then
+        '''
+        records = list(records)
+        if not records:
+            return None
+
+        seqs = [record[1] for record in records]
+        quals = [record[2] for record in records]
+        if list(map(len, seqs)) != list(map(len, quals)):
+            seq_id = next(record[0] for record in records if len(record[1]) != len(record[2]))
+            raise ValueError(f"sequence and quality of {seq_id} have different lengths")
+        joined = "".join(seqs).upper()
+
+        self.reads += len(records)
+        self.bases += len(joined)
+        self.gc_bases += joined.count('G') + joined.count('C')
+        self.n_bases += joined.count('N')
+
+        if self.use_numpy:
+            self._update_numpy(seqs, quals, joined)
+        else:
+            self._update_python(seqs, quals)
+
+    def _update_numpy(self, seqs: list, quals: list, joined: str) -> None:
+        tables = self._tables
+        width = self.max_quality + 1
+        lengths = np.fromiter(map(len, seqs), dtype=np.int64, count=len(seqs))
+
+        # position of every base in its read, positions after max_length go to the last bin
+        starts = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum(), dtype=np.int64) - np.repeat(starts, lengths)
+        np.minimum(positions, self.max_length - 1, out=positions)
+
+        scores = np.frombuffer("".join(quals).encode('latin-1'), dtype=np.uint8).astype(np.int64) - self.phred_offset
+        np.clip(scores, 0, self.max_quality, out=scores)
+        tables["quality"] += np.bincount(positions * width + scores, minlength=tables["quality"].size)
+
+        bases = np.frombuffer(joined.encode('latin-1'), dtype=np.uint8)
+        tables["n_by_position"] += np.bincount(positions[bases == ord('N')], minlength=self.max_length)
+
+        tables["lengths"] += np.bincount(np.minimum(lengths, self.max_length), minlength=self.max_length + 1)
+
+        is_gc = (bases == ord('G')) | (bases == ord('C'))
+        gc = np.bincount(np.repeat(np.arange(len(seqs)), lengths), weights=is_gc, minlength=len(seqs))
+        percent = np.rint(np.divide(gc * 100, lengths, out=np.zeros(len(seqs)), where=lengths > 0)).astype(np.int64)
+        tables["gc"] += np.bincount(percent, minlength=101)
+
+    def _update_python(self, seqs: list, quals: list) -> None:
+        tables = self._tables
+        width = self.max_quality + 1
+        last = self.max_length - 1
+        offset, max_quality = self.phred_offset, self.max_quality
+
+        quality = tables["quality"]
+        for position, column in enumerate(zip_longest(*quals, fillvalue='')):
+            row = min(position, last) * width
+            for symbol, count in Counter("".join(column)).items():
+                quality[row + min(max(ord(symbol) - offset, 0), max_quality)] += count
+
+        n_by_position = tables["n_by_position"]
+        for position, column in enumerate(zip_longest(*seqs, fillvalue='')):
+            column = "".join(column)
+            n_by_position[min(position, last)] += column.count('N') + column.count('n')
+
+        lengths = tables["lengths"]
+        for length, count in Counter(map(len, seqs)).items():
+            lengths[min(length, self.max_length)] += count
+
+        gc = tables["gc"]
+        for percent, count in Counter(round(fastq_tools.gc_content(seq)) for seq in seqs).items():
+            gc[percent] += count
+
+    def merge(self, other) -> None:
+        '''
+        Add statistics of another QcStats with the same max_length, max_quality and phred_offset.
+
+        Raises:
+            ValueError: if the settings differ
+        '''
+        if (other.max_length, other.max_quality, other.phred_offset) != (self.max_length, self.max_quality, self.phred_offset):
+            raise ValueError("can merge only QcStats with the same max_length, max_quality and phred_offset")
+
+        self.reads += other.reads
+        self.bases += other.bases
+        self.gc_bases += other.gc_bases
+        self.n_bases += other.n_bases
+        for name, table in self._tables.items():
+            other_table = other._tables[name]
+            if self.use_numpy:
+                table += np.asarray(other_table, dtype=np.int64)
+            else:
+                self._tables[name] = array('q', map(int.__add__, table, map(int, other_table)))
+
+    def _table(self, name: str) -> list:
+        table = self._tables[name]
+        return table.tolist() if self.use_numpy else list(table)
+
+    def as_dict(self) -> dict:
+        '''
+        Return statistics as a dict of plain numbers and lists, positions are cut at the longest read.
+        '''
+        width = self.max_quality + 1
+        lengths = self._table("lengths")
+        used = max((length for length, count in enumerate(lengths) if count), default=0)
+        used = min(max(used, 1), self.max_length)
+
+        flat = self._table("quality")
+        quality = [flat[i * width:(i + 1) * width] for i in range(used)]
+        quality_mean = []
+        for counts in quality:
+            total = sum(counts)
+            quality_mean.append(sum(score * count for score, count in enumerate(counts)) / total if total else 0.0)
+
+        return {
+            "reads": self.reads,
+            "bases": self.bases,
+            "gc_bases": self.gc_bases,
+            "n_bases": self.n_bases,
+            "gc_content": self.gc_bases * 100 / self.bases if self.bases else 0.0,
+            "n_content": self.n_bases * 100 / self.bases if self.bases else 0.0,
+            "mean_length": self.bases / self.reads if self.reads else 0.0,
+            "length_histogram": {length: count for length, count in enumerate(lengths) if count},
+            "gc_histogram": self._table("gc"),
+            "n_by_position": self._table("n_by_position")[:used],
+            "quality_mean_by_position": quality_mean,
+            "quality_by_position": quality,
+        }
+
+    def to_json(self, file_name: str = None) -> str:
+        '''
+        Return statistics as JSON text, also save it to file_name if given.
+        '''
+        text = json.dumps(self.as_dict())
+        if file_name is not None:
+            with open(file_name, "w", encoding="utf-8") as file_w:
+                file_w.write(text)
+        return text
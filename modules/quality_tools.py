@@ -0,0 +1,121 @@
+'''
+    Phred quality scoring of fastq quality strings.
+    Each function decodes a whole quality string (str or bytes) at once with
+    bytes arithmetic in C (sum, min, translate) instead of a per-character lookup.
+
+    Both Phred+33 (offset=33, Sanger/Illumina 1.8+) and Phred+64 (offset=64, Illumina 1.3-1.7)
+    encodings are supported, scores are not limited to 0-40.
+
+    Functions:
+        quality_scores: decode a quality string into bytes of scores
+        mean_quality: mean score of a quality string
+        min_quality: minimal score of a quality string
+        fraction_below: fraction of bases with score below a threshold
+        quality_stats: mean, min and fraction below a threshold in one call
+        mean_quality_batch: mean scores of a batch of quality strings
+
+    Example:
+        mean_quality('II#') # 27.333333333333332
+        min_quality('II#') # 2
+        fraction_below('II#', 20) # 0.3333333333333333
+        mean_quality('hhB', offset=64) # 27.333333333333332
+
+    Raises:
+        ValueError: if a quality string has symbols below the offset
+'''
+
+from functools import lru_cache
+from typing import Union
+
+PHRED33 = 33
+PHRED64 = 64
+
+
+def _to_bytes(qual: Union[str, bytes]) -> bytes:
+    if isinstance(qual, str):
+        return qual.encode('latin-1')
+    return qual
+
+
+def _check_offset(qual: bytes, offset: int) -> None:
+    if qual and min(qual) < offset:
+        raise ValueError(f"quality string has symbols below the phred offset {offset}")
+
+
+@lru_cache
+def _score_table(offset: int) -> bytes:
+    return bytes((i - offset) % 256 for i in range(256))
+
+
+def quality_scores(qual: Union[str, bytes], offset: int = PHRED33) -> bytes:
+    '''
+    Return bytes of phred scores of a quality string, one byte per base.
+    '''
+    qual = _to_bytes(qual)
+    _check_offset(qual, offset)
+    return qual.translate(_score_table(offset))
+
+
+def mean_quality(qual: Union[str, bytes], offset: int = PHRED33) -> float:
+    '''
+    Return mean phred score of a quality string, 0 for an empty string.
+    '''
+    qual = _to_bytes(qual)
+    if not qual:
+        return 0.0
+    _check_offset(qual, offset)
+    return (sum(qual) - offset * len(qual)) / len(qual)
+
+
+def min_quality(qual: Union[str, bytes], offset: int = PHRED33) -> int:
+    '''
+    Return minimal phred score of a quality string, 0 for an empty string.
+    '''
+    qual = _to_bytes(qual)
+    if not qual:
+        return 0
+    _check_offset(qual, offset)
+    return min(qual) - offset
+
+
+def fraction_below(qual: Union[str, bytes], threshold: int, offset: int = PHRED33) -> float:
+    '''
+    Return fraction of bases with phred score below threshold, 0 for an empty string.
+    '''
+    qual = _to_bytes(qual)
+    if not qual:
+        return 0.0
+    _check_offset(qual, offset)
+    # deleting all symbols below the threshold leaves only the good bases
+    limit = min(max(offset + threshold, 0), 256)
+    return (len(qual) - len(qual.translate(None, bytes(range(limit))))) / len(qual)
+
+
+def quality_stats(qual: Union[str, bytes], threshold: int = 20, offset: int = PHRED33) -> dict:
+    '''
+    Return quality metrics of a quality string.
+
+    Arguments:
+        qual: quality string
+        threshold: phred score for the fraction_below metric
+        offset: 33 for Phred+33 or 64 for Phred+64
+
+    Returns:
+        dict of a form {'mean': float, 'min': int, 'fraction_below': float}
+    '''
+    qual = _to_bytes(qual)
+    return {
+        'mean': mean_quality(qual, offset),
+        'min': min_quality(qual, offset),
+        'fraction_below': fraction_below(qual, threshold, offset)
+    }
+
+
+def mean_quality_batch(quals, offset: int = PHRED33) -> list:
+    '''
+    Return list of mean phred scores of a batch of quality strings.
+    The whole batch is validated at once.
+    '''
+    quals = [_to_bytes(qual) for qual in quals]
+    _check_offset(b"".join(quals), offset)
+    return [(sum(qual) - offset * len(qual)) / len(qual) if qual else 0.0 for qual in quals]
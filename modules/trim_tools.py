@@ -0,0 +1,168 @@
+'''
+    Trimming of fastq reads: adapters, low-quality ends and sliding-window quality trimming.
+
+    The trimming is done before the filter criteria in the same pass (see filter_tools.FastqFilter).
+    Nothing is done per base in Python:
+        leading/trailing clipping is str.lstrip/str.rstrip of the low-quality symbols,
+        the sliding window sums are computed for all windows at once with one big int multiplication
+        (quality bytes are 16-bit lanes of an int, multiplied by 1 + 2**16 + ... + 2**(16*(window-1))),
+        the first window below the threshold is found by bytes.find on the high bytes of the lanes,
+        adapters are found by str.find.
+    Reads where all qualities are above the window threshold (min of the quality string) are not scanned at all.
+
+    Classes:
+        Trimmer: trimming settings, callable record -> trimmed record or None
+
+    Example:
+        trimmer = Trimmer(window=4, window_quality=20, trailing=3, adapters=["AGATCGGAAGAGC"], min_length=36)
+        trimmer(("@read", "ACGTAGATCGGAAG", "IIIIIIIIIIIIII", "+")) # ("@read", "ACGT", "IIII", "+") if min_length <= 4
+        filter_fastq("reads.fastq", "out.fastq", quality_threshold=20, trimmer=trimmer)
+
+    Raises:
+        ValueError: if wrong settings
+'''
+
+from functools import lru_cache
+
+from . import quality_tools
+
+MAX_WINDOW = 128
+# high byte of a lane -> 0 if the window sum is below the limit (bit 15 is not set), 1 otherwise
+_HIGH_BIT = bytes(int(b >= 0x80) for b in range(256))
+
+
+@lru_cache(maxsize=4096)
+def _lanes(value: int, n: int) -> int:
+    '''
+    Return int with n 16-bit lanes equal to value.
+    '''
+    return int.from_bytes(value.to_bytes(2, 'little') * n, 'little')
+
+
+def _chars_below(threshold: int, offset: int) -> str:
+    '''
+    Return quality symbols with scores below threshold.
+    '''
+    return "".join(chr(code) for code in range(offset, min(offset + threshold, 256)))
+
+
+class Trimmer:
+    '''
+    Read trimmer, the steps are applied in the order: adapter, leading, trailing, sliding window.
+
+    Arguments:
+        window: size of the sliding window
+        window_quality: the read is cut at the start of the first window with mean quality below it, None to skip
+        leading: bases with quality below it are removed from the 5' end, None to skip
+        trailing: bases with quality below it are removed from the 3' end, None to skip
+        adapters: adapter sequences, the read is cut at the first adapter found
+        min_overlap: minimal overlap of a partial adapter at the 3' end (and k-mer size of the "kmer" mode)
+        adapter_mode: "exact" - the whole adapter or its prefix at the 3' end of at least min_overlap bases,
+                      "kmer" - the first k-mer (min_overlap bases) of the adapter anywhere in the read
+        min_length: reads shorter than it after trimming are dropped
+        phred_offset: 33 for phred33 or 64 for phred64 quality strings
+
+    Raises:
+        ValueError: if wrong settings
+    '''
+
+    def __init__(self, window: int = 4, window_quality: int = None, leading: int = None, trailing: int = None, adapters=(), min_overlap: int = 8, adapter_mode: str = "exact", min_length: int = 1, phred_offset: int = quality_tools.PHRED33):
+        if not 1 <= window <= MAX_WINDOW: raise ValueError(f"window must be from 1 to {MAX_WINDOW}")
+        if min_overlap < 1: raise ValueError("min_overlap must be positive")
+        if adapter_mode not in {"exact", "kmer"}: raise ValueError(f"There are no adapter mode {adapter_mode}, use 'exact' or 'kmer'")
+        if isinstance(adapters, str): adapters = [adapters]
+
+        self.window = window
+        self.window_quality = window_quality
+        self.leading = leading
+        self.trailing = trailing
+        self.adapters = tuple(adapter.upper() for adapter in adapters)
+        self.min_overlap = min_overlap
+        self.adapter_mode = adapter_mode
+        self.min_length = min_length
+        self.phred_offset = phred_offset
+
+        self._leading_chars = _chars_below(leading, phred_offset) if leading else None
+        self._trailing_chars = _chars_below(trailing, phred_offset) if trailing else None
+        self._window_char = chr(window_quality + phred_offset) if window_quality is not None else None
+
+    def __repr__(self) -> str:
+        return (f"Trimmer(window={self.window}, window_quality={self.window_quality}, leading={self.leading}, trailing={self.trailing}, "
+                f"adapters={list(self.adapters)}, min_overlap={self.min_overlap}, adapter_mode='{self.adapter_mode}', "
+                f"min_length={self.min_length}, phred_offset={self.phred_offset})")
+
+    def adapter_start(self, seq: str) -> int:
+        '''
+        Return position of the first adapter in seq, len(seq) if there is no adapter.
+        '''
+        seq = seq.upper()
+        end = len(seq)
+        for adapter in self.adapters:
+            seed = adapter[:self.min_overlap]
+            if self.adapter_mode == "kmer":
+                pos = seq.find(seed, 0, end)
+                if pos != -1:
+                    end = pos
+                continue
+
+            pos = seq.find(adapter, 0, end)
+            if pos != -1:
+                end = pos
+                continue
+
+            # a prefix of the adapter at the 3' end, not shorter than min_overlap
+            pos = seq.find(seed, max(0, len(seq) - len(adapter) + 1))
+            while pos != -1 and pos < end:
+                if adapter.startswith(seq[pos:]):
+                    end = pos
+                    break
+                pos = seq.find(seed, pos + 1)
+        return end
+
+    def window_end(self, quality: str) -> int:
+        '''
+        Return position of the first window with mean quality below window_quality, len(quality) if there is no such window.
+        '''
+        if not quality or min(quality) >= self._window_char:
+            return len(quality)
+
+        n = len(quality)
+        window = min(self.window, n)
+        limit = (self.window_quality + self.phred_offset) * window
+
+        lanes = bytearray(2 * n)
+        lanes[0::2] = quality.encode('latin-1')
+        # lane j holds the sum of the window ending at j plus 0x8000 - limit, a window sum < 2**15 can not carry
+        sums = int.from_bytes(lanes, 'little') * _lanes(1, window) + _lanes(0x8000 - limit, n + window)
+        high = sums.to_bytes(2 * (n + window), 'little')[1::2].translate(_HIGH_BIT)
+
+        end = high.find(0, window - 1, n)
+        return n if end == -1 else end - window + 1
+
+    def __call__(self, record: tuple):
+        '''
+        Return trimmed record (the same tuple if nothing is trimmed) or None if it is shorter than min_length.
+        '''
+        seq_id, seq, quality, plus = record
+        start, end = 0, len(seq)
+
+        if self.adapters:
+            end = self.adapter_start(seq)
+        if self._leading_chars:
+            start = end - len(quality[:end].lstrip(self._leading_chars))
+        if self._trailing_chars:
+            end = start + len(quality[start:end].rstrip(self._trailing_chars))
+        if self._window_char is not None:
+            end = start + self.window_end(quality[start:end])
+
+        if end - start < self.min_length:
+            return None
+        if start == 0 and end == len(seq):
+            return record
+        return (seq_id, seq[start:end], quality[start:end], plus)
+
+    def trim_records(self, records) -> list:
+        '''
+        Return list of trimmed records, records shorter than min_length are dropped.
+        '''
+        return [record for record in map(self, records) if record is not None]
@@ -0,0 +1,86 @@
+'''
+    Shared fixtures of the tests: the repository root on sys.path and synthetic input files.
+'''
+
+from pathlib import Path
+import random
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def random_reads(n: int, seed: int = 0, min_length: int = 30, max_length: int = 160, alphabet: str = "ACGT") -> list:
+    '''
+    Return n random fastq records (seq_id, seq, qual, plus), phred33 qualities from 2 to 41.
+    '''
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        length = rng.randint(min_length, max_length)
+        seq = "".join(rng.choice(alphabet) for _ in range(length))
+        qual = "".join(chr(33 + rng.randint(2, 41)) for _ in range(length))
+        records.append((f"@read{i} sample=1", seq, qual, "+"))
+    return records
+
+
+def write_fastq(path: Path, records) -> Path:
+    with open(path, "w", encoding="latin-1") as file:
+        for seq_id, seq, qual, plus in records:
+            file.write(f"{seq_id}\n{seq}\n{plus}\n{qual}\n")
+    return path
+
+
+@pytest.fixture
+def reads() -> list:
+    return random_reads(3000)
+
+
+@pytest.fixture
+def reads_fastq(tmp_path, reads) -> Path:
+    return write_fastq(tmp_path / "reads.fastq", reads)
+
+
+GBK = '''LOCUS       CONTIG1  20000 bp    DNA     linear   BCT 01-JAN-2020
+DEFINITION  synthetic.
+FEATURES             Location/Qualifiers
+     source          1..20000
+                     /organism="synthetic"
+{features}ORIGIN
+//
+LOCUS       CONTIG2  5000 bp    DNA     linear   BCT 01-JAN-2020
+FEATURES             Location/Qualifiers
+     CDS             complement(join(1..100,200..300))
+                     /gene="far1"
+                     /translation="MFAR"
+     CDS             400..500
+                     /gene="far2"
+                     /translation="MFARFAR"
+ORIGIN
+//
+'''
+
+GBK_GENES = ["g0", "g1", "g2", "dup", "g4", "dup", "g6", "g7"]
+
+
+def gbk_feature(i: int, gene: str) -> str:
+    start = 1 + 1000 * i
+    location = f"complement({start}..{start + 899})" if i % 3 == 0 else f"{start}..{start + 899}"
+    translation = "M" + "ACDEFGHIKLMNPQRSTVWY"[i] * (40 + i) + "K"
+    lines = [f"     gene            {start}..{start + 899}", f'                     /gene="{gene}"',
+             f"     CDS             {location}", f'                     /gene="{gene}"',
+             f'                     /product="hypothetical', '                     protein"',
+             f'                     /translation="{translation[:44]}']
+    lines += [f"                     {translation[pos:pos + 58]}" for pos in range(44, len(translation), 58)]
+    lines[-1] += '"'
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def gbk_file(tmp_path) -> Path:
+    path = tmp_path / "genome.gbk"
+    path.write_text(GBK.format(features="".join(gbk_feature(i, gene) for i, gene in enumerate(GBK_GENES))), encoding="utf-8")
+    return path
@@ -0,0 +1,29 @@
+import pytest
+
+import bio_files_processor
+
+
+def read_fasta(path) -> list:
+    lines = [line for line in path.read_text(encoding="utf-8").splitlines() if line]
+    return list(zip(lines[0::2], lines[1::2]))
+
+
+EXPECTED = [
+    (">gene_g2|name_g2", "M" + "D" * 42 + "K"),
+    (">gene_dup|name_dup", "M" + "E" * 43 + "K"),
+    (">gene_g4|name_g4", "M" + "F" * 44 + "K"),
+    (">gene_dup|name_dup|cds_6", "M" + "G" * 45 + "K"),
+    (">gene_g6|name_g6", "M" + "H" * 46 + "K"),
+]
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_parse_blast_output_headers(tmp_path, gbk_file, use_cache):
+    bio_files_processor.parse_blast_output(str(gbk_file), ["dup"], "genes.fasta", use_cache=use_cache, output_dir=str(tmp_path / "out"))
+    assert read_fasta(tmp_path / "out" / "genes.fasta") == EXPECTED
+
+
+def test_parse_blast_output_missing_gene(tmp_path, gbk_file):
+    with pytest.raises(KeyError):
+        bio_files_processor.parse_blast_output(str(gbk_file), ["nothing"], "genes.fasta", use_cache=False, output_dir=str(tmp_path / "out"))
+    assert not (tmp_path / "out" / "genes.fasta").exists()
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from modules.dedup_tools import Deduplicator
+
+_COMPLEMENT = str.maketrans("ACGTN", "TGCAN")
+
+
+def reads_with_duplicates(n: int, seed: int = 21) -> list:
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        if records and rng.random() < 0.3:
+            seq = rng.choice(records)[1]
+            seq = rng.choice([seq, seq.lower(), seq.upper().translate(_COMPLEMENT)[::-1]])
+        else:
+            seq = "".join(rng.choice("ACGTN") for _ in range(rng.randint(1, 12)))
+        records.append((f"@read{i}", seq, "I" * len(seq), "+"))
+    return records
+
+
+def reference(records, mode: str) -> list:
+    seen = set()
+    kept = []
+    for record in records:
+        seq = record[1].upper()
+        key = min(seq, seq.translate(_COMPLEMENT)[::-1]) if mode == "rc" else seq
+        if key not in seen:
+            seen.add(key)
+            kept.append(record)
+    return kept
+
+
+@pytest.mark.parametrize("mode", ["exact", "rc"])
+@pytest.mark.parametrize("method", ["compact", "set", "disk"])
+def test_matches_reference(tmp_path, mode, method):
+    records = reads_with_duplicates(5000)
+    expected = reference(records, mode)
+    with Deduplicator(mode, method, memory_limit=300, max_runs=3, tmp_dir=str(tmp_path)) as dedup:
+        kept = dedup.filter_new(records[:2000]) + dedup.filter_new(records[2000:])
+        assert kept == expected
+        assert dedup.duplicates == len(records) - len(expected)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("mode", ["exact", "rc"])
+def test_bloom_keeps_first_reads(mode):
+    records = reads_with_duplicates(5000)
+    expected = reference(records, mode)
+    with Deduplicator(mode, "bloom", capacity=10000, error_rate=0.001) as dedup:
+        kept = dedup.filter_new(records)
+    # a unique read may be dropped, a duplicate is never kept
+    assert set(record[0] for record in kept) <= set(record[0] for record in expected)
+    assert len(kept) >= len(expected) * 0.99
+
+
+def test_wrong_settings():
+    with pytest.raises(ValueError):
+        Deduplicator(method="list")
+    with pytest.raises(ValueError):
+        Deduplicator(mode="reverse")
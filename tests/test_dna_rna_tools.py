@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+import main
+from modules import dna_rna_tools
+
+
+def random_batch(rng, n: int) -> list:
+    alphabet = rng.choice(["ACGT", "acgtACGT", "ACGU", "acgu", "ACG", "ACGTU", "ACGTN"])
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20))) for _ in range(n)]
+
+
+def per_sequence(seqs, procedure):
+    func = dna_rna_tools.procedures[procedure]
+    rez = []
+    for seq in seqs:
+        try:
+            rez.append(func(seq))
+        except ValueError:
+            rez.append(ValueError)
+    return rez
+
+
+@pytest.mark.parametrize("procedure", list(dna_rna_tools.procedures))
+def test_apply_batch_matches_per_sequence(procedure):
+    rng = random.Random(procedure)
+    for _ in range(300):
+        seqs = random_batch(rng, rng.randint(0, 6))
+        expected = per_sequence(seqs, procedure)
+        if ValueError in expected:
+            with pytest.raises(ValueError):
+                dna_rna_tools.apply_batch(seqs, procedure)
+        else:
+            assert dna_rna_tools.apply_batch(seqs, procedure) == expected
+            assert dna_rna_tools.apply_batch([seq.encode() for seq in seqs], procedure) == [
+                rez.encode() if isinstance(rez, str) else rez for rez in expected]
+
+
+def test_run_dna_rna_tools_batch_offsets():
+    seqs = ["ATG", "aT", "", "GGCC"]
+    offsets = [0]
+    for seq in seqs:
+        offsets.append(offsets[-1] + len(seq))
+    assert list(main.run_dna_rna_tools_batch("".join(seqs), "reverse_complement", offsets=offsets)) == ["CAT", "At", "", "GGCC"]
+    assert list(main.run_dna_rna_tools_batch(seqs, "complement", batch_size=2, workers=2)) == ["TAC", "tA", "", "CCGG"]
+
+
+def test_seq_op_reports_invalid_sequences(capsys):
+    assert main.main(["seq-op", "transcribe", "-s", "ATG", "-s", "AXG"]) == 1
+    assert capsys.readouterr().out.splitlines() == ["ATG\tAUG", "AXG\terror: AXG is not DNA, can transcribe only DNA."]
+    assert main.main(["seq-op", "is_dna", "-s", "ATG", "-s", "AXG"]) == 0
@@ -0,0 +1,144 @@
+import json
+
+import pytest
+
+import main
+import modules.fastq_tools
+from modules import checkpoint_tools, io_tools
+
+GC_BOUNDS, LENGTH_BOUNDS, QUALITY = (30, 60), (50, 140), 20
+
+
+def baseline_filter(records, gc_bounds=GC_BOUNDS, length_bounds=LENGTH_BOUNDS, quality_threshold=QUALITY) -> bytes:
+    '''
+    Output of filter_fastq before the rewrite: one record at a time, GC-content, length
+    and the rounded mean phred33 quality, all bounds included.
+    '''
+    out = []
+    for seq_id, seq, qual, plus in records:
+        gc = (seq.upper().count("G") + seq.upper().count("C")) * 100 / len(seq)
+        quality = round(sum(ord(symbol) - 33 for symbol in qual) / len(qual))
+        if gc_bounds[0] <= gc <= gc_bounds[1] and length_bounds[0] <= len(seq) <= length_bounds[1] and quality >= quality_threshold:
+            out.append(f"{seq_id}\n{seq}\n{plus}\n{qual}\n")
+    return "".join(out).encode("latin-1")
+
+
+def run_filter(input_fastq, output_dir, **options):
+    main.filter_fastq(str(input_fastq), "out.fastq", GC_BOUNDS, LENGTH_BOUNDS, QUALITY, output_dir=str(output_dir), **options)
+    return output_dir / "out.fastq"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("chunk_size", [4096, 2**22])
+def test_filter_fastq_matches_baseline(tmp_path, reads, reads_fastq, workers, chunk_size):
+    output = run_filter(reads_fastq, tmp_path / "filtered", workers=workers, chunk_size=chunk_size, if_exists="overwrite")
+    assert output.read_bytes() == baseline_filter(reads)
+    assert not checkpoint_tools.checkpoint_path(output).exists()
+
+
+@pytest.mark.parametrize("extension", [".gz", ".bgz", ".bz2"])
+def test_filter_fastq_compressed_input(tmp_path, reads, reads_fastq, extension):
+    compressed = tmp_path / f"reads.fastq{extension}"
+    with io_tools.open_output(str(compressed), "wb") as file:
+        file.write(reads_fastq.read_bytes())
+    output = run_filter(compressed, tmp_path / "filtered", if_exists="overwrite")
+    assert output.read_bytes() == baseline_filter(reads)
+
+
+def test_filter_fastq_crlf_and_phred_above_40(tmp_path):
+    records = [("@r1", "ACGTACGTGC" * 6, "J" * 60, "+"), ("@r2", "ACGTACGTGC" * 6, "K" * 60, "+r2")]
+    input_fastq = tmp_path / "reads.fastq"
+    input_fastq.write_bytes(b"".join(f"{a}\r\n{b}\r\n{d}\r\n{c}\r\n".encode() for a, b, c, d in records))
+    output = run_filter(input_fastq, tmp_path / "filtered", if_exists="overwrite")
+    assert output.read_bytes() == baseline_filter(records)
+
+
+def interrupt_after(monkeypatch, blocks: int):
+    '''
+    Make filter_fastq_block raise KeyboardInterrupt at the block number `blocks` (from 0).
+    '''
+    filter_block = modules.fastq_tools.filter_fastq_block
+    calls = []
+
+    def interrupted(block, fastq_filter):
+        calls.append(block)
+        if len(calls) > blocks:
+            raise KeyboardInterrupt
+        return filter_block(block, fastq_filter)
+
+    monkeypatch.setattr(modules.fastq_tools, "filter_fastq_block", interrupted)
+
+
+def test_resume_after_interruption(tmp_path, monkeypatch, reads, reads_fastq):
+    output_dir = tmp_path / "filtered"
+    interrupt_after(monkeypatch, 5)
+    with pytest.raises(KeyboardInterrupt):
+        run_filter(reads_fastq, output_dir, chunk_size=4096, checkpoint_every=1, if_exists="overwrite")
+    monkeypatch.undo()
+
+    output = output_dir / "out.fastq"
+    expected = baseline_filter(reads)
+    state = json.loads(checkpoint_tools.checkpoint_path(output).read_text(encoding="utf-8"))
+    assert state["input_offset"] > 0
+    assert 0 < state["output_size"] <= output.stat().st_size < len(expected)
+
+    run_filter(reads_fastq, output_dir, chunk_size=4096, checkpoint_every=1, if_exists="resume")
+    assert output.read_bytes() == expected
+    assert not checkpoint_tools.checkpoint_path(output).exists()
+
+
+def test_interrupted_output_is_not_skipped(tmp_path, monkeypatch, reads, reads_fastq):
+    output_dir = tmp_path / "filtered"
+    interrupt_after(monkeypatch, 0)
+    with pytest.raises(KeyboardInterrupt):
+        run_filter(reads_fastq, output_dir, chunk_size=4096, if_exists="overwrite")
+    monkeypatch.undo()
+
+    run_filter(reads_fastq, output_dir, chunk_size=4096, if_exists="skip")
+    assert (output_dir / "out.fastq").read_bytes() == baseline_filter(reads)
+
+
+def test_complete_output_is_skipped(tmp_path, reads_fastq):
+    output_dir = tmp_path / "filtered"
+    output_dir.mkdir()
+    (output_dir / "out.fastq").write_bytes(b"kept")
+    run_filter(reads_fastq, output_dir, if_exists="skip")
+    assert (output_dir / "out.fastq").read_bytes() == b"kept"
+
+
+def test_resume_without_checkpoint_starts_again(tmp_path, reads, reads_fastq):
+    output_dir = tmp_path / "filtered"
+    output_dir.mkdir()
+    expected = baseline_filter(reads)
+    (output_dir / "out.fastq").write_bytes(expected[:1000])
+    run_filter(reads_fastq, output_dir, if_exists="resume")
+    assert (output_dir / "out.fastq").read_bytes() == expected
+
+
+def test_resume_with_other_parameters_fails(tmp_path, monkeypatch, reads_fastq):
+    output_dir = tmp_path / "filtered"
+    interrupt_after(monkeypatch, 2)
+    with pytest.raises(KeyboardInterrupt):
+        run_filter(reads_fastq, output_dir, chunk_size=4096, checkpoint_every=1, if_exists="overwrite")
+    monkeypatch.undo()
+
+    with pytest.raises(ValueError):
+        main.filter_fastq(str(reads_fastq), "out.fastq", (0, 100), LENGTH_BOUNDS, QUALITY, output_dir=str(output_dir), if_exists="resume")
+
+
+def test_cli_skips_only_finished_outputs(tmp_path, reads, reads_fastq, capsys):
+    output_dir = tmp_path / "filtered"
+    output_dir.mkdir()
+    output = output_dir / "reads.fastq"
+    argv = ["filter-fastq", str(reads_fastq), "-o", str(output_dir), "--gc-bounds", "30", "60",
+            "--length-bounds", "50", "140", "--quality-threshold", "20", "--if-exists", "skip"]
+
+    output.write_bytes(b"unfinished")
+    checkpoint_tools.checkpoint_path(output).write_text("{}", encoding="utf-8")
+    assert main.main(argv) == 0
+    assert output.read_bytes() == baseline_filter(reads)
+
+    output.write_bytes(b"finished")
+    assert main.main(argv) == 0
+    assert output.read_bytes() == b"finished"
+
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from modules import genbank_tools
+from modules.genbank_tools import parse_location
+
+from conftest import GBK_GENES
+
+
+@pytest.mark.parametrize("location, expected", [
+    ("1..900", (1, 900, 1)),
+    ("complement(1..900)", (1, 900, -1)),
+    ("<1..>900", (1, 900, 1)),
+    ("join(1..5,10..20)", (1, 20, 1)),
+    ("complement(join(<1..200,300..>450))", (1, 450, -1)),
+    ("join(complement(4918..5163),complement(2691..4571))", (2691, 5163, -1)),
+    ("order(complement(10..20),complement(1..5))", (1, 20, -1)),
+    ("join(complement(1..5),30..40)", (1, 40, 1)),
+    ("complement(join(complement(1..5),complement(8..9)))", (1, 9, 1)),
+    ("", (0, 0, 1)),
+])
+def test_parse_location(location, expected):
+    assert parse_location(location) == expected
+
+
+def test_iter_cds(gbk_file):
+    features = list(genbank_tools.iter_cds(str(gbk_file)))
+    assert [feature.get("gene") for feature in features] == GBK_GENES + ["far1", "far2"]
+    assert [feature.contig for feature in features][-3:] == ["CONTIG1", "CONTIG2", "CONTIG2"]
+    assert [feature.strand for feature in features[:4]] == [-1, 1, 1, -1]
+    assert (features[-2].start, features[-2].end, features[-2].strand) == (1, 300, -1)
+    assert features[1].get("translation") == "M" + "C" * 41 + "K"
+
+
+def records_of(cds) -> list:
+    return [(cds.genes[i], cds.contigs[i], cds.starts[i], cds.ends[i], cds.strands[i], cds.translation(i)) for i in range(len(cds))]
+
+
+def test_cds_cache_round_trip(gbk_file):
+    parsed = genbank_tools.load_cds(str(gbk_file), use_cache=False)
+    expected = records_of(parsed)
+    assert not genbank_tools._cache_path(str(gbk_file)).exists()
+
+    built = genbank_tools.load_cds(str(gbk_file))
+    assert genbank_tools._cache_path(str(gbk_file)).is_file()
+    cached = genbank_tools.load_cds(str(gbk_file))
+    assert records_of(built) == records_of(cached) == expected
+    built.close()
+    cached.close()
+
+
+def test_cds_cache_rebuilt_when_broken_or_stale(gbk_file):
+    cache_path = genbank_tools._cache_path(str(gbk_file))
+    expected = records_of(genbank_tools.load_cds(str(gbk_file), use_cache=False))
+    genbank_tools.load_cds(str(gbk_file)).close()
+    valid = cache_path.read_bytes()
+
+    for broken in (b"", genbank_tools._CACHE_MAGIC, valid[:len(valid) // 2], valid[:-3], b"NTCDS3" + valid[6:]):
+        cache_path.write_bytes(broken)
+        cds = genbank_tools.load_cds(str(gbk_file))
+        assert records_of(cds) == expected
+        cds.close()
+
+    text = gbk_file.read_text(encoding="utf-8").replace('/gene="g7"', '/gene="g8"')
+    gbk_file.write_text(text, encoding="utf-8")
+    stat = gbk_file.stat()
+    os.utime(gbk_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    cds = genbank_tools.load_cds(str(gbk_file))
+    assert cds.genes[len(GBK_GENES) - 1] == "g8"
+    cds.close()
+
+
+def test_iter_gene_neighbors_missing_gene(gbk_file):
+    with pytest.raises(KeyError):
+        list(genbank_tools.iter_gene_neighbors(genbank_tools.iter_cds(str(gbk_file)), ["g1", "nothing"]))
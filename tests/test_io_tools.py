@@ -0,0 +1,40 @@
+import gzip
+import os
+
+import pytest
+
+from modules import io_tools
+
+
+def payload(size: int) -> bytes:
+    return (os.urandom(size // 2).hex().encode() + b"ACGT\n" * (size // 10))[:size]
+
+
+@pytest.mark.parametrize("size", [0, 100, 0xff00, 0xff00 + 1, 3 * 0xff00 + 17])
+def test_bgzf_round_trip(tmp_path, size):
+    path = tmp_path / "data.bgz"
+    data = payload(size)
+    with io_tools.open_output(str(path), "wb") as file:
+        for start in range(0, len(data), 10000):
+            file.write(data[start:start + 10000])
+
+    assert io_tools.detect_compression(str(path)) == "bgzf"
+    assert gzip.decompress(path.read_bytes()) == data
+    with open(path, "rb") as file:
+        blocks = list(io_tools._bgzf_blocks(file))
+    assert b"".join(blocks) == path.read_bytes()
+    assert blocks[-1] == io_tools._BGZF_EOF
+    assert all(len(gzip.decompress(block)) <= 0xff00 for block in blocks)
+    for workers in (1, 4):
+        with io_tools.open_input(str(path), "rb", workers=workers) as file:
+            assert file.read() == data
+
+
+@pytest.mark.parametrize("extension", [".gz", ".bz2", ""])
+def test_text_round_trip(tmp_path, extension):
+    path = tmp_path / f"data.txt{extension}"
+    text = "".join(f"line {i}\n" for i in range(5000))
+    with io_tools.open_output(str(path), "w") as file:
+        file.write(text)
+    with io_tools.open_input(str(path), "rt") as file:
+        assert file.read() == text
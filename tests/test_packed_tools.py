@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from modules import dna_rna_tools
+from modules.packed_tools import PackedSeq
+
+
+def random_seqs(n: int, seed: int = 13):
+    rng = random.Random(seed)
+    for _ in range(n):
+        alphabet = rng.choice(["ACGT", "ACGTN", "ACGTacgtNn", "ACGU", "acgun"])
+        yield "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 70)))
+
+
+@pytest.mark.parametrize("seq", ["", "A", "ACGTNNacgt", "NNNN", "acgtn", "ACGU", "ACGTACGTA"])
+def test_round_trip(seq):
+    packed = PackedSeq(seq)
+    assert str(packed) == seq
+    assert len(packed) == len(seq)
+    assert packed.nbytes == (len(seq) + 3) // 4
+
+
+def test_round_trip_fuzz():
+    for seq in random_seqs(500):
+        packed = PackedSeq(seq)
+        assert str(packed) == seq
+        assert PackedSeq(str(packed)) == packed
+
+
+def test_operations_match_dna_rna_tools():
+    for seq in random_seqs(500):
+        if not seq or dna_rna_tools._kind(seq) is None:
+            continue
+        packed = PackedSeq(seq)
+        assert str(packed.reverse()) == seq[::-1]
+        assert str(packed.complement()) == dna_rna_tools.complement(seq)
+        assert str(packed.reverse_complement()) == dna_rna_tools.reverse_complement(seq)
+        if dna_rna_tools.is_dna(seq):
+            assert str(packed.transcribe()) == dna_rna_tools.transcribe(seq)
+        gc = sum(base in "GCgc" for base in seq) * 100 / len(seq)
+        assert packed.gc_content() == pytest.approx(gc)
+
+
+def test_slicing_fuzz():
+    rng = random.Random(5)
+    for seq in random_seqs(300):
+        packed = PackedSeq(seq)
+        for _ in range(5):
+            start, stop = sorted(rng.randint(-len(seq) - 2, len(seq) + 2) for _ in range(2))
+            assert str(packed[start:stop]) == seq[start:stop]
+        if seq:
+            i = rng.randrange(len(seq))
+            assert str(packed[i]) == seq[i]
+
+
+def test_wrong_sequence():
+    with pytest.raises(ValueError):
+        PackedSeq("ACGTX")
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from modules import fastq_tools, qc_tools
+from modules.qc_tools import QcStats
+
+from conftest import random_reads
+
+BACKENDS = [False] + ([True] if qc_tools.np is not None else [])
+
+
+def naive_qc(records, max_length: int = 500, max_quality: int = 60, offset: int = 33) -> dict:
+    quality = [[0] * (max_quality + 1) for _ in range(max_length)]
+    n_by_position = [0] * max_length
+    lengths = {}
+    gc = [0] * 101
+    for _, seq, qual, _ in records:
+        for i, symbol in enumerate(qual):
+            quality[min(i, max_length - 1)][min(max(ord(symbol) - offset, 0), max_quality)] += 1
+        for i, base in enumerate(seq.upper()):
+            if base == "N":
+                n_by_position[min(i, max_length - 1)] += 1
+        length = min(len(seq), max_length)
+        lengths[length] = lengths.get(length, 0) + 1
+        gc[round(fastq_tools.gc_content(seq))] += 1
+    return {"quality": quality, "n_by_position": n_by_position, "lengths": lengths, "gc": gc}
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_qc_matches_naive(use_numpy):
+    records = random_reads(1500, seed=3, min_length=0, max_length=90, alphabet="ACGTNacgn") + random_reads(20, seed=4, min_length=95, max_length=130)
+    qc = QcStats(max_length=100, use_numpy=use_numpy)
+    qc.update(records[:700])
+    part = QcStats(max_length=100, use_numpy=use_numpy)
+    part.update(records[700:])
+    qc.merge(part)
+
+    rez = qc.as_dict()
+    expected = naive_qc(records, max_length=100)
+    used = len(rez["quality_by_position"])
+    assert rez["reads"] == len(records)
+    assert rez["quality_by_position"] == expected["quality"][:used]
+    assert rez["n_by_position"] == expected["n_by_position"][:used]
+    assert rez["length_histogram"] == expected["lengths"]
+    assert rez["gc_histogram"] == expected["gc"]
+    json.loads(qc.to_json())
+
+
+@pytest.mark.skipif(qc_tools.np is None, reason="numpy is not installed")
+def test_backends_are_equal():
+    records = random_reads(800, seed=8, alphabet="ACGTN")
+    python, numpy = QcStats(use_numpy=False), QcStats(use_numpy=True)
+    python.update(records)
+    numpy.update(records)
+    assert python.as_dict() == numpy.as_dict()
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_mismatched_quality_length(use_numpy):
+    qc = QcStats(use_numpy=use_numpy)
+    with pytest.raises(ValueError, match="@bad"):
+        qc.update([("@good", "ACGT", "IIII", "+"), ("@bad", "ACGT", "III", "+")])
+    assert qc.reads == 0
+
+
+def test_merge_other_settings():
+    with pytest.raises(ValueError):
+        QcStats(max_length=100).merge(QcStats(max_length=200))
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from modules.trim_tools import Trimmer
+
+
+def naive_window_end(quality: str, window: int, window_quality: int, offset: int = 33) -> int:
+    window = min(window, len(quality))
+    for start in range(len(quality) - window + 1):
+        if sum(ord(symbol) - offset for symbol in quality[start:start + window]) < window_quality * window:
+            return start
+    return len(quality)
+
+
+@pytest.mark.parametrize("window", [1, 2, 4, 5, 17, 128])
+def test_window_end_matches_naive(window):
+    rng = random.Random(window)
+    for window_quality in (2, 15, 20, 30, 40):
+        trimmer = Trimmer(window=window, window_quality=window_quality)
+        for _ in range(300):
+            low, high = sorted(rng.randint(0, 41) for _ in range(2))
+            quality = "".join(chr(33 + rng.randint(low, high)) for _ in range(rng.randint(0, 300)))
+            assert trimmer.window_end(quality) == naive_window_end(quality, window, window_quality)
+
+
+def test_window_end_phred64():
+    trimmer = Trimmer(window=3, window_quality=20, phred_offset=64)
+    quality = "hhhhTTTThhhh"
+    assert trimmer.window_end(quality) == naive_window_end(quality, 3, 20, 64)
+
+
+def test_trimmer_steps():
+    trimmer = Trimmer(window=4, window_quality=20, leading=3, trailing=3, adapters=["AGATCGGAAGAGC"], min_length=4)
+    assert trimmer(("@read", "ACGTAGATCGGAAG", "IIIIIIIIIIIIII", "+")) == ("@read", "ACGT", "IIII", "+")
+    assert trimmer(("@read", "NACGTACGT", "#IIIIIIII", "+")) == ("@read", "ACGTACGT", "IIIIIIII", "+")
+    assert trimmer(("@read", "ACGTACGT", "IIII####", "+")) == ("@read", "ACGT", "IIII", "+")
+    assert trimmer(("@read", "ACG", "III", "+")) is None
+    record = ("@read", "ACGTACGT", "IIIIIIII", "+")
+    assert trimmer(record) is record